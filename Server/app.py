@@ -1,9 +1,34 @@
 from therapy_session import *
-from flask import Flask, request, jsonify, send_file
+from audio_library import (build_audio_library, load_audio_library, select_opener,
+                           get_summary_header_clip, build_evaluation_summary,
+                           serve_library_clip, splice_wav_files)
+from llm_cassette import wrap_client_with_cassette
+from llm_resilience import configure_llm_resilience, get_llm_metrics, LLM_BUDGETS
+from generation_control import configure_generation_budgets
+from chunked_transcription import configure_chunked_transcription
+from parallel_synthesis import configure_parallel_synthesis
+from audio_buffer import configure_audio_buffer, discard_audio, read_buffered_wav, get_audio_buffer_metrics
+from model_router import ModelRouter
+from evaluation_ensemble import configure_evaluation_samples, evaluate_with_samples
+from storage_manager import (configure_storage, start_background_compaction, retrieve_artifact,
+                             get_storage_metrics)
+from conversation_memory import get_token_counter
+from session_state import configure_session_memory, get_session, start_session
+from scheduler import (configure_schedulers, stage_slot, check_admission, get_scheduler_metrics,
+                       SchedulerOverloaded, PRIORITY_LIVE, PRIORITY_EVALUATION, PRIORITY_BATCH)
+from structured_logging import setup_logging, get_logger, log_context, with_log_context
+from trainee_analytics import list_trainees, get_trainee_summary
+from model_lifecycle import configure_model_lifecycle, start_model_lifecycle, get_model_metrics
+from turn_queue import (submit_turn, run_turns, get_session_turns, reset_session_turns,
+                        has_pending_turns, get_turn_metrics)
+from flask import Flask, request, jsonify, send_file, Response
+import io
 import json
 import os
 import urllib.parse
 import random
+import threading
+import uuid
 
 """
 VR Therapist Training Mode Server
@@ -20,27 +45,129 @@ The AI simulates realistic patient behavior with conditions like:
 After 5 exchanges, the system evaluates the therapist's performance.
 """
 
-# Read the JSON file
-with open('config.json') as file:
+# Read the JSON file (VR_THERAPIST_CONFIG can point at an alternative, e.g. for load tests)
+CONFIG_PATH = os.environ.get('VR_THERAPIST_CONFIG', 'config.json')
+with open(CONFIG_PATH) as file:
     data = json.load(file)
 
 # Extract the values from the JSON data
 HF_TOKEN = data['HF_TOKEN']
 MODEL_NAME = data.get('MODEL_NAME', 'meta-llama/Meta-Llama-3-8B-Instruct')
+BUILD_AUDIO_LIBRARY_ON_STARTUP = data.get('BUILD_AUDIO_LIBRARY_ON_STARTUP', False)
+USE_PRESYNTHESIZED_OPENERS = data.get('USE_PRESYNTHESIZED_OPENERS', False)
+LLM_CASSETTE_MODE = data.get('LLM_CASSETTE_MODE', 'off')  # "off", "record" or "replay"
+LLM_CASSETTE_PATH = data.get('LLM_CASSETTE_PATH', 'llm_cassette.jsonl.gz')
+LLM_CASSETTE_SPEED = data.get('LLM_CASSETTE_SPEED', 1.0)
+LLM_CASSETTE_STRICT = data.get('LLM_CASSETTE_STRICT', True)
+LLM_REQUEST_TIMEOUT = data.get('LLM_REQUEST_TIMEOUT', 30)  # Seconds per HTTP request to the inference API
+MEMORY_RECENT_TOKENS = data.get('MEMORY_RECENT_TOKENS', 400)    # Verbatim recent turns in the patient prompt
+MEMORY_SUMMARY_TOKENS = data.get('MEMORY_SUMMARY_TOKENS', 200)  # Rolling summary of older turns
+EVALUATION_TRANSCRIPT_TOKENS = data.get('EVALUATION_TRANSCRIPT_TOKENS', 1500)
+EVALUATION_FORMAT = data.get('EVALUATION_FORMAT', 'text')  # "text" or "json" (see evaluation_schema.py)
+EVALUATION_JSON_GRAMMAR = data.get('EVALUATION_JSON_GRAMMAR', False)  # Server-side schema constraint in json mode
+EVALUATION_SAMPLES = data.get('EVALUATION_SAMPLES', 1)  # Concurrent evaluations aggregated into one (1 = single call)
+SESSION_PREWARM = data.get('SESSION_PREWARM', True)  # Warm prompt prefix, LLM connection and TTS on reset
+STUB_BACKENDS = data.get('STUB_BACKENDS', False)  # Offline ASR/LLM/TTS stand-ins for load tests
+
+# Queue-backed logging with per-turn correlation ids (see structured_logging.py)
+setup_logging(
+    level=data.get('LOG_LEVEL', 'INFO'),
+    log_format=data.get('LOG_FORMAT', 'json'),  # "json" or "text"
+    sample_rate=data.get('LOG_SAMPLE_RATE', 1.0)  # Fraction of turns whose DEBUG/INFO records are kept
+)
+logger = get_logger("app")
+
+if STUB_BACKENDS:
+    from stub_backends import StubInferenceClient, stub_transcribe_audio, install_stub_tts, configure_stub_backends
+    print("⚠ STUB_BACKENDS enabled - speech recognition, LLM and TTS are simulated")
+    configure_stub_backends(data.get('STUB_LATENCY_SCALE'))
+    install_stub_tts()
+    transcribe_audio = stub_transcribe_audio
+
+# Per-turn LLM latency budgets, hedging and circuit breaker settings
+configure_llm_resilience(
+    patient_reply_budget=data.get('LLM_TURN_BUDGET_SECONDS'),
+    evaluation_budget=data.get('LLM_EVALUATION_BUDGET_SECONDS'),
+    hedge_after_fraction=data.get('LLM_HEDGE_AFTER_FRACTION'),
+    failure_threshold=data.get('LLM_BREAKER_FAILURE_THRESHOLD'),
+    cooldown_seconds=data.get('LLM_BREAKER_COOLDOWN_SECONDS')
+)
+
+# Admission control / fair scheduling for the ASR, LLM and TTS stages
+configure_schedulers(
+    asr_concurrency=data.get('ASR_MAX_CONCURRENCY'),
+    llm_concurrency=data.get('LLM_MAX_CONCURRENCY'),
+    tts_concurrency=data.get('TTS_MAX_CONCURRENCY'),
+    max_queue=data.get('STAGE_MAX_QUEUE')
+)
+
+# Windowed transcription of long utterances
+configure_chunked_transcription(
+    chunk_seconds=data.get('ASR_CHUNK_SECONDS'),
+    overlap_seconds=data.get('ASR_CHUNK_OVERLAP_SECONDS'),
+    max_in_flight=data.get('ASR_MAX_IN_FLIGHT')
+)
+
+# Shared-memory handoff of synthesized replies to /get_audio (created before workers fork)
+AUDIO_BUFFER_MB = data.get('AUDIO_BUFFER_MB', 64)
+configure_audio_buffer(AUDIO_BUFFER_MB, data.get('AUDIO_PERSIST_TO_DISK'))
+
+# Concurrent evaluation samples aggregated into one
+configure_evaluation_samples(EVALUATION_SAMPLES, data.get('EVALUATION_SAMPLE_GRACE_FRACTION'))
+
+# Compaction and retention of Evaluations/ and session audio (see storage_manager.py)
+configure_storage(
+    hot_days=data.get('STORAGE_HOT_DAYS'),
+    retention_days=data.get('STORAGE_RETENTION_DAYS'),
+    max_archive_mb=data.get('STORAGE_MAX_ARCHIVE_MB'),
+    audio_dirs=data.get('STORAGE_AUDIO_DIRS'),
+    audio_codec=data.get('STORAGE_AUDIO_CODEC'),
+    interval_seconds=data.get('STORAGE_COMPACTION_INTERVAL_SECONDS')
+)
+if data.get('STORAGE_COMPACTION_ENABLED', True):
+    start_background_compaction()
+
+# Early-stop budgets for streamed generations
+configure_generation_budgets(
+    patient_max_sentences=data.get('PATIENT_MAX_SENTENCES'),
+    patient_max_chars=data.get('PATIENT_MAX_CHARS'),
+    evaluation_max_chars=data.get('EVALUATION_MAX_CHARS'),
+    max_tokens=data.get('LLM_MAX_TOKENS')
+)
+
+# Per-task model choice from MODEL_ROUTES (hot-reloaded; MODEL_NAME when a task has no route)
+model_router = ModelRouter(CONFIG_PATH, MODEL_NAME)
 
 app = Flask(__name__)
-patient_wav_saved = False
-base_wav_path = ""
-chat_history_list = []
-message_history = []  # Store full conversation history for AI context
-client = initialize_client(HF_TOKEN)
-
-# AI Patient simulation variables (AI acts as patient with mental health condition)
-patient_condition = None  # e.g., "Anxiety", "Depression", "Bipolar Disorder", "PTSD"
-patient_severity = None   # e.g., "mild", "moderate", "severe"
-session_turn_count = 0
+# Conversation state (condition, history, memory) is kept per session (see session_state.py)
+configure_session_memory(
+    recent_tokens=MEMORY_RECENT_TOKENS,
+    summary_tokens=MEMORY_SUMMARY_TOKENS,
+    token_counter=get_token_counter(None if STUB_BACKENDS else MODEL_NAME, HF_TOKEN)
+)
+client = wrap_client_with_cassette(StubInferenceClient() if STUB_BACKENDS else initialize_client(HF_TOKEN, LLM_REQUEST_TIMEOUT),
+                                   LLM_CASSETTE_MODE, LLM_CASSETTE_PATH,
+                                   LLM_CASSETTE_SPEED, LLM_CASSETTE_STRICT)
+
 SESSION_LENGTH = 3  # Number of exchanges before therapist performance evaluation
 
+configure_tts_pool(data.get('TTS_POOL_SIZE', 2))
+configure_model_lifecycle(
+    idle_unload_seconds=data.get('MODEL_IDLE_UNLOAD_SECONDS'),   # 0 keeps models loaded
+    preload_times=data.get('MODEL_PRELOAD_TIMES'),               # e.g. ["08:30"]
+    mmap_weights=data.get('MODEL_MMAP_WEIGHTS')
+)
+configure_parallel_synthesis(
+    enabled=data.get('TTS_PARALLEL_SENTENCES'),
+    crossfade_ms=data.get('TTS_CROSSFADE_MS'),
+    pool_size=data.get('TTS_POOL_SIZE', 2)
+)
+configure_tts_backend(
+    backend=data.get('TTS_BACKEND'),         # "coqui" (default) or "onnx"
+    onnx_model=data.get('TTS_ONNX_MODEL'),   # Graph written by tts_onnx_export.py
+    onnx_threads=data.get('TTS_ONNX_THREADS')
+)
+
 # Initialize TTS at startup (optional - will init on first use if this fails)
 print("Initializing Mozilla TTS (this may take a few minutes on first run)...")
 print("Downloading TTS models if not cached...")
@@ -50,160 +177,415 @@ try:
 except Exception as e:
     print(f"⚠ Warning: Could not initialize TTS at startup: {e}")
     print("TTS will be initialized on first use")
+start_model_lifecycle()
+
+# Load the pre-synthesized opener/summary clips (see audio_library.py)
+if BUILD_AUDIO_LIBRARY_ON_STARTUP:
+    try:
+        build_audio_library()
+    except Exception as e:
+        print(f"⚠ Warning: Could not build audio library: {e}")
+if load_audio_library():
+    print("✓ Pre-synthesized audio library loaded")
+else:
+    print("Audio library not found - all turns will be synthesized live (run: python audio_library.py)")
+
+
+def get_session_id():
+    """Identify the calling headset (explicit session_id, else the client address)."""
+    return request.values.get('session_id') or request.remote_addr or 'default'
 
 
 @app.route('/process_wav', methods=['POST'])
 def process_wav():
-    global patient_wav_saved, base_wav_path
+    """
+    Submit a turn. Optional `seq` (client turn number, from 1 after each reset)
+    and `idempotency_key` make retried submissions safe (see turn_queue.py).
+    """
+    if 'patient_speech' != request.form['loaded_wav_file']:
+        return jsonify({'status': 'done'})
 
-    base_wav_path = request.form["path"]
-    print(base_wav_path)
-    if 'patient_speech' == request.form['loaded_wav_file']:
-        patient_wav_saved = True
+    try:
+        seq = int(request.form['seq']) if request.form.get('seq') else None
+    except ValueError:
+        return jsonify({'error': 'seq must be an integer'}), 400
+    key = request.form.get('idempotency_key') or request.headers.get('Idempotency-Key')
 
-    return jsonify({'status': 'done'})
+    turn, duplicate = submit_turn(get_session_id(), request.form["path"], seq, key)
+    if turn is None:
+        return jsonify({'status': 'done', 'seq': seq, 'duplicate': True})
+    if not duplicate:
+        logger.info("Turn submitted", extra={"fields": {
+            "session_id": get_session_id(), "seq": turn.seq, "path": turn.base_path}})
+    return jsonify({'status': 'done', 'seq': turn.seq, 'duplicate': duplicate})
 
 
 @app.route('/reset_conversation', methods=['POST'])
 def reset_conversation():
-    global client, HF_TOKEN, chat_history_list, message_history, patient_condition, patient_severity, session_turn_count
-
     if "yes" == request.form["reset_conversation"]:
-        chat_history_list.clear()
-        message_history.clear()
-        session_turn_count = 0
-        
-        # Select a random condition for the patient
-        patient_condition, patient_severity = select_patient_condition()
-        print(f"\n{'='*60}")
-        print(f"NEW SESSION STARTED")
-        print(f"Patient Condition: {patient_condition}")
-        print(f"Severity Level: {patient_severity}")
-        print(f"{'='*60}\n")
+        session_id = get_session_id()
+        # Select a random condition for the patient (only this session starts over)
+        condition, severity = select_patient_condition()
+        session = start_session(session_id, request.form.get('trainee_id'), condition, severity)
+        reset_session_turns(session_id)
+        logger.info("New session started", extra={"fields": {
+            "session_id": session_id, "trainee_id": session.trainee_id,
+            "condition": condition, "severity": severity}})
+
+        if SESSION_PREWARM:
+            start_session_prewarm(session_id, condition, severity)
 
     return jsonify({'status': 'done'})
 
 
+def start_session_prewarm(session_id, condition, severity):
+    """Prewarm the new session in the background so /reset_conversation returns immediately."""
+    def run():
+        try:
+            with stage_slot("llm", session_id, PRIORITY_BATCH):
+                prewarm_session(client, condition, severity, HF_TOKEN, model_router.route("patient_reply"))
+        except Exception as e:
+            logger.warning("Session prewarm failed: %s", e)
+
+    with log_context(session_id=session_id, stage="prewarm"):
+        run = with_log_context(run)
+    threading.Thread(target=run, name="session-prewarm", daemon=True).start()
+
+
 @app.route('/check_status', methods=['GET'])
 def check_status():
-    global patient_wav_saved
+    """
+    Process the session's queued turns in order and report one result.
 
-    if patient_wav_saved:
-        patient_wav_saved = False
-        process()
-        return jsonify({'status': 'done'})
-    else:
-        return jsonify({'status': 'pending'})
+    With `seq`, reports that turn (processing earlier queued turns first);
+    a finished turn's result is returned again to retried polls. Without
+    `seq`, each finished turn is reported once.
+    """
+    session_id = get_session_id()
+    seq = request.args.get('seq', type=int)
+    if seq is not None and get_session_turns(session_id).expired(seq):
+        return jsonify({'status': 'done', 'seq': seq, 'expired': True})
+
+    if has_pending_turns(session_id):
+        # Shed load while the stage queues are full; the turn stays queued for the retry
+        try:
+            check_admission()
+        except SchedulerOverloaded as e:
+            logger.warning("Server busy: %s", e, extra={"fields": {"session_id": session_id}})
+            response = jsonify({'status': 'busy', 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+    def run_turn(turn):
+        with log_context(session_id=session_id, turn_id=uuid.uuid4().hex[:12]):
+            logger.info("Processing turn", extra={"fields": {"seq": turn.seq}})
+            return process(session_id, turn.base_path)
+
+    turn = run_turns(session_id, run_turn, seq)
+    if turn is None:
+        return jsonify({'status': 'pending', 'seq': seq})
+    return jsonify({'status': 'done', 'seq': turn.seq, **turn.result})
+
+
+def start_early_summary_speech(session_id, body_audio_path):
+    """
+    Synthesize the spoken summary body while the JSON evaluation is still streaming.
 
+    The body only uses the first two strengths and improvements, which arrive
+    well before the written feedback, so TTS can overlap the rest of the
+    generation.
 
-def process():
+    Returns:
+        tuple: (on_partial callback for evaluate_therapist_performance,
+                finish(summary_body) -> True if body_audio_path holds that exact text)
+    """
+    state = {"score": None, "strengths": [], "improvements": [], "body": None, "ok": False}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def synthesize(body):
+        try:
+            with stage_slot("tts", session_id, PRIORITY_EVALUATION):
+                state["ok"] = synthesize_speech(body, body_audio_path)
+        except Exception as e:
+            logger.warning("Early summary synthesis failed: %s", e)
+        finally:
+            done.set()
+
+    def on_partial(field, value):
+        with lock:
+            if state["body"] is not None:
+                return
+            if field == "score":
+                state["score"] = value
+            elif field in ("strengths", "improvements"):
+                state[field].append(value)
+            if state["score"] is None or len(state["strengths"]) < 2 or len(state["improvements"]) < 2:
+                return
+            if not get_summary_header_clip(state["score"]):
+                state["body"] = ""  # Nothing to splice onto - synthesize the full summary later
+                return
+            _, state["body"] = build_evaluation_summary(state)
+        logger.info("Evaluation summary items ready - synthesizing while the feedback streams")
+        threading.Thread(target=with_log_context(synthesize), args=(state["body"],), daemon=True).start()
+
+    def finish(summary_body):
+        with lock:
+            body = state["body"]
+            if body is None:
+                state["body"] = ""  # Evaluation is over - no late starts
+        if not body:
+            return False
+        done.wait()  # Also when the text changed, so the fallback does not race on the file
+        return state["ok"] and body == summary_body
+
+    return on_partial, finish
+
+
+def process(session_id='default', base_wav_path=''):
     """
     Main processing function for AI Patient Training Mode.
     
+    Each stage runs inside a scheduler slot (see scheduler.py) so live replies
+    are served before evaluations and batch work, fairly across sessions.
+    
     Flow:
     1. User (acting as therapist) speaks to VR headset
     2. Audio transcribed to text (therapist's message)
     3. AI generates patient response based on condition/severity
     4. Patient response synthesized to speech
     5. After SESSION_LENGTH exchanges, evaluate therapist performance
-    """
-    global client, HF_TOKEN, MODEL_NAME, base_wav_path, chat_history_list, message_history, patient_condition, patient_severity, session_turn_count
     
+    Args:
+        session_id: Session the turn belongs to
+        base_wav_path: Directory prefix of this turn's audio files
+    
+    Returns:
+        dict: Turn result reported by /check_status ("ok", "audio_path" or "error")
+    """
+    session = get_session(session_id)
     try:
         # Transcribe what the user (therapist) said
-        therapist_message = transcribe_audio(f"{base_wav_path}patient_speech.wav")
+        with stage_slot("asr", session_id, PRIORITY_LIVE):
+            therapist_message = transcribe_audio(f"{base_wav_path}patient_speech.wav")
         
         # Check if transcription was successful
         if "Error" in therapist_message or "could not understand" in therapist_message:
-            print(f"Transcription issue: {therapist_message}")
-            return
+            logger.warning("Transcription issue: %s", therapist_message)
+            return {'ok': False, 'error': therapist_message}
 
         # Initialize patient condition on first message
-        if patient_condition is None:
-            patient_condition, patient_severity = select_patient_condition()
-            print(f"\n{'='*60}")
-            print(f"SESSION STARTED")
-            print(f"Patient Condition: {patient_condition}")
-            print(f"Severity Level: {patient_severity}")
-            print(f"{'='*60}\n")
-
-        session_turn_count += 1
-
-        # Generate patient prompt based on condition
-        patient_prompt = generate_patient_prompt(
-            patient_condition, 
-            patient_severity, 
-            therapist_message, 
-            message_history,
-            session_turn_count
-        )
-
-        # AI generates patient response (AI acting as patient with mental health condition)
-        patient_response = generate_patient_response_from_ai(client, patient_prompt, HF_TOKEN, MODEL_NAME)
-        
-        # Clean up the response
-        patient_response = clean_response(patient_response)
+        if session.condition is None:
+            session.condition, session.severity = select_patient_condition()
+            logger.info("Session started", extra={"fields": {
+                "condition": session.condition, "severity": session.severity}})
+
+        session.turn_count += 1
+
+        audio_clip = None   # Pre-synthesized clip served instead of running TTS
+        header_clip = None  # Pre-synthesized clip spliced in front of the synthesized text
+
+        # Opening turn: serve a pre-synthesized opener for this condition if available
+        library_opener = None
+        if session.turn_count == 1 and USE_PRESYNTHESIZED_OPENERS:
+            library_opener = select_opener(session.condition, session.severity)
+
+        if library_opener:
+            patient_response, audio_clip = library_opener
+        else:
+            # Generate patient prompt based on condition
+            patient_prompt = generate_patient_prompt(
+                session.condition,
+                session.severity,
+                therapist_message, 
+                session.message_history,
+                session.turn_count,
+                memory=session.memory
+            )
+
+            # AI generates patient response (AI acting as patient with mental health condition)
+            with stage_slot("llm", session_id, PRIORITY_LIVE):
+                patient_response = generate_patient_response_from_ai(client, patient_prompt, HF_TOKEN,
+                                                                     model_router.route("patient_reply"))
+            
+            # Clean up the response
+            patient_response = clean_response(patient_response)
         
-        chat_history_list.append(patient_response)
+        session.chat_history.append(patient_response)
         
         # Store in message history for better context
-        message_history.append({"role": "therapist", "content": therapist_message})
-        message_history.append({"role": "patient", "content": patient_response})
+        session.message_history.append({"role": "therapist", "content": therapist_message})
+        session.message_history.append({"role": "patient", "content": patient_response})
 
-        print(f"Therapist (User): {therapist_message}")
-        print(f"Patient (AI): {patient_response}")
+        logger.info("Turn complete", extra={"fields": {
+            "turn": session.turn_count, "therapist": therapist_message, "patient": patient_response}})
 
         # Check if session should end for evaluation
-        if session_turn_count >= SESSION_LENGTH:
-            print(f"\n{'='*60}")
-            print(f"SESSION COMPLETE - Generating evaluation...")
-            print(f"{'='*60}\n")
+        if session.turn_count >= SESSION_LENGTH:
+            logger.info("Session complete - generating evaluation")
             
-            # Generate evaluation
-            evaluation = evaluate_therapist_performance(
-                client, 
-                message_history, 
-                patient_condition,
-                HF_TOKEN,
-                MODEL_NAME
-            )
+            # Generate evaluation (JSON mode starts the spoken summary before it finishes)
+            body_audio_path = f"{base_wav_path}therapist_speech_body.wav"
+            on_partial, finish_early_summary = start_early_summary_speech(session_id, body_audio_path)
+            # With several samples, partial fields of one sample don't predict the aggregate
+            with stage_slot("llm", session_id, PRIORITY_EVALUATION):
+                evaluation = evaluate_with_samples(lambda: evaluate_therapist_performance(
+                    client, 
+                    session.message_history,
+                    session.condition,
+                    HF_TOKEN,
+                    model_router.route("evaluation"),
+                    memory=session.memory,
+                    transcript_tokens=EVALUATION_TRANSCRIPT_TOKENS,
+                    output_format=EVALUATION_FORMAT,
+                    on_partial=on_partial if EVALUATION_SAMPLES <= 1 else None,
+                    json_grammar=EVALUATION_JSON_GRAMMAR
+                ), timeout_seconds=LLM_BUDGETS["evaluation"] * 2)  # Room for a JSON field repair call
             
-            print(f"\n{'='*60}")
-            print(f"THERAPIST PERFORMANCE EVALUATION")
-            print(f"{'='*60}")
-            print(f"Overall Score: {evaluation['score']}/100")
-            print(f"\nStrengths:")
-            for strength in evaluation['strengths']:
-                print(f"  ✓ {strength}")
-            print(f"\nAreas for Improvement:")
-            for area in evaluation['improvements']:
-                print(f"  → {area}")
-            print(f"\nDetailed Feedback:")
-            print(f"  {evaluation['feedback']}")
-            print(f"{'='*60}\n")
+            logger.info("Therapist performance evaluation", extra={"fields": {
+                "score": evaluation['score'],
+                "strengths": evaluation['strengths'],
+                "improvements": evaluation['improvements'],
+                "feedback": evaluation['feedback'],
+                "fallback": evaluation.get('fallback', False)}})
             
             # Save evaluation to file
-            save_evaluation(evaluation, base_wav_path)
+            save_evaluation(evaluation, base_wav_path, trainee_id=session.trainee_id,
+                            condition=session.condition, severity=session.severity, session_id=session_id)
             
             # Add evaluation as final "patient" message
-            eval_summary = f"Thank you for the session. Here's your performance: Score {evaluation['score']}/100. " + \
-                          f"You did well in: {', '.join(evaluation['strengths'][:2])}. " + \
-                          f"Consider improving: {', '.join(evaluation['improvements'][:2])}."
+            summary_header, summary_body = build_evaluation_summary(evaluation)
+            eval_summary = f"{summary_header} {summary_body}"
             
             patient_response = eval_summary
-            chat_history_list.append(patient_response)
+            session.chat_history.append(patient_response)
+            audio_clip = None
+            header_clip = get_summary_header_clip(evaluation['score'])
 
-        # Synthesize speech with Mozilla TTS
+        # Synthesize speech with Mozilla TTS (or serve pre-synthesized clips)
         output_audio_path = f"{base_wav_path}therapist_speech.wav"
-        success = synthesize_speech(patient_response, output_audio_path)
+        if audio_clip or header_clip or not AUDIO_BUFFER_MB:
+            discard_audio(output_audio_path)  # Served from the file written below
+        if audio_clip:
+            success = serve_library_clip(audio_clip, output_audio_path)
+        elif header_clip:
+            if finish_early_summary(summary_body):
+                success = splice_wav_files([header_clip, body_audio_path], output_audio_path)
+            else:
+                success = False
+            if not success:
+                with stage_slot("tts", session_id, PRIORITY_LIVE):
+                    success = synthesize_speech(summary_body, body_audio_path) and \
+                              splice_wav_files([header_clip, body_audio_path], output_audio_path)
+                    if not success:
+                        success = synthesize_speech(patient_response, output_audio_path)
+        elif AUDIO_BUFFER_MB:
+            with stage_slot("tts", session_id, PRIORITY_LIVE):
+                success = synthesize_speech_to_buffer(patient_response, output_audio_path)
+        else:
+            with stage_slot("tts", session_id, PRIORITY_LIVE):
+                success = synthesize_speech(patient_response, output_audio_path)
         
         if not success:
-            print("Warning: Speech synthesis failed, but continuing...")
+            logger.warning("Speech synthesis failed, but continuing")
+
+        # Fold turns that aged out of the prompt window into the rolling summary
+        # (runs in the background while the trainee listens to the reply)
+        if session.turn_count < SESSION_LENGTH:
+            def summarize(previous, messages, max_tokens):
+                with stage_slot("llm", session_id, PRIORITY_BATCH):
+                    return summarize_conversation(client, previous, messages, max_tokens, HF_TOKEN,
+                                                  model_router.route("summarization"))
+
+            session.memory.update_summary_async(summarize)
+
+        return {'ok': bool(success), 'audio_path': output_audio_path,
+                'session_complete': session.turn_count >= SESSION_LENGTH}
             
     except Exception as e:
-        print(f"Error in process(): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in process(): %s", e)
+        return {'ok': False, 'error': str(e)}
+
+
+@app.route('/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """Per-model/per-mode LLM outcome counts, latency percentiles and breaker state"""
+    return jsonify(get_llm_metrics())
+
+
+@app.route('/metrics/routing', methods=['GET'])
+def routing_metrics():
+    """Model routes, current choice per task and per-candidate latency"""
+    return jsonify(model_router.snapshot())
+
+
+@app.route('/metrics/tts', methods=['GET'])
+def tts_metrics():
+    """TTS instance pool size, utilisation and checkout wait times"""
+    snapshot = get_tts_pool_metrics()
+    if snapshot is None:
+        return jsonify({'size': 0, 'status': 'not initialized'})
+    return jsonify(snapshot)
+
+
+@app.route('/metrics/models', methods=['GET'])
+def model_metrics():
+    """Loaded models, their memory and idle/preload state, and process RSS"""
+    return jsonify(get_model_metrics())
+
+
+@app.route('/metrics/turns', methods=['GET'])
+def turn_metrics():
+    """Queued/processing turns and the last finished seq per session"""
+    return jsonify(get_turn_metrics())
+
+
+@app.route('/metrics/scheduler', methods=['GET'])
+def scheduler_metrics():
+    """Active/waiting jobs and queue wait times per stage and priority class"""
+    return jsonify(get_scheduler_metrics())
+
+
+@app.route('/metrics/audio_buffer', methods=['GET'])
+def audio_buffer_metrics():
+    """Shared audio ring usage"""
+    return jsonify(get_audio_buffer_metrics())
+
+
+@app.route('/metrics/storage', methods=['GET'])
+def storage_metrics():
+    """Archived artifact counts, compression ratio and the last compaction pass"""
+    return jsonify(get_storage_metrics())
+
+
+@app.route('/analytics/trainees', methods=['GET'])
+def analytics_trainees():
+    """Trainees with their evaluation count and mean score"""
+    return jsonify(list_trainees())
+
+
+@app.route('/analytics/trainees/<trainee>', methods=['GET'])
+def analytics_trainee(trainee):
+    """Score trends, histograms and top improvement themes for one trainee"""
+    summary = get_trainee_summary(trainee, condition=request.args.get('condition'),
+                                  top_k=request.args.get('top', 5, type=int))
+    if summary is None:
+        return jsonify({'error': 'No evaluations for this trainee'}), 404
+    return jsonify(summary)
+
+
+@app.route('/artifacts/<path:artifact_id>', methods=['GET'])
+def get_artifact(artifact_id):
+    """Serve an evaluation or session audio file by id, whether it is still on disk or archived"""
+    try:
+        artifact = retrieve_artifact(artifact_id)
+        if artifact is None:
+            return jsonify({'error': 'Artifact not found'}), 404
+        content, filename = artifact
+        return send_file(io.BytesIO(content), download_name=filename)
+    except Exception as e:
+        logger.exception("Error serving artifact %s: %s", artifact_id, e)
+        return jsonify({'error': str(e)}), 500
 
 
 @app.route('/get_audio/<path:filename>', methods=['GET'])
@@ -215,17 +597,22 @@ def get_audio(filename):
         # Normalize path separators for Windows
         decoded_path = decoded_path.replace('/', os.sep).replace('\\', os.sep)
         
-        print(f"Attempting to serve audio file: {decoded_path}")
+        logger.debug("Serving audio file %s", decoded_path)
+        
+        # Replies synthesized this turn are served straight from shared memory
+        buffered = read_buffered_wav(decoded_path)
+        if buffered:
+            header, pcm = buffered
+            return Response([header, pcm], mimetype='audio/wav',
+                            headers={'Content-Length': str(len(header) + len(pcm))})
         
         if os.path.exists(decoded_path):
             return send_file(decoded_path, mimetype='audio/wav')
         else:
-            print(f"Audio file not found: {decoded_path}")
+            logger.warning("Audio file not found: %s", decoded_path)
             return jsonify({'error': 'File not found'}), 404
     except Exception as e:
-        print(f"Error serving audio file: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error serving audio file: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
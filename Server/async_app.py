@@ -0,0 +1,420 @@
+"""
+VR Therapist Async Server
+-------------------------
+ASGI variant of app.py (Quart) with the same endpoints. The turn pipeline runs
+as coroutines instead of one OS thread per request:
+
+- LLM calls (patient reply, evaluation, conversation summaries) use
+  AsyncInferenceClient (async_inference.py); a turn waiting on tokens holds
+  no thread
+- ASR, TTS, WAV splicing and evaluation file I/O run on a bounded thread pool
+  (ASYNC_WORKER_THREADS), admitted by the same stage schedulers as app.py
+- stage queues are awaited (scheduler.stage_slot_async), not blocked on
+
+One process can keep hundreds of turns in flight on the network with a
+handful of threads. Importing app.py loads config.json and sets up logging,
+schedulers, models and the audio buffer, so both servers are configured
+alike. Conversation state is kept per session as in app.py
+(session_state.py).
+
+Run (pip install quart hypercorn):
+    hypercorn async_app:app --bind 0.0.0.0:5000
+"""
+
+import asyncio
+import io
+import os
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify, send_file, Response
+
+import app as sync_app
+from async_inference import (initialize_async_client, generate_response, evaluate_therapist_performance,
+                             summarize_conversation)
+from audio_library import (select_opener, get_summary_header_clip, build_evaluation_summary,
+                           serve_library_clip, splice_wav_files)
+from audio_buffer import discard_audio, read_buffered_wav, get_audio_buffer_metrics
+from evaluation_ensemble import evaluate_with_samples_async
+from llm_resilience import get_llm_metrics, LLM_BUDGETS
+from model_lifecycle import get_model_metrics
+from scheduler import (stage_slot_async, check_admission, get_scheduler_metrics, SchedulerOverloaded,
+                       PRIORITY_LIVE, PRIORITY_EVALUATION, PRIORITY_BATCH)
+from session_state import get_session, start_session, session_count
+from storage_manager import retrieve_artifact, get_storage_metrics
+from structured_logging import get_logger, log_context
+from therapy_session import (select_patient_condition, generate_patient_prompt, clean_response, prewarm_session,
+                             synthesize_speech, synthesize_speech_to_buffer, save_evaluation, get_tts_pool_metrics)
+from trainee_analytics import list_trainees, get_trainee_summary
+from turn_queue import (submit_turn, run_turns_async, get_session_turns, reset_session_turns,
+                        has_pending_turns, get_turn_metrics)
+
+logger = get_logger("async_app")
+
+data = sync_app.data
+ASYNC_WORKER_THREADS = data.get('ASYNC_WORKER_THREADS', 8)  # ASR/TTS/file I/O threads per process
+SESSION_LENGTH = sync_app.SESSION_LENGTH
+model_router = sync_app.model_router
+
+if sync_app.STUB_BACKENDS:
+    from stub_backends import StubAsyncInferenceClient
+    client = StubAsyncInferenceClient()
+else:
+    client = initialize_async_client(sync_app.HF_TOKEN, sync_app.LLM_REQUEST_TIMEOUT)
+if sync_app.LLM_CASSETTE_MODE != 'off':
+    print("⚠ LLM_CASSETTE_MODE is not supported by async_app.py - using the live client")
+
+app = Quart(__name__)
+_in_flight_turns = 0
+
+
+@app.before_serving
+async def start_worker_threads():
+    # asyncio.to_thread() runs on the default executor and carries the log context along
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_WORKER_THREADS, thread_name_prefix="async-worker"))
+
+
+async def get_session_id():
+    """Identify the calling headset (explicit session_id, else the client address)."""
+    values = await request.values
+    return values.get('session_id') or request.remote_addr or 'default'
+
+
+@app.route('/process_wav', methods=['POST'])
+async def process_wav():
+    """Submit a turn (same fields as app.py: loaded_wav_file, path, seq, idempotency_key)."""
+    form = await request.form
+    if 'patient_speech' != form['loaded_wav_file']:
+        return jsonify({'status': 'done'})
+
+    try:
+        seq = int(form['seq']) if form.get('seq') else None
+    except ValueError:
+        return jsonify({'error': 'seq must be an integer'}), 400
+    key = form.get('idempotency_key') or request.headers.get('Idempotency-Key')
+
+    session_id = await get_session_id()
+    turn, duplicate = submit_turn(session_id, form["path"], seq, key)
+    if turn is None:
+        return jsonify({'status': 'done', 'seq': seq, 'duplicate': True})
+    if not duplicate:
+        logger.info("Turn submitted", extra={"fields": {
+            "session_id": session_id, "seq": turn.seq, "path": turn.base_path}})
+    return jsonify({'status': 'done', 'seq': turn.seq, 'duplicate': duplicate})
+
+
+@app.route('/reset_conversation', methods=['POST'])
+async def reset_conversation():
+    form = await request.form
+    if "yes" == form["reset_conversation"]:
+        session_id = await get_session_id()
+        condition, severity = select_patient_condition()
+        session = start_session(session_id, form.get('trainee_id'), condition, severity)
+        reset_session_turns(session_id)
+        logger.info("New session started", extra={"fields": {
+            "session_id": session_id, "trainee_id": session.trainee_id,
+            "condition": condition, "severity": severity}})
+
+        if sync_app.SESSION_PREWARM:
+            asyncio.ensure_future(prewarm(session_id, condition, severity))
+
+    return jsonify({'status': 'done'})
+
+
+async def prewarm(session_id, condition, severity):
+    """Session prewarm in the background (TTS warm-up and prompt priming are blocking calls)."""
+    try:
+        with log_context(session_id=session_id, stage="prewarm"):
+            async with stage_slot_async("llm", session_id, PRIORITY_BATCH):
+                await asyncio.to_thread(prewarm_session, sync_app.client, condition, severity,
+                                        sync_app.HF_TOKEN, model_router.route("patient_reply"))
+    except Exception as e:
+        logger.warning("Session prewarm failed: %s", e)
+
+
+@app.route('/check_status', methods=['GET'])
+async def check_status():
+    """Process the session's queued turns in order and report one result (see app.py)."""
+    session_id = await get_session_id()
+    seq = request.args.get('seq', type=int)
+    if seq is not None and get_session_turns(session_id).expired(seq):
+        return jsonify({'status': 'done', 'seq': seq, 'expired': True})
+
+    if has_pending_turns(session_id):
+        try:
+            check_admission()
+        except SchedulerOverloaded as e:
+            logger.warning("Server busy: %s", e, extra={"fields": {"session_id": session_id}})
+            response = jsonify({'status': 'busy', 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+    async def run_turn(turn):
+        global _in_flight_turns
+        _in_flight_turns += 1
+        try:
+            with log_context(session_id=session_id, turn_id=uuid.uuid4().hex[:12]):
+                logger.info("Processing turn", extra={"fields": {"seq": turn.seq}})
+                return await process(session_id, turn.base_path)
+        finally:
+            _in_flight_turns -= 1
+
+    turn = await run_turns_async(session_id, run_turn, seq)
+    if turn is None:
+        return jsonify({'status': 'pending', 'seq': seq})
+    return jsonify({'status': 'done', 'seq': turn.seq, **turn.result})
+
+
+def start_early_summary_speech(session_id, body_audio_path):
+    """
+    Coroutine version of app.start_early_summary_speech: the summary body is
+    synthesized as a task while the JSON evaluation streams.
+
+    Returns:
+        tuple: (on_partial callback, async finish(summary_body) -> True if body_audio_path holds that text)
+    """
+    state = {"score": None, "strengths": [], "improvements": [], "body": None, "task": None}
+
+    async def synthesize(body):
+        async with stage_slot_async("tts", session_id, PRIORITY_EVALUATION):
+            return await asyncio.to_thread(synthesize_speech, body, body_audio_path)
+
+    def on_partial(field, value):
+        # Called from the stream loop on the event loop thread, so no lock is needed
+        if state["body"] is not None:
+            return
+        if field == "score":
+            state["score"] = value
+        elif field in ("strengths", "improvements"):
+            state[field].append(value)
+        if state["score"] is None or len(state["strengths"]) < 2 or len(state["improvements"]) < 2:
+            return
+        if not get_summary_header_clip(state["score"]):
+            state["body"] = ""
+            return
+        _, state["body"] = build_evaluation_summary(state)
+        logger.info("Evaluation summary items ready - synthesizing while the feedback streams")
+        state["task"] = asyncio.ensure_future(synthesize(state["body"]))
+
+    async def finish(summary_body):
+        body = state["body"]
+        if body is None:
+            state["body"] = ""  # Evaluation is over - no late starts
+        if not body:
+            return False
+        try:
+            ok = await state["task"]
+        except Exception as e:
+            logger.warning("Early summary synthesis failed: %s", e)
+            ok = False
+        return ok and body == summary_body
+
+    return on_partial, finish
+
+
+async def process(session_id, base_wav_path):
+    """
+    Coroutine version of app.process() for one turn of session_id.
+
+    Returns:
+        dict: Turn result reported by /check_status ("ok", "audio_path" or "error")
+    """
+    session = get_session(session_id)
+    try:
+        async with stage_slot_async("asr", session_id, PRIORITY_LIVE):
+            therapist_message = await asyncio.to_thread(sync_app.transcribe_audio,
+                                                        f"{base_wav_path}patient_speech.wav")
+
+        if "Error" in therapist_message or "could not understand" in therapist_message:
+            logger.warning("Transcription issue: %s", therapist_message)
+            return {'ok': False, 'error': therapist_message}
+
+        if session.condition is None:
+            session.condition, session.severity = select_patient_condition()
+            logger.info("Session started", extra={"fields": {
+                "condition": session.condition, "severity": session.severity}})
+
+        session.turn_count += 1
+
+        audio_clip = None
+        header_clip = None
+
+        library_opener = None
+        if session.turn_count == 1 and sync_app.USE_PRESYNTHESIZED_OPENERS:
+            library_opener = select_opener(session.condition, session.severity)
+
+        if library_opener:
+            patient_response, audio_clip = library_opener
+        else:
+            patient_prompt = generate_patient_prompt(session.condition, session.severity, therapist_message,
+                                                     session.message_history, session.turn_count,
+                                                     memory=session.memory)
+            async with stage_slot_async("llm", session_id, PRIORITY_LIVE):
+                patient_response = await generate_response(client, patient_prompt,
+                                                           model_router.route("patient_reply"))
+            patient_response = clean_response(patient_response)
+
+        session.message_history.append({"role": "therapist", "content": therapist_message})
+        session.message_history.append({"role": "patient", "content": patient_response})
+
+        logger.info("Turn complete", extra={"fields": {
+            "turn": session.turn_count, "therapist": therapist_message, "patient": patient_response}})
+
+        if session.turn_count >= SESSION_LENGTH:
+            logger.info("Session complete - generating evaluation")
+
+            body_audio_path = f"{base_wav_path}therapist_speech_body.wav"
+            on_partial, finish_early_summary = start_early_summary_speech(session_id, body_audio_path)
+            async with stage_slot_async("llm", session_id, PRIORITY_EVALUATION):
+                evaluation = await evaluate_with_samples_async(lambda: evaluate_therapist_performance(
+                    client,
+                    session.message_history,
+                    session.condition,
+                    model_router.route("evaluation"),
+                    memory=session.memory,
+                    transcript_tokens=sync_app.EVALUATION_TRANSCRIPT_TOKENS,
+                    output_format=sync_app.EVALUATION_FORMAT,
+                    on_partial=on_partial if sync_app.EVALUATION_SAMPLES <= 1 else None,
+                    json_grammar=sync_app.EVALUATION_JSON_GRAMMAR
+                ), timeout_seconds=LLM_BUDGETS["evaluation"] * 2)
+
+            logger.info("Therapist performance evaluation", extra={"fields": {
+                "score": evaluation['score'],
+                "strengths": evaluation['strengths'],
+                "improvements": evaluation['improvements'],
+                "feedback": evaluation['feedback'],
+                "fallback": evaluation.get('fallback', False)}})
+
+            await asyncio.to_thread(save_evaluation, evaluation, base_wav_path, trainee_id=session.trainee_id,
+                                    condition=session.condition, severity=session.severity,
+                                    session_id=session_id)
+
+            summary_header, summary_body = build_evaluation_summary(evaluation)
+            patient_response = f"{summary_header} {summary_body}"
+            audio_clip = None
+            header_clip = get_summary_header_clip(evaluation['score'])
+
+        output_audio_path = f"{base_wav_path}therapist_speech.wav"
+        if audio_clip or header_clip or not sync_app.AUDIO_BUFFER_MB:
+            discard_audio(output_audio_path)
+        if audio_clip:
+            success = await asyncio.to_thread(serve_library_clip, audio_clip, output_audio_path)
+        elif header_clip:
+            success = await finish_early_summary(summary_body) and \
+                await asyncio.to_thread(splice_wav_files, [header_clip, body_audio_path], output_audio_path)
+            if not success:
+                async with stage_slot_async("tts", session_id, PRIORITY_LIVE):
+                    success = await asyncio.to_thread(synthesize_summary, summary_body, body_audio_path,
+                                                      header_clip, patient_response, output_audio_path)
+        else:
+            synthesize = synthesize_speech_to_buffer if sync_app.AUDIO_BUFFER_MB else synthesize_speech
+            async with stage_slot_async("tts", session_id, PRIORITY_LIVE):
+                success = await asyncio.to_thread(synthesize, patient_response, output_audio_path)
+
+        if not success:
+            logger.warning("Speech synthesis failed, but continuing")
+
+        if session.turn_count < SESSION_LENGTH:
+            async def summarize(previous, messages, max_tokens):
+                async with stage_slot_async("llm", session_id, PRIORITY_BATCH):
+                    return await summarize_conversation(client, previous, messages, max_tokens,
+                                                        model_router.route("summarization"))
+
+            session.memory.update_summary_task(summarize)
+
+        return {'ok': bool(success), 'audio_path': output_audio_path,
+                'session_complete': session.turn_count >= SESSION_LENGTH}
+
+    except Exception as e:
+        logger.exception("Error in process(): %s", e)
+        return {'ok': False, 'error': str(e)}
+
+
+def synthesize_summary(summary_body, body_audio_path, header_clip, full_text, output_audio_path):
+    """Synthesize the summary body behind its header clip, or the whole text if splicing fails."""
+    if synthesize_speech(summary_body, body_audio_path) and \
+            splice_wav_files([header_clip, body_audio_path], output_audio_path):
+        return True
+    return synthesize_speech(full_text, output_audio_path)
+
+
+@app.route('/metrics/async', methods=['GET'])
+async def async_metrics():
+    """Turns being processed, sessions held and worker threads of this process"""
+    return jsonify({'in_flight_turns': _in_flight_turns, 'sessions': session_count(),
+                    'worker_threads': ASYNC_WORKER_THREADS})
+
+
+@app.route('/metrics/<name>', methods=['GET'])
+async def metrics(name):
+    """The metrics app.py serves under /metrics/<name>"""
+    snapshots = {
+        'llm': get_llm_metrics,
+        'routing': model_router.snapshot,
+        'tts': lambda: get_tts_pool_metrics() or {'size': 0, 'status': 'not initialized'},
+        'models': get_model_metrics,
+        'turns': get_turn_metrics,
+        'scheduler': get_scheduler_metrics,
+        'audio_buffer': get_audio_buffer_metrics,
+        'storage': get_storage_metrics,
+    }
+    if name not in snapshots:
+        return jsonify({'error': 'Unknown metrics'}), 404
+    return jsonify(snapshots[name]())
+
+
+@app.route('/analytics/trainees', methods=['GET'])
+async def analytics_trainees():
+    """Trainees with their evaluation count and mean score"""
+    return jsonify(await asyncio.to_thread(list_trainees))
+
+
+@app.route('/analytics/trainees/<trainee>', methods=['GET'])
+async def analytics_trainee(trainee):
+    """Score trends, histograms and top improvement themes for one trainee"""
+    summary = await asyncio.to_thread(get_trainee_summary, trainee, condition=request.args.get('condition'),
+                                      top_k=request.args.get('top', 5, type=int))
+    if summary is None:
+        return jsonify({'error': 'No evaluations for this trainee'}), 404
+    return jsonify(summary)
+
+
+@app.route('/artifacts/<path:artifact_id>', methods=['GET'])
+async def get_artifact(artifact_id):
+    """Serve an evaluation or session audio file by id, whether it is still on disk or archived"""
+    try:
+        artifact = await asyncio.to_thread(retrieve_artifact, artifact_id)
+        if artifact is None:
+            return jsonify({'error': 'Artifact not found'}), 404
+        content, filename = artifact
+        return await send_file(io.BytesIO(content), attachment_filename=filename)
+    except Exception as e:
+        logger.exception("Error serving artifact %s: %s", artifact_id, e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/get_audio/<path:filename>', methods=['GET'])
+async def get_audio(filename):
+    """Serve audio files to Unity client"""
+    try:
+        decoded_path = urllib.parse.unquote_plus(filename)
+        decoded_path = decoded_path.replace('/', os.sep).replace('\\', os.sep)
+
+        buffered = read_buffered_wav(decoded_path)
+        if buffered:
+            header, pcm = buffered
+            return Response(header + pcm, mimetype='audio/wav')
+
+        if os.path.exists(decoded_path):
+            return await send_file(decoded_path, mimetype='audio/wav')
+        logger.warning("Audio file not found: %s", decoded_path)
+        return jsonify({'error': 'File not found'}), 404
+    except Exception as e:
+        logger.exception("Error serving audio file: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    app.run(host=data.get('SERVER_HOST', '0.0.0.0'), port=data.get('SERVER_PORT', 5000))
@@ -0,0 +1,186 @@
+"""
+Async LLM Calls
+---------------
+Coroutine versions of the Hugging Face calls in therapy_session.py (patient
+reply, evaluation, conversation summary) on huggingface_hub's
+AsyncInferenceClient, for the async server (async_app.py).
+
+A streamed reply is read with `async for`, so while a turn waits on tokens no
+thread is held. Prompts, generation budgets, call modes, hedging, circuit
+breakers and latency stats are the same as on the sync path
+(llm_resilience.call_with_fallbacks_async), so /metrics/llm and model routing
+see both servers alike.
+"""
+
+from huggingface_hub import AsyncInferenceClient
+
+from generation_control import GENERATION_BUDGETS, StreamController, truncate_to_budget
+from llm_resilience import call_with_fallbacks_async, LLM_BUDGETS
+from evaluation_schema import (IncrementalEvaluationParser, parse_evaluation_json, build_field_repair_prompt,
+                               field_schema, EVALUATION_SCHEMA, EVALUATION_DEFAULTS)
+from structured_logging import get_logger
+from therapy_session import (FALLBACK_PATIENT_LINE, FALLBACK_EVALUATION, TEXT_EVALUATION_FORMAT,
+                             stream_chunk_text, build_evaluation_prompt, build_json_evaluation_prompt,
+                             apply_evaluation_defaults, build_summary_prompt, parse_evaluation)
+
+logger = get_logger("llm")
+
+
+def initialize_async_client(hf_token, timeout=None):
+    """Initialize the async Hugging Face Inference client (timeout in seconds per HTTP request)."""
+    return AsyncInferenceClient(token=hf_token, timeout=timeout)
+
+
+def _format_kwargs(response_format):
+    return {"response_format": response_format} if response_format else {}
+
+
+async def _chat_completion_stream(client, messages, model_name, budget, on_chunk=None, response_format=None):
+    """Streaming chat completion, stopped (and the upstream stream closed) once the budget is met."""
+    controller = StreamController(budget)
+    stream = await client.chat_completion(
+        messages=messages,
+        model=model_name,
+        max_tokens=budget.max_tokens,
+        temperature=0.7,
+        stream=True,
+        **_format_kwargs(response_format)
+    )
+    try:
+        async for message in stream:
+            content = stream_chunk_text(message)
+            if content:
+                done = controller.feed(content)
+                if on_chunk is not None:
+                    on_chunk(content)
+                if done:
+                    break
+    finally:
+        # Also runs when the attempt is cancelled (deadline passed or a hedge won)
+        if hasattr(stream, 'aclose'):
+            await stream.aclose()
+    return controller.text
+
+
+async def _chat_completion_once(client, messages, model_name, budget, response_format=None):
+    result = await client.chat_completion(
+        messages=messages,
+        model=model_name,
+        max_tokens=budget.max_tokens,
+        temperature=0.7,
+        stream=False,
+        **_format_kwargs(response_format)
+    )
+    if hasattr(result, 'choices') and len(result.choices) > 0:
+        return truncate_to_budget((result.choices[0].message.content or "").strip(), budget)
+    return ""
+
+
+async def _text_generation(client, prompt_message, model_name, budget, response_format=None):
+    extra = {"grammar": response_format} if response_format else {}
+    result = await client.text_generation(
+        prompt=prompt_message,
+        model=model_name,
+        max_new_tokens=budget.max_tokens,
+        temperature=0.7,
+        return_full_text=False,
+        **extra
+    )
+    text = result.strip() if isinstance(result, str) else str(result)
+    return truncate_to_budget(text, budget)
+
+
+async def generate_response(client, prompt_message, model_name, task="patient_reply", on_chunk=None,
+                            response_format=None):
+    """
+    Coroutine version of therapy_session.generate_patient_response_from_ai.
+
+    Returns:
+        str: Generated text, or FALLBACK_PATIENT_LINE if every call mode failed
+    """
+    messages = [{"role": "user", "content": prompt_message}]
+    budget = GENERATION_BUDGETS.get(task, GENERATION_BUDGETS["patient_reply"])
+
+    attempts = [
+        ("chat_stream", lambda: _chat_completion_stream(client, messages, model_name, budget,
+                                                        on_chunk, response_format)),
+        ("chat", lambda: _chat_completion_once(client, messages, model_name, budget, response_format)),
+        ("text_generation", lambda: _text_generation(client, prompt_message, model_name, budget,
+                                                     response_format)),
+    ]
+
+    response = await call_with_fallbacks_async(model_name, attempts,
+                                               LLM_BUDGETS.get(task, LLM_BUDGETS["patient_reply"]), task=task)
+    if not response:
+        logger.warning("All LLM call modes failed or timed out - using fallback response")
+        response = FALLBACK_PATIENT_LINE
+    return response
+
+
+async def evaluate_therapist_performance(client, message_history, patient_condition, model_name,
+                                         memory=None, transcript_tokens=1500, output_format="text",
+                                         on_partial=None, json_grammar=False):
+    """
+    Coroutine version of therapy_session.evaluate_therapist_performance.
+
+    Returns:
+        dict: Evaluation ("fallback": True when defaults were used)
+    """
+    evaluation_prompt = build_evaluation_prompt(message_history, patient_condition, memory, transcript_tokens)
+
+    if output_format == "json":
+        try:
+            return await _evaluate_json(client, evaluation_prompt, model_name, on_partial, json_grammar)
+        except Exception as e:
+            logger.error("Error generating JSON evaluation: %s", e)
+            return dict(EVALUATION_DEFAULTS, fallback=True)
+
+    try:
+        evaluation_text = await generate_response(client, evaluation_prompt + TEXT_EVALUATION_FORMAT, model_name,
+                                                  task="evaluation")
+        if evaluation_text == FALLBACK_PATIENT_LINE:
+            raise RuntimeError("all LLM call modes failed")
+        return parse_evaluation(evaluation_text)
+    except Exception as e:
+        logger.error("Error generating evaluation: %s", e)
+        return dict(FALLBACK_EVALUATION)
+
+
+async def _evaluate_json(client, evaluation_prompt, model_name, on_partial=None, json_grammar=False):
+    response_format = {"type": "json", "value": EVALUATION_SCHEMA} if json_grammar else None
+
+    parser = IncrementalEvaluationParser(on_partial)
+    evaluation_text = await generate_response(client, build_json_evaluation_prompt(evaluation_prompt), model_name,
+                                              task="evaluation", on_chunk=parser.feed,
+                                              response_format=response_format)
+    if evaluation_text == FALLBACK_PATIENT_LINE:
+        raise RuntimeError("all LLM call modes failed")
+    evaluation, invalid_fields = parse_evaluation_json(evaluation_text)
+
+    if invalid_fields:
+        logger.warning("Evaluation fields missing or malformed - re-requesting them",
+                       extra={"fields": {"invalid_fields": invalid_fields}})
+        repair_prompt = build_field_repair_prompt(evaluation_prompt, evaluation, invalid_fields)
+        repair_format = {"type": "json", "value": field_schema(invalid_fields)} if json_grammar else None
+        repair_text = await generate_response(client, repair_prompt, model_name, task="evaluation",
+                                              response_format=repair_format)
+        repaired, _ = parse_evaluation_json(repair_text)
+        for field in invalid_fields:
+            if field in repaired:
+                evaluation[field] = repaired[field]
+
+    return apply_evaluation_defaults(evaluation)
+
+
+async def summarize_conversation(client, previous_summary, new_messages, max_tokens, model_name):
+    """
+    Coroutine version of therapy_session.summarize_conversation.
+
+    Returns:
+        str: Updated summary, or "" if generation failed
+    """
+    summary = await generate_response(client, build_summary_prompt(previous_summary, new_messages, max_tokens),
+                                      model_name, task="summarization")
+    if summary == FALLBACK_PATIENT_LINE:
+        return ""
+    return summary
@@ -0,0 +1,242 @@
+"""
+Shared-Memory Audio Handoff
+---------------------------
+Synthesized replies are placed as raw PCM in a ring buffer in shared memory
+(multiprocessing.shared_memory) instead of being written to disk and read back
+by /get_audio. /get_audio serves them straight from memory, with the WAV header
+built on the fly.
+
+Entries are keyed by the audio path the client requests, so the headset API is
+unchanged: each turn's synthesis replaces the previous entry for that path.
+The slot table lives in the same shared block and the lock is created before
+gunicorn forks, so any worker can serve audio synthesized by another.
+
+The ring overwrites its oldest entries when full; requests for evicted audio
+fall back to the file on disk. Disk persistence (AUDIO_PERSIST_TO_DISK) runs on
+a background thread, off the turn's critical path.
+"""
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import struct
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from structured_logging import get_logger
+
+logger = get_logger("audio_buffer")
+
+
+AUDIO_BUFFER_MB = 64          # Ring capacity (about 25 minutes of 22 kHz mono speech)
+AUDIO_BUFFER_SLOTS = 256      # Entries tracked at once
+AUDIO_PERSIST_TO_DISK = True  # Also write each reply to its WAV path (in the background)
+
+_HEADER = struct.Struct("<QQ")                 # write position, next sequence number
+_SLOT = struct.Struct("<32sQQQIHH")            # key hash, sequence, offset, length, rate, width, channels
+
+_ring = None
+
+
+def wav_header(data_length, sample_rate, sample_width=2, channels=1):
+    """44-byte PCM WAV header for data_length bytes of audio."""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack("<4sI4s4sIHHIIHH4sI",
+                       b"RIFF", 36 + data_length, b"WAVE",
+                       b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width,
+                       sample_width * 8,
+                       b"data", data_length)
+
+
+def float_to_pcm16(samples):
+    """Convert TTS float output to 16-bit PCM bytes, normalized the way TTS.tts_to_file saves it."""
+    samples = np.asarray(samples, dtype=np.float32)
+    peak = max(0.01, float(np.max(np.abs(samples)))) if samples.size else 1.0
+    return (samples * (32767 / peak)).astype("<i2").tobytes()
+
+
+def _key(audio_key):
+    return hashlib.sha256(os.path.normpath(audio_key).encode("utf-8")).digest()
+
+
+class SharedAudioRing:
+    """
+    Fixed-size PCM ring in one shared memory block: a header, a slot table and
+    the data area. Entries never wrap around the end of the data area.
+
+    Args:
+        capacity_bytes: Size of the data area
+        slots: Maximum number of entries tracked at once
+    """
+
+    def __init__(self, capacity_bytes, slots=AUDIO_BUFFER_SLOTS):
+        self.capacity = int(capacity_bytes)
+        self.slots = int(slots)
+        self._table_offset = _HEADER.size
+        self._data_offset = self._table_offset + _SLOT.size * self.slots
+        self.shm = shared_memory.SharedMemory(create=True, size=self._data_offset + self.capacity)
+        self.shm.buf[:self._data_offset] = bytes(self._data_offset)
+        self.lock = multiprocessing.Lock()
+        self._owner_pid = os.getpid()
+        atexit.register(self.close)
+
+    def _read_slot(self, index):
+        return _SLOT.unpack_from(self.shm.buf, self._table_offset + index * _SLOT.size)
+
+    def _write_slot(self, index, *values):
+        _SLOT.pack_into(self.shm.buf, self._table_offset + index * _SLOT.size, *values)
+
+    def _find(self, key):
+        for index in range(self.slots):
+            slot = self._read_slot(index)
+            if slot[0] == key and slot[3] > 0:
+                return index, slot
+        return None, None
+
+    def put(self, audio_key, pcm, sample_rate, sample_width=2, channels=1):
+        """
+        Store one reply's PCM under audio_key, replacing any earlier entry.
+
+        Returns:
+            bool: False if the audio is larger than the whole ring
+        """
+        length = len(pcm)
+        if length == 0 or length > self.capacity:
+            return False
+        key = _key(audio_key)
+
+        with self.lock:
+            position, sequence = _HEADER.unpack_from(self.shm.buf, 0)
+            if position + length > self.capacity:
+                position = 0
+
+            # Drop the old entry for this key and any entry the new data overwrites
+            for index in range(self.slots):
+                slot = self._read_slot(index)
+                if slot[3] == 0:
+                    continue
+                overlaps = slot[2] < position + length and position < slot[2] + slot[3]
+                if slot[0] == key or overlaps:
+                    self._write_slot(index, b"", 0, 0, 0, 0, 0, 0)
+
+            start = self._data_offset + position
+            self.shm.buf[start:start + length] = pcm
+            self._write_slot(sequence % self.slots, key, sequence, position, length,
+                             sample_rate, sample_width, channels)
+            _HEADER.pack_into(self.shm.buf, 0, position + length, sequence + 1)
+        return True
+
+    def get(self, audio_key):
+        """
+        Returns:
+            tuple: (pcm bytes, sample_rate, sample_width, channels), or None if absent or evicted
+        """
+        with self.lock:
+            _, slot = self._find(_key(audio_key))
+            if slot is None:
+                return None
+            _, _, position, length, sample_rate, sample_width, channels = slot
+            start = self._data_offset + position
+            return bytes(self.shm.buf[start:start + length]), sample_rate, sample_width, channels
+
+    def discard(self, audio_key):
+        """Forget audio_key (e.g. when this turn's reply is served from a file instead)."""
+        with self.lock:
+            index, _ = self._find(_key(audio_key))
+            if index is not None:
+                self._write_slot(index, b"", 0, 0, 0, 0, 0, 0)
+
+    def snapshot(self):
+        with self.lock:
+            position, sequence = _HEADER.unpack_from(self.shm.buf, 0)
+            entries = [self._read_slot(index) for index in range(self.slots)]
+        live = [slot for slot in entries if slot[3] > 0]
+        return {
+            "capacity_bytes": self.capacity,
+            "entries": len(live),
+            "bytes_used": sum(slot[3] for slot in live),
+            "write_position": position,
+            "replies_stored": sequence,
+        }
+
+    def close(self):
+        try:
+            self.shm.close()
+            if os.getpid() == self._owner_pid:
+                self.shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+def configure_audio_buffer(size_mb=None, persist_to_disk=None):
+    """Create the shared ring (size_mb=0 disables it). Call before workers fork."""
+    global AUDIO_BUFFER_MB, AUDIO_PERSIST_TO_DISK, _ring
+    if size_mb is not None:
+        AUDIO_BUFFER_MB = float(size_mb)
+    if persist_to_disk is not None:
+        AUDIO_PERSIST_TO_DISK = bool(persist_to_disk)
+    if _ring is not None:
+        _ring.close()
+        _ring = None
+    if AUDIO_BUFFER_MB > 0:
+        _ring = SharedAudioRing(int(AUDIO_BUFFER_MB * 1024 * 1024))
+    return _ring
+
+
+def get_audio_ring():
+    return _ring
+
+
+def _write_wav(path, pcm, sample_rate, sample_width, channels):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(wav_header(len(pcm), sample_rate, sample_width, channels))
+            f.write(pcm)
+    except Exception as e:
+        logger.warning("Could not persist audio to %s: %s", path, e)
+
+
+def publish_audio(audio_key, pcm, sample_rate, sample_width=2, channels=1):
+    """
+    Make a reply available to /get_audio: in the shared ring when enabled,
+    with the WAV file written in the background (or synchronously when the
+    ring is disabled or the reply does not fit).
+
+    Returns:
+        bool: True once the audio can be served
+    """
+    stored = _ring is not None and _ring.put(audio_key, pcm, sample_rate, sample_width, channels)
+    if not stored:
+        _write_wav(audio_key, pcm, sample_rate, sample_width, channels)
+    elif AUDIO_PERSIST_TO_DISK:
+        threading.Thread(target=_write_wav, args=(audio_key, pcm, sample_rate, sample_width, channels),
+                         name="audio-persist", daemon=True).start()
+    return True
+
+
+def discard_audio(audio_key):
+    """Drop any buffered reply for audio_key so /get_audio falls back to the file."""
+    if _ring is not None:
+        _ring.discard(audio_key)
+
+
+def read_buffered_wav(audio_key):
+    """
+    Returns:
+        tuple: (WAV header bytes, PCM bytes) for a buffered reply, or None
+    """
+    if _ring is None:
+        return None
+    entry = _ring.get(audio_key)
+    if entry is None:
+        return None
+    pcm, sample_rate, sample_width, channels = entry
+    return wav_header(len(pcm), sample_rate, sample_width, channels), pcm
+
+
+def get_audio_buffer_metrics():
+    return _ring.snapshot() if _ring is not None else {"enabled": False}
@@ -0,0 +1,293 @@
+"""
+Pre-synthesized Audio Library
+-----------------------------
+Opening lines for every patient condition/severity and the fixed header of the
+end-of-session summary are synthesized once, ahead of time, and stored as
+ready-to-serve WAV files with an index. The first and last turns of a session
+can then be served (or spliced together) without waiting on TTS.
+
+Build the library once after installing the TTS models:
+    python audio_library.py
+
+Or set "BUILD_AUDIO_LIBRARY_ON_STARTUP": true in config.json to build any
+missing clips while the server warms up.
+"""
+
+import os
+import json
+import random
+import shutil
+import wave
+
+from structured_logging import get_logger
+from therapy_session import PATIENT_CONDITIONS, synthesize_speech
+
+logger = get_logger("audio_library")
+
+
+AUDIO_LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AudioLibrary")
+INDEX_FILENAME = "index.json"
+
+SEVERITY_LEVELS = ["mild", "moderate", "severe"]
+
+# Fixed first sentence of the end-of-session summary spoken to the trainee
+EVALUATION_SUMMARY_HEADER = "Thank you for the session. Here's your performance: Score {score}/100."
+
+# Common first replies from Sarah, written to follow the speech patterns in
+# get_speech_pattern_guidance() and the "hesitant, guarded" opening guidance.
+PATIENT_OPENERS = {
+    "Anxiety": {
+        "mild": [
+            "Hi, thanks. I'm okay, I think. It's probably nothing serious, but I've been worrying a lot lately.",
+            "I'm alright, mostly. I just feel a bit on edge, and I'm not sure if that's normal.",
+            "Thanks for seeing me. I've been a little stressed, but I'm sure lots of people feel this way.",
+        ],
+        "moderate": [
+            "Honestly, I'm a bit nervous being here. My mind just keeps racing and I can't seem to switch it off.",
+            "I'm... okay, I guess. I haven't been sleeping well, and I keep thinking something is going to go wrong.",
+            "Sorry, I'm a little jittery today. Is it normal to feel this anxious about coming to therapy?",
+        ],
+        "severe": [
+            "I almost didn't come in today. My heart's been pounding all morning and I can't stop thinking the worst.",
+            "I'm not doing well, honestly. Everything feels like too much and I can't calm down, even right now.",
+            "Sorry, I'm really on edge. I keep feeling like something terrible is about to happen, and I don't know why.",
+        ],
+    },
+    "Depression": {
+        "mild": [
+            "I'm okay, I suppose. Things have just felt a bit flat lately.",
+            "Fine, mostly. I just haven't been enjoying things the way I used to.",
+            "Hi. I'm not sure I really need to be here, but I've been feeling kind of low.",
+        ],
+        "moderate": [
+            "Not great, honestly. I'm tired all the time and nothing really feels worth the effort.",
+            "I don't know. It's been hard to get out of bed most days.",
+            "I'm here, I guess. I'm not sure talking will help, but I said I'd try.",
+        ],
+        "severe": [
+            "I don't really know why I'm here. Nothing seems to help anymore.",
+            "Bad. Everything just feels heavy, and I can't remember the last time I felt okay.",
+            "I'm just... tired. Of everything, really.",
+        ],
+    },
+    "Bipolar Disorder": {
+        "mild": [
+            "Hi, I'm good, actually pretty good this week. Although last week was kind of rough, so who knows.",
+            "I'm alright. My moods have been a bit all over the place lately, but I'm managing.",
+            "Thanks for having me. Some days I feel great and some days I really don't, and I can't tell why.",
+        ],
+        "moderate": [
+            "Honestly I've got so much going on right now, I started three new projects this week. Although I haven't really slept much.",
+            "I'm okay today, but I'm not sure how long that will last. It's been up and down a lot.",
+            "I don't know where to start. A couple of weeks ago I felt unstoppable, and now I can barely get through the day.",
+        ],
+        "severe": [
+            "I really don't see why everyone thinks I need this. I feel amazing, I've got so many ideas right now.",
+            "Everything's been a mess. One week I'm spending money like crazy and the next I can't get off the couch.",
+            "I'm exhausted, and I'm tired of people telling me how I feel. I just want things to be stable for once.",
+        ],
+    },
+    "PTSD": {
+        "mild": [
+            "I'm okay. I've just been having some bad dreams lately, and I wanted to talk to someone about it.",
+            "Hi. I'm mostly fine, but some things have been bringing up old memories.",
+            "Thanks. I'm alright, I just get a bit jumpy sometimes and I'd like to understand why.",
+        ],
+        "moderate": [
+            "I'm... managing. I don't really like talking about what happened, if that's okay.",
+            "Not great. I keep having these flashbacks, and loud noises really set me off.",
+            "Can I sit where I can see the door? Sorry, I just feel better that way.",
+        ],
+        "severe": [
+            "I haven't slept properly in weeks. Every time I close my eyes it's like I'm right back there.",
+            "I don't feel safe most of the time. I'm not sure I can talk about it yet.",
+            "Sorry, I just... zoned out for a second. It keeps happening, and I don't know how to stop it.",
+        ],
+    },
+}
+
+# Loaded library index (populated by load_audio_library)
+_library_index = None
+_library_dir = AUDIO_LIBRARY_DIR
+
+
+def _condition_slug(condition):
+    """Convert a condition name to a directory-safe slug."""
+    return condition.lower().replace(" ", "_")
+
+
+def build_audio_library(output_dir=AUDIO_LIBRARY_DIR, force=False):
+    """
+    Synthesize every opener and summary header clip into the library directory.
+
+    Clips that already exist are skipped unless force is True, so the build can
+    be re-run cheaply after adding new lines.
+
+    Args:
+        output_dir: Directory where the clips and index are written
+        force: Re-synthesize clips even if they already exist
+
+    Returns:
+        dict: The library index that was written
+    """
+    index = {"openers": {}, "summary_headers": {}}
+    synthesized = 0
+
+    for condition in PATIENT_CONDITIONS:
+        index["openers"][condition] = {}
+        for severity in SEVERITY_LEVELS:
+            entries = []
+            for i, text in enumerate(PATIENT_OPENERS.get(condition, {}).get(severity, [])):
+                rel_path = os.path.join("openers", _condition_slug(condition), severity, f"opener_{i}.wav")
+                abs_path = os.path.join(output_dir, rel_path)
+                if force or not os.path.exists(abs_path):
+                    if not synthesize_speech(text, abs_path):
+                        print(f"⚠ Skipping opener clip (synthesis failed): {rel_path}")
+                        continue
+                    synthesized += 1
+                entries.append({"text": text, "path": rel_path})
+            index["openers"][condition][severity] = entries
+
+    for score in range(0, 101):
+        rel_path = os.path.join("summary", f"score_{score}.wav")
+        abs_path = os.path.join(output_dir, rel_path)
+        if force or not os.path.exists(abs_path):
+            if not synthesize_speech(EVALUATION_SUMMARY_HEADER.format(score=score), abs_path):
+                print(f"⚠ Skipping summary clip (synthesis failed): {rel_path}")
+                continue
+            synthesized += 1
+        index["summary_headers"][str(score)] = rel_path
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, INDEX_FILENAME), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    print(f"✓ Audio library built: {synthesized} new clips synthesized in {output_dir}")
+    return index
+
+
+def load_audio_library(library_dir=AUDIO_LIBRARY_DIR):
+    """
+    Load the library index so clips can be selected at request time.
+
+    Returns:
+        bool: True if an index was found and loaded, False otherwise
+    """
+    global _library_index, _library_dir
+    index_path = os.path.join(library_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        _library_index = None
+        return False
+
+    try:
+        with open(index_path) as f:
+            _library_index = json.load(f)
+        _library_dir = library_dir
+        return True
+    except Exception as e:
+        print(f"⚠ Could not load audio library index: {e}")
+        _library_index = None
+        return False
+
+
+def select_opener(condition, severity):
+    """
+    Pick a pre-synthesized opening line for the given condition and severity.
+
+    Returns:
+        tuple: (text, clip_path) or None if no clip is available
+    """
+    if _library_index is None:
+        return None
+
+    entries = _library_index.get("openers", {}).get(condition, {}).get(severity, [])
+    entries = [e for e in entries if os.path.exists(os.path.join(_library_dir, e["path"]))]
+    if not entries:
+        return None
+
+    entry = random.choice(entries)
+    return entry["text"], os.path.join(_library_dir, entry["path"])
+
+
+def get_summary_header_clip(score):
+    """Return the path of the pre-synthesized summary header for a score, or None."""
+    if _library_index is None:
+        return None
+
+    rel_path = _library_index.get("summary_headers", {}).get(str(score))
+    if rel_path is None:
+        return None
+    clip_path = os.path.join(_library_dir, rel_path)
+    return clip_path if os.path.exists(clip_path) else None
+
+
+def build_evaluation_summary(evaluation):
+    """
+    Build the spoken end-of-session summary.
+
+    Returns:
+        tuple: (header, body) where header is the fixed, pre-synthesizable sentence
+    """
+    header = EVALUATION_SUMMARY_HEADER.format(score=evaluation['score'])
+    body = f"You did well in: {', '.join(evaluation['strengths'][:2])}. " + \
+           f"Consider improving: {', '.join(evaluation['improvements'][:2])}."
+    return header, body
+
+
+def serve_library_clip(clip_path, output_path):
+    """Copy a library clip to the location the client will fetch it from."""
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        shutil.copyfile(clip_path, output_path)
+        return True
+    except Exception as e:
+        logger.error("Error serving library clip: %s", e)
+        return False
+
+
+def splice_wav_files(input_paths, output_path):
+    """
+    Concatenate WAV files that share the same format into a single file.
+
+    Args:
+        input_paths: WAV files to join, in playback order
+        output_path: Path of the combined WAV file
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        params = None
+        frames = []
+        for path in input_paths:
+            with wave.open(path, 'rb') as w:
+                current = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+                if params is None:
+                    params = current
+                elif current != params:
+                    logger.warning("Cannot splice %s: format %s does not match %s", path, current, params)
+                    return False
+                frames.append(w.readframes(w.getnframes()))
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with wave.open(output_path, 'wb') as out:
+            out.setnchannels(params[0])
+            out.setsampwidth(params[1])
+            out.setframerate(params[2])
+            out.writeframes(b"".join(frames))
+        return True
+
+    except Exception as e:
+        logger.error("Error splicing audio: %s", e)
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the pre-synthesized opener/summary audio library")
+    parser.add_argument("--output-dir", default=AUDIO_LIBRARY_DIR, help="Library directory")
+    parser.add_argument("--force", action="store_true", help="Re-synthesize existing clips")
+    args = parser.parse_args()
+
+    build_audio_library(args.output_dir, force=args.force)
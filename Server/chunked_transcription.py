@@ -0,0 +1,163 @@
+"""
+Chunked Transcription
+---------------------
+Transcribes long utterances in fixed windows instead of loading the whole WAV
+into one AudioData and sending it as a single request.
+
+The file is streamed window by window (with a small overlap so words cut at a
+boundary are heard whole in one of the two windows). Windows are recognized
+concurrently, with at most ASR_MAX_IN_FLIGHT windows held in memory at once,
+and the texts are stitched back together by dropping the words repeated in the
+overlap. Peak memory is bounded by the window size, not the utterance length.
+"""
+
+import re
+import wave
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import speech_recognition as sr
+
+from structured_logging import get_logger, with_log_context
+
+logger = get_logger("asr")
+
+
+ASR_CHUNK_SECONDS = 20.0          # Window length; 0 disables chunking
+ASR_CHUNK_OVERLAP_SECONDS = 1.0   # Audio shared by neighbouring windows
+ASR_MAX_IN_FLIGHT = 3             # Windows being recognized (and held in memory) at once
+MAX_STITCH_OVERLAP_WORDS = 8      # Longest repeated word run removed when stitching
+
+UNKNOWN_AUDIO_MESSAGE = "Speech recognition could not understand audio"
+ERROR_MESSAGE = "Error occurred during speech recognition: {error}"
+
+
+def configure_chunked_transcription(chunk_seconds=None, overlap_seconds=None, max_in_flight=None):
+    """Override window length, overlap and concurrency (None keeps the default)."""
+    global ASR_CHUNK_SECONDS, ASR_CHUNK_OVERLAP_SECONDS, ASR_MAX_IN_FLIGHT
+    if chunk_seconds is not None:
+        ASR_CHUNK_SECONDS = float(chunk_seconds)
+    if overlap_seconds is not None:
+        ASR_CHUNK_OVERLAP_SECONDS = float(overlap_seconds)
+    if max_in_flight is not None:
+        ASR_MAX_IN_FLIGHT = max(1, int(max_in_flight))
+
+
+def should_chunk(input_path):
+    """True when input_path is a mono PCM WAV longer than one window."""
+    if ASR_CHUNK_SECONDS <= 0:
+        return False
+    try:
+        with wave.open(input_path, 'rb') as w:
+            return w.getnchannels() == 1 and w.getnframes() > ASR_CHUNK_SECONDS * w.getframerate()
+    except (wave.Error, EOFError, OSError):
+        # Not a plain WAV (FLAC/AIFF, compressed WAV) - let the whole-file path handle it
+        return False
+
+
+def iter_wav_windows(input_path, chunk_seconds, overlap_seconds):
+    """
+    Stream a mono WAV as overlapping windows.
+
+    Yields:
+        tuple: (frame bytes, sample_rate, sample_width) - one window at a time
+    """
+    with wave.open(input_path, 'rb') as w:
+        sample_rate = w.getframerate()
+        sample_width = w.getsampwidth()
+        window_frames = max(1, int(chunk_seconds * sample_rate))
+        overlap_frames = min(int(overlap_seconds * sample_rate), window_frames // 2)
+        overlap_bytes = overlap_frames * sample_width
+
+        carry = b""
+        while True:
+            fresh = w.readframes(window_frames - len(carry) // sample_width)
+            if not fresh:
+                return
+            window = carry + fresh
+            yield window, sample_rate, sample_width
+            carry = window[-overlap_bytes:] if overlap_bytes else b""
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(texts, max_overlap_words=MAX_STITCH_OVERLAP_WORDS):
+    """
+    Join window transcripts, dropping words repeated across a window boundary.
+
+    The longest run (up to max_overlap_words) that ends one window and starts
+    the next is kept once.
+    """
+    words = []
+    for text in texts:
+        next_words = (text or "").split()
+        if not next_words:
+            continue
+        limit = min(max_overlap_words, len(words), len(next_words))
+        for size in range(limit, 0, -1):
+            tail = [_normalize(word) for word in words[-size:]]
+            head = [_normalize(word) for word in next_words[:size]]
+            if tail == head:
+                next_words = next_words[size:]
+                break
+        words.extend(next_words)
+    return " ".join(words)
+
+
+def _recognize_window(frame_data, sample_rate, sample_width):
+    """Recognize one window; "" when it holds no recognizable speech."""
+    recognizer = sr.Recognizer()
+    audio = sr.AudioData(frame_data, sample_rate, sample_width)
+    try:
+        return recognizer.recognize_google(audio)
+    except sr.UnknownValueError:
+        return ""
+
+
+def transcribe_audio_chunked(input_path, chunk_seconds=None, overlap_seconds=None, max_in_flight=None):
+    """
+    Transcribe a long WAV window by window.
+
+    Args:
+        input_path: Mono PCM WAV file
+        chunk_seconds, overlap_seconds, max_in_flight: Override the module settings
+
+    Returns:
+        str: The stitched transcript, or the same messages transcribe_audio returns
+             when nothing was understood or the recognizer failed
+    """
+    chunk_seconds = chunk_seconds or ASR_CHUNK_SECONDS
+    overlap_seconds = ASR_CHUNK_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    max_in_flight = max_in_flight or ASR_MAX_IN_FLIGHT
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="asr-chunk") as executor:
+        pending = {}
+        try:
+            for index, (frame_data, sample_rate, sample_width) in enumerate(
+                    iter_wav_windows(input_path, chunk_seconds, overlap_seconds)):
+                # Don't read further ahead than the recognizer can keep up with
+                while len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                future = executor.submit(with_log_context(_recognize_window), frame_data, sample_rate, sample_width)
+                pending[future] = index
+                del frame_data
+
+            for future in list(pending):
+                results[pending.pop(future)] = future.result()
+
+        except sr.RequestError as e:
+            for future in pending:
+                future.cancel()
+            return ERROR_MESSAGE.format(error=e)
+        except (wave.Error, EOFError, OSError) as e:
+            for future in pending:
+                future.cancel()
+            return ERROR_MESSAGE.format(error=e)
+
+    text = stitch_transcripts(results[index] for index in sorted(results))
+    logger.info("Transcribed %d audio windows", len(results))
+    return text or UNKNOWN_AUDIO_MESSAGE
@@ -0,0 +1,212 @@
+"""
+Token-budgeted Conversation Memory
+----------------------------------
+Keeps the most recent turns of a session verbatim and folds older turns into a
+rolling summary, so the conversation context in the patient prompt (and the
+transcript in the evaluation prompt) stays roughly the same size no matter how
+long the session runs.
+
+The summary is refreshed by an LLM call on a background thread (or an asyncio
+task, in async_app.py) between turns; a turn never waits for it.
+"""
+
+import asyncio
+import threading
+
+from structured_logging import get_logger, with_log_context
+
+logger = get_logger("memory")
+
+
+# Fallback when no tokenizer is available: ~4 characters per token for English
+CHARS_PER_TOKEN = 4
+
+_token_counters = {}
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter(model_name=None, hf_token=None):
+    """
+    Return a function counting tokens the way model_name's tokenizer does.
+
+    Uses the model's Hugging Face tokenizer when `transformers` is installed and
+    the tokenizer can be downloaded; otherwise falls back to a character-based
+    estimate. Counters are cached per model.
+    """
+    with _token_counter_lock:
+        if model_name in _token_counters:
+            return _token_counters[model_name]
+
+        counter = None
+        if model_name:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
+                counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+                logger.info("Conversation memory using %s tokenizer", model_name)
+            except Exception as e:
+                logger.warning("Tokenizer for %s unavailable (%s); estimating token counts", model_name, e)
+
+        if counter is None:
+            counter = lambda text: max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+        _token_counters[model_name] = counter
+        return counter
+
+
+class ConversationMemory:
+    """
+    Rolling summary + verbatim recent turns over a shared message list.
+
+    Args:
+        messages: The session's message history list ({"role", "content"} dicts).
+                  The memory reads it in place, so callers keep appending to it.
+        recent_tokens: Token budget for turns kept verbatim
+        summary_tokens: Token budget for the rolling summary
+        token_counter: Function returning the token count of a string
+        min_recent_messages: Always keep at least this many latest messages verbatim
+    """
+
+    def __init__(self, messages, recent_tokens=400, summary_tokens=200, token_counter=None,
+                 min_recent_messages=2):
+        self.messages = messages
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.count_tokens = token_counter or get_token_counter()
+        self.min_recent_messages = min_recent_messages
+        self.summary = ""
+        self.summarized_count = 0      # messages[:summarized_count] are covered by the summary
+        self._generation = 0           # bumped on reset so stale summaries are discarded
+        self._lock = threading.Lock()
+        self._summary_thread = None
+        self._summary_task = None
+
+    def reset(self):
+        """Forget the summary (call after clearing the message list)."""
+        with self._lock:
+            self.summary = ""
+            self.summarized_count = 0
+            self._generation += 1
+
+    def _recent_start(self, budget):
+        """Index of the oldest message that still fits in the verbatim budget."""
+        start = len(self.messages)
+        used = 0
+        while start > 0:
+            cost = self.count_tokens(self.messages[start - 1]["content"])
+            keep_anyway = len(self.messages) - start < self.min_recent_messages
+            if used + cost > budget and not keep_anyway:
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def _render(self, budget, therapist_label, patient_label, summary_heading):
+        with self._lock:
+            summary = self.summary
+            summarized_count = self.summarized_count
+
+        start = self._recent_start(budget)
+        lines = []
+        if summary and summarized_count > 0:
+            lines.append(f"{summary_heading}: {summary}")
+            # Turns already covered by the summary are not repeated verbatim
+            start = max(start, summarized_count)
+        elif start > 0:
+            lines.append("(Earlier parts of the session are not shown.)")
+
+        for msg in self.messages[start:]:
+            role = therapist_label if msg["role"] == "therapist" else patient_label
+            lines.append(f"{role}: {msg['content']}")
+        return "\n".join(lines)
+
+    def render_context(self):
+        """Conversation context for the patient prompt (patient speaks as "You")."""
+        return self._render(self.recent_tokens, "Therapist", "You", "Summary of earlier in the session")
+
+    def render_transcript(self, budget_tokens):
+        """Transcript for the evaluation prompt, bounded by budget_tokens."""
+        return self._render(budget_tokens, "Therapist", "Patient", "Summary of the earlier part of the session")
+
+    def _pending_range(self):
+        """(start, end) of messages that have aged out of the verbatim window but are not yet summarized."""
+        with self._lock:
+            summarized_count = self.summarized_count
+        cutoff = self._recent_start(self.recent_tokens)
+        return summarized_count, cutoff
+
+    def update_summary_async(self, summarize):
+        """
+        Fold aged-out messages into the rolling summary on a background thread.
+
+        Args:
+            summarize: Function (previous_summary, messages, max_tokens) -> str
+
+        Returns:
+            bool: True if an update was started
+        """
+        if self._summary_thread is not None and self._summary_thread.is_alive():
+            return False  # Previous update still running; the next turn will catch up
+
+        update = self._begin_update()
+        if update is None:
+            return False
+        generation, previous_summary, new_messages, cutoff = update
+
+        def run():
+            try:
+                summary = summarize(previous_summary, new_messages, self.summary_tokens)
+            except Exception as e:
+                logger.warning("Conversation summary update failed: %s", e)
+                return
+            self._apply_summary(generation, cutoff, summary)
+
+        self._summary_thread = threading.Thread(target=with_log_context(run), name="conversation-summary", daemon=True)
+        self._summary_thread.start()
+        return True
+
+    def update_summary_task(self, summarize):
+        """
+        Coroutine version of update_summary_async, as an asyncio task (async_app.py).
+
+        Args:
+            summarize: Coroutine function (previous_summary, messages, max_tokens) -> str
+
+        Returns:
+            bool: True if an update was started
+        """
+        if self._summary_task is not None and not self._summary_task.done():
+            return False
+
+        update = self._begin_update()
+        if update is None:
+            return False
+        generation, previous_summary, new_messages, cutoff = update
+
+        async def run():
+            try:
+                summary = await summarize(previous_summary, new_messages, self.summary_tokens)
+            except Exception as e:
+                logger.warning("Conversation summary update failed: %s", e)
+                return
+            self._apply_summary(generation, cutoff, summary)
+
+        self._summary_task = asyncio.ensure_future(run())
+        return True
+
+    def _begin_update(self):
+        """(generation, previous summary, messages to fold in, cutoff), or None if nothing aged out."""
+        start, cutoff = self._pending_range()
+        if cutoff <= start:
+            return None
+        with self._lock:
+            return self._generation, self.summary, list(self.messages[start:cutoff]), cutoff
+
+    def _apply_summary(self, generation, cutoff, summary):
+        if not summary:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # Session was reset while summarizing
+            self.summary = summary.strip()
+            self.summarized_count = cutoff
@@ -0,0 +1,227 @@
+"""
+Multi-Sample Evaluation
+-----------------------
+Runs K evaluation samples concurrently and aggregates them into one, which
+smooths out single-call noise at temperature 0.7:
+
+- score: median of the sample scores
+- strengths / improvements: near-duplicate items (difflib similarity) merged,
+  ranked by how many samples raised them, then by how early they were listed
+- feedback: taken from the sample whose score is closest to the median
+- disagreement: score spread plus how consistently the top items recur
+
+Samples run in parallel, so wall-clock time stays close to one call. Once the
+first sample is back, the rest get EVALUATION_SAMPLE_GRACE_FRACTION of that
+time to finish, and late or failed samples are left out.
+evaluate_with_samples_async() runs the samples as asyncio tasks (async_app.py).
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from difflib import SequenceMatcher
+
+from evaluation_schema import EVALUATION_DEFAULTS
+from structured_logging import get_logger, with_log_context
+
+logger = get_logger("evaluation")
+
+
+EVALUATION_SAMPLES = 1                  # K; 1 keeps the single-call behaviour
+EVALUATION_SAMPLE_GRACE_FRACTION = 0.5  # Extra wait for stragglers, relative to the first sample
+ITEM_SIMILARITY_THRESHOLD = 0.6         # difflib ratio at which two items count as the same point
+MAX_ITEMS = 5
+
+
+def configure_evaluation_samples(samples=None, grace_fraction=None):
+    """Override K and the straggler grace (None keeps the default)."""
+    global EVALUATION_SAMPLES, EVALUATION_SAMPLE_GRACE_FRACTION
+    if samples is not None:
+        EVALUATION_SAMPLES = max(1, int(samples))
+    if grace_fraction is not None:
+        EVALUATION_SAMPLE_GRACE_FRACTION = max(0.0, float(grace_fraction))
+
+
+def _normalize(item):
+    return " ".join(item.lower().strip(" .-").split())
+
+
+def merge_items(samples, field):
+    """
+    Merge one list field across samples.
+
+    Returns:
+        list: (item text, number of samples that raised it) ranked by support,
+              then by average position in the sample lists
+    """
+    clusters = []  # dicts: text, normalized, samples (set of sample indexes), positions
+    for sample_index, sample in enumerate(samples):
+        for position, item in enumerate(sample.get(field, [])):
+            normalized = _normalize(item)
+            if not normalized:
+                continue
+            best, best_ratio = None, 0.0
+            for cluster in clusters:
+                ratio = SequenceMatcher(None, normalized, cluster["normalized"]).ratio()
+                if ratio > best_ratio:
+                    best, best_ratio = cluster, ratio
+            if best is not None and best_ratio >= ITEM_SIMILARITY_THRESHOLD:
+                best["samples"].add(sample_index)
+                best["positions"].append(position)
+            else:
+                clusters.append({"text": item.strip(), "normalized": normalized,
+                                 "samples": {sample_index}, "positions": [position]})
+
+    clusters.sort(key=lambda c: (-len(c["samples"]), sum(c["positions"]) / len(c["positions"])))
+    return [(cluster["text"], len(cluster["samples"])) for cluster in clusters]
+
+
+def aggregate_evaluations(samples):
+    """
+    Combine evaluation samples into one evaluation.
+
+    Args:
+        samples: Evaluation dicts (score, strengths, improvements, feedback)
+
+    Returns:
+        dict: Aggregated evaluation with "samples" and "disagreement" details
+    """
+    scores = [sample["score"] for sample in samples]
+    score = int(round(statistics.median(scores)))
+
+    strengths = merge_items(samples, "strengths")
+    improvements = merge_items(samples, "improvements")
+
+    # Feedback has to read as one voice, so take it from the most typical sample
+    typical = min(samples, key=lambda sample: abs(sample["score"] - score))
+
+    top_items = strengths[:3] + improvements[:3]
+    item_agreement = (sum(support for _, support in top_items) / (len(top_items) * len(samples))
+                      if top_items else None)
+
+    return {
+        "score": score,
+        "strengths": [text for text, _ in strengths[:MAX_ITEMS]],
+        "improvements": [text for text, _ in improvements[:MAX_ITEMS]],
+        "feedback": typical["feedback"],
+        "samples": {"completed": len(samples), "scores": scores},
+        "disagreement": {
+            "score_stdev": round(statistics.pstdev(scores), 2),
+            "score_range": max(scores) - min(scores),
+            "item_agreement": round(item_agreement, 2) if item_agreement is not None else None,
+        },
+    }
+
+
+def evaluate_with_samples(evaluate_fn, samples=None, timeout_seconds=None):
+    """
+    Run evaluate_fn K times concurrently and aggregate the results.
+
+    Args:
+        evaluate_fn: Callable returning one evaluation dict; results marked
+                     "fallback" (every LLM call failed) are left out
+        samples: K (default EVALUATION_SAMPLES)
+        timeout_seconds: Hard limit for the whole ensemble
+
+    Returns:
+        dict: The aggregated evaluation, or a single fallback evaluation if no
+              sample succeeded
+    """
+    samples = samples or EVALUATION_SAMPLES
+    if samples <= 1:
+        return evaluate_fn()
+
+    start = time.perf_counter()
+    deadline = start + timeout_seconds if timeout_seconds else None
+    results = []
+    fallback = None
+
+    executor = ThreadPoolExecutor(max_workers=samples, thread_name_prefix="evaluation-sample")
+    pending = {executor.submit(with_log_context(evaluate_fn)) for _ in range(samples)}
+    try:
+        while pending:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+            done, pending = wait(pending, timeout=None if deadline is None else deadline - now,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    evaluation = future.result()
+                except Exception as e:
+                    logger.warning("Evaluation sample failed: %s", e)
+                    continue
+                if evaluation.get("fallback"):
+                    fallback = fallback or evaluation
+                    continue
+                if not results:
+                    # The first good sample sets how long the stragglers may take
+                    elapsed = time.perf_counter() - start
+                    grace_deadline = start + elapsed * (1 + EVALUATION_SAMPLE_GRACE_FRACTION)
+                    deadline = grace_deadline if deadline is None else min(deadline, grace_deadline)
+                results.append(evaluation)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    return _finish_samples(results, fallback, len(pending), samples, start)
+
+
+async def evaluate_with_samples_async(evaluate_fn, samples=None, timeout_seconds=None):
+    """
+    Coroutine version of evaluate_with_samples; evaluate_fn is a coroutine function.
+    """
+    samples = samples or EVALUATION_SAMPLES
+    if samples <= 1:
+        return await evaluate_fn()
+
+    start = time.perf_counter()
+    deadline = start + timeout_seconds if timeout_seconds else None
+    results = []
+    fallback = None
+
+    pending = {asyncio.ensure_future(evaluate_fn()) for _ in range(samples)}
+    try:
+        while pending:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+            done, pending = await asyncio.wait(pending, timeout=None if deadline is None else deadline - now,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    evaluation = task.result()
+                except Exception as e:
+                    logger.warning("Evaluation sample failed: %s", e)
+                    continue
+                if evaluation.get("fallback"):
+                    fallback = fallback or evaluation
+                    continue
+                if not results:
+                    elapsed = time.perf_counter() - start
+                    grace_deadline = start + elapsed * (1 + EVALUATION_SAMPLE_GRACE_FRACTION)
+                    deadline = grace_deadline if deadline is None else min(deadline, grace_deadline)
+                results.append(evaluation)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return _finish_samples(results, fallback, len(pending), samples, start)
+
+
+def _finish_samples(results, fallback, unfinished, samples, start):
+    if unfinished:
+        logger.warning("%d evaluation sample(s) still running after the deadline - aggregating without them",
+                       unfinished)
+    if not results:
+        logger.warning("No evaluation sample succeeded")
+        return fallback or dict(EVALUATION_DEFAULTS, fallback=True)
+
+    aggregated = aggregate_evaluations(results)
+    aggregated["samples"]["requested"] = samples
+    logger.info("Aggregated evaluation samples", extra={"fields": {
+        "completed": len(results), "requested": samples,
+        "seconds": round(time.perf_counter() - start, 2), **aggregated["disagreement"]}})
+    return aggregated
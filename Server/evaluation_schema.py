@@ -0,0 +1,290 @@
+"""
+Structured Evaluation Output
+----------------------------
+JSON mode for the end-of-session evaluation. The model is asked for a single
+JSON object matching EVALUATION_SCHEMA instead of the SCORE:/STRENGTHS: text
+format, and the reply is:
+
+- parsed incrementally while it streams, so the score and the first
+  strengths/improvements are available before generation finishes
+  (IncrementalEvaluationParser), and
+- validated field by field, so a malformed field can be re-requested on its
+  own instead of throwing away the whole evaluation (build_field_repair_prompt).
+
+Enable with "EVALUATION_FORMAT": "json" in config.json.
+"""
+
+import json
+import re
+
+from structured_logging import get_logger
+
+logger = get_logger("evaluation")
+
+
+EVALUATION_FIELDS = ("score", "strengths", "improvements", "feedback")
+LIST_FIELDS = ("strengths", "improvements")
+MAX_LIST_ITEMS = 5
+
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "strengths": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": MAX_LIST_ITEMS},
+        "improvements": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": MAX_LIST_ITEMS},
+        "feedback": {"type": "string"},
+    },
+    "required": list(EVALUATION_FIELDS),
+}
+
+# Used for fields that are still invalid after the repair request
+EVALUATION_DEFAULTS = {
+    "score": 60,
+    "strengths": ["Completed the therapy session", "Engaged with the patient", "Maintained professionalism"],
+    "improvements": ["Practice more active listening", "Ask more open-ended questions", "Deepen emotional exploration"],
+    "feedback": "Continue developing your therapeutic skills through practice and supervision.",
+}
+
+_decoder = json.JSONDecoder()
+
+
+def validate_field(field, value):
+    """
+    Validate and normalize one evaluation field.
+
+    Returns:
+        The cleaned value, or None if it does not match the schema
+    """
+    if field == "score":
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value.strip())
+        if isinstance(value, int) and 0 <= value <= 100:
+            return value
+        return None
+
+    if field in LIST_FIELDS:
+        if not isinstance(value, list):
+            return None
+        items = [item.strip() for item in value if isinstance(item, str) and item.strip()]
+        return items[:MAX_LIST_ITEMS] or None
+
+    if field == "feedback":
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+        return None
+
+    return None
+
+
+def validate_evaluation(obj):
+    """
+    Validate a decoded evaluation object against EVALUATION_SCHEMA.
+
+    Returns:
+        tuple: (valid_fields dict, list of missing or malformed field names)
+    """
+    if not isinstance(obj, dict):
+        return {}, list(EVALUATION_FIELDS)
+
+    valid = {}
+    invalid = []
+    for field in EVALUATION_FIELDS:
+        value = validate_field(field, obj.get(field))
+        if value is None:
+            invalid.append(field)
+        else:
+            valid[field] = value
+    return valid, invalid
+
+
+def _extract_object(text):
+    """Decode the first JSON object in text (models like to wrap it in ``` fences)."""
+    start = text.find("{")
+    while start != -1:
+        try:
+            obj, _ = _decoder.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_evaluation_json(text):
+    """
+    Parse a complete JSON evaluation reply.
+
+    If the reply is not valid JSON as a whole (e.g. cut off by the length
+    budget), the fields that were completed before the break are recovered
+    with the incremental parser.
+
+    Returns:
+        tuple: (valid_fields dict, list of missing or malformed field names)
+    """
+    obj = _extract_object(text or "")
+    if obj is not None:
+        return validate_evaluation(obj)
+
+    parser = IncrementalEvaluationParser()
+    parser.feed(text or "")
+    valid = parser.finish()
+    return valid, [field for field in EVALUATION_FIELDS if field not in valid]
+
+
+class IncrementalEvaluationParser:
+    """
+    Pull evaluation fields out of a JSON reply as it streams in.
+
+    Each completed value is reported once through on_partial(field, value):
+    the score as an int, each strengths/improvements item as it closes, and
+    the feedback string when its closing quote arrives.
+
+    Args:
+        on_partial: Optional callback(field, value)
+    """
+
+    def __init__(self, on_partial=None):
+        self.on_partial = on_partial
+        self.buffer = ""
+        self.values = {}
+        self._items = {field: [] for field in LIST_FIELDS}
+        self._cursor = {}  # list field -> buffer offset of the next item
+
+    def feed(self, chunk):
+        """Add streamed text and report any values it completed."""
+        if chunk:
+            self.buffer += chunk
+            self._scan(final=False)
+
+    def finish(self):
+        """
+        Flush at end of stream.
+
+        Returns:
+            dict: All valid fields seen (lists that never closed keep the items completed so far)
+        """
+        self._scan(final=True)
+        result = dict(self.values)
+        for field in LIST_FIELDS:
+            if field not in result and self._items[field]:
+                result[field] = self._items[field][:MAX_LIST_ITEMS]
+        return result
+
+    def _emit(self, field, value):
+        if self.on_partial is not None:
+            try:
+                self.on_partial(field, value)
+            except Exception as e:
+                logger.warning("Evaluation partial callback failed: %s", e)
+
+    def _decode_at(self, position, final):
+        """Decode one JSON value at position; None while it may still be incomplete."""
+        while position < len(self.buffer) and self.buffer[position].isspace():
+            position += 1
+        try:
+            value, end = _decoder.raw_decode(self.buffer, position)
+        except ValueError:
+            return None
+        # A number at the very end of the buffer may still be growing ("7" -> "72")
+        if end >= len(self.buffer) and not final:
+            return None
+        return value, end
+
+    def _scan(self, final):
+        for field in EVALUATION_FIELDS:
+            if field in self.values:
+                continue
+            if field in LIST_FIELDS:
+                self._scan_list(field, final)
+            else:
+                self._scan_scalar(field, final)
+
+    def _scan_scalar(self, field, final):
+        match = re.search(r'"%s"\s*:' % field, self.buffer)
+        if not match:
+            return
+        decoded = self._decode_at(match.end(), final)
+        if decoded is None:
+            return
+        value = validate_field(field, decoded[0])
+        if value is not None:
+            self.values[field] = value
+            self._emit(field, value)
+
+    def _scan_list(self, field, final):
+        position = self._cursor.get(field)
+        if position is None:
+            match = re.search(r'"%s"\s*:\s*\[' % field, self.buffer)
+            if not match:
+                return
+            position = match.end()
+
+        items = self._items[field]
+        while True:
+            while position < len(self.buffer) and (self.buffer[position].isspace() or self.buffer[position] == ","):
+                position += 1
+            if position >= len(self.buffer):
+                break
+            if self.buffer[position] == "]":
+                if items:
+                    self.values[field] = items[:MAX_LIST_ITEMS]
+                break
+            decoded = self._decode_at(position, final)
+            if decoded is None:
+                break
+            item, position = decoded
+            if isinstance(item, str) and item.strip():
+                items.append(item.strip())
+                if len(items) <= MAX_LIST_ITEMS:
+                    self._emit(field, item.strip())
+        self._cursor[field] = position
+
+
+def build_json_evaluation_instructions():
+    """Output-format section of the evaluation prompt for JSON mode."""
+    return f"""Provide your evaluation as a single JSON object with exactly these fields, in this order:
+- "score": integer from 0-100
+- "strengths": list of 3 short strings
+- "improvements": list of 3 short strings
+- "feedback": string with 2-3 sentences of detailed, constructive feedback
+
+JSON schema:
+{json.dumps(EVALUATION_SCHEMA)}
+
+Reply with the JSON object only - no markdown, no text before or after it."""
+
+
+def field_schema(fields):
+    """JSON schema of an object holding only the given evaluation fields (for repair requests)."""
+    return {
+        "type": "object",
+        "properties": {field: EVALUATION_SCHEMA["properties"][field] for field in fields},
+        "required": list(fields),
+    }
+
+
+def build_field_repair_prompt(evaluation_prompt, valid_fields, invalid_fields):
+    """
+    Prompt asking the model to regenerate only the fields that were missing or malformed.
+
+    Args:
+        evaluation_prompt: The original evaluation prompt (transcript and criteria)
+        valid_fields: Fields already accepted, shown for consistency
+        invalid_fields: Names of the fields to regenerate
+    """
+    schema = field_schema(invalid_fields)
+    return f"""{evaluation_prompt}
+
+You already produced this part of the evaluation:
+{json.dumps(valid_fields)}
+
+The following fields were missing or malformed: {', '.join(invalid_fields)}.
+Provide ONLY these fields as a single JSON object matching this schema:
+{json.dumps(schema)}
+
+Reply with the JSON object only - no markdown, no text before or after it."""
@@ -0,0 +1,165 @@
+"""
+Streaming Early-Stop Controller
+-------------------------------
+The patient prompt asks for "2-3 sentences", but the model is free to ramble
+until it hits max_tokens. The controller watches the token stream, counts
+complete sentences and characters, and tells the caller to cancel the upstream
+stream as soon as the budget for the task is met, so response time tracks what
+is actually spoken rather than the token cap.
+"""
+
+import re
+
+
+class GenerationBudget:
+    """Output limits for one kind of LLM call (None = unlimited)."""
+
+    def __init__(self, max_sentences=None, max_chars=None, max_tokens=500):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+
+    def __repr__(self):
+        return (f"GenerationBudget(max_sentences={self.max_sentences}, "
+                f"max_chars={self.max_chars}, max_tokens={self.max_tokens})")
+
+
+# Budgets per task (see configure_generation_budgets)
+GENERATION_BUDGETS = {
+    # Live replies: the prompt asks for 2-3 sentences
+    "patient_reply": GenerationBudget(max_sentences=3, max_chars=450, max_tokens=500),
+    # Evaluations are multi-line and structured - only cap their length
+    "evaluation": GenerationBudget(max_sentences=None, max_chars=4000, max_tokens=500),
+    # Rolling conversation summaries (see conversation_memory.py)
+    "summarization": GenerationBudget(max_sentences=6, max_chars=900, max_tokens=300),
+}
+
+# Abbreviations whose trailing period does not end a sentence
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "vs", "etc", "e.g", "i.e", "approx"}
+
+# Sentence terminator followed by optional closing quotes/brackets and whitespace
+_SENTENCE_END = re.compile(r'([.!?]+|…)(["\')\]]*)(\s+|$)')
+
+
+def sentence_end_offsets(text, final=False):
+    """
+    Find the end offsets of complete sentences in text.
+
+    Ellipses ("..." or "…") are treated as hesitation, not sentence ends, since
+    patients trail off mid-thought. A terminator at the very end of the text
+    only counts when final is True (more tokens could still follow it).
+
+    Returns:
+        list: Offsets just past each sentence's closing punctuation
+    """
+    offsets = []
+    for match in _SENTENCE_END.finditer(text):
+        punctuation, closing, whitespace = match.groups()
+        if not whitespace and not final:
+            continue
+        if punctuation == "…" or (set(punctuation) == {"."} and len(punctuation) > 1):
+            continue
+        if punctuation == ".":
+            words = text[:match.start()].split()
+            if words and words[-1].lower().rstrip(".") in _ABBREVIATIONS:
+                continue
+        offsets.append(match.start() + len(punctuation) + len(closing))
+    return offsets
+
+
+def split_sentences(text):
+    """Split text into sentences (the remainder after the last terminator is kept as its own item)."""
+    sentences = []
+    start = 0
+    for end in sentence_end_offsets(text, final=True):
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    remainder = text[start:].strip()
+    if remainder:
+        sentences.append(remainder)
+    return sentences
+
+
+def truncate_to_budget(text, budget):
+    """
+    Trim a complete response to the budget.
+
+    Cuts after the last whole sentence that fits; if not even one sentence fits
+    the character limit, cuts at the last word boundary instead.
+    """
+    if budget is None:
+        return text
+    offsets = sentence_end_offsets(text, final=True)
+
+    cut = len(text)
+    if budget.max_sentences is not None and len(offsets) > budget.max_sentences:
+        cut = offsets[budget.max_sentences - 1]
+
+    if budget.max_chars is not None and cut > budget.max_chars:
+        fitting = [end for end in offsets if end <= budget.max_chars]
+        if fitting:
+            cut = fitting[-1]
+        else:
+            cut = text.rfind(" ", 0, budget.max_chars)
+            if cut <= 0:
+                cut = budget.max_chars
+
+    return text[:cut].strip()
+
+
+class StreamController:
+    """
+    Accumulates streamed text and decides when the budget has been met.
+
+    Usage:
+        controller = StreamController(budget)
+        for chunk in stream:
+            if controller.feed(chunk_text):
+                break   # close the upstream stream
+        response = controller.text
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.buffer = ""
+        self.stopped_early = False
+
+    def feed(self, chunk):
+        """Add streamed text. Returns True once the caller should stop the stream."""
+        self.buffer += chunk
+        budget = self.budget
+        if budget is None:
+            return False
+
+        if budget.max_chars is not None and len(self.buffer) >= budget.max_chars:
+            self.stopped_early = True
+            return True
+
+        if budget.max_sentences is not None:
+            if len(sentence_end_offsets(self.buffer)) >= budget.max_sentences:
+                self.stopped_early = True
+                return True
+
+        return False
+
+    @property
+    def text(self):
+        """The accepted response, trimmed to the budget."""
+        return truncate_to_budget(self.buffer, self.budget).strip()
+
+
+def configure_generation_budgets(patient_max_sentences=None, patient_max_chars=None,
+                                 evaluation_max_chars=None, max_tokens=None):
+    """Override the default budgets (called from app.py with config values)."""
+    if patient_max_sentences is not None:
+        GENERATION_BUDGETS["patient_reply"].max_sentences = int(patient_max_sentences)
+    if patient_max_chars is not None:
+        GENERATION_BUDGETS["patient_reply"].max_chars = int(patient_max_chars)
+    if evaluation_max_chars is not None:
+        GENERATION_BUDGETS["evaluation"].max_chars = int(evaluation_max_chars)
+    if max_tokens is not None:
+        # Rolling summaries keep their own, smaller cap
+        for task in ("patient_reply", "evaluation"):
+            GENERATION_BUDGETS[task].max_tokens = int(max_tokens)
@@ -0,0 +1,186 @@
+"""
+Turn-Path Microbenchmark
+------------------------
+Measures ops/sec of the pure-Python functions that run on every turn
+(prompt building, reply cleanup, evaluation parsing, condition selection)
+over the fixture corpora in hotpath_fixtures.py, after checking their
+output with test_hotpath.py.
+
+Rates are also expressed relative to a fixed pure-Python calibration loop
+timed alternately with each function, so a baseline stays comparable when the
+machine is busier or faster. Compared with a saved baseline, the run fails (exit code 1)
+if any function got slower than --max-slowdown.
+
+Usage:
+    python hotpath_benchmark.py --save-baseline    # on the code you compare against
+    python hotpath_benchmark.py                    # after a change: fails on a regression
+    python hotpath_benchmark.py --max-slowdown 0.1 --repeats 7
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import timeit
+from datetime import datetime
+
+from therapy_session import (
+    select_patient_condition,
+    generate_patient_prompt,
+    get_speech_pattern_guidance,
+    clean_response,
+    parse_evaluation
+)
+from hotpath_fixtures import PATIENT_REPLY_CASES, EVALUATION_CASES, THERAPIST_MESSAGES, build_message_history
+from test_hotpath import run_tests
+
+HOTPATH_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotpath_baseline.json")
+
+MAX_SLOWDOWN = 0.25  # Allowed drop in relative ops/sec against the baseline
+
+
+def _prompt_inputs():
+    inputs = []
+    for turn in range(1, 6):
+        for condition, severity in [("Anxiety", "mild"), ("Depression", "moderate"),
+                                    ("Bipolar Disorder", "severe"), ("PTSD", "moderate")]:
+            inputs.append((condition, severity, THERAPIST_MESSAGES[turn - 1], build_message_history(turn - 1), turn))
+    return inputs
+
+
+def _calibration():
+    # Fixed mix of string, dict and list work, similar in kind to the functions below
+    words = "the quick brown fox jumps over the lazy dog".split()
+    counts = {}
+    for word in words * 20:
+        counts[word] = counts.get(word, 0) + len(word.upper())
+    return " ".join(sorted(counts))
+
+
+def build_benchmarks():
+    """
+    Returns:
+        dict: name -> (callable running one pass over the corpus, calls per pass)
+    """
+    replies = [raw for raw, _ in PATIENT_REPLY_CASES]
+    evaluations = [raw for raw, _ in EVALUATION_CASES]
+    prompts = _prompt_inputs()
+    conditions = ["Anxiety", "Depression", "Bipolar Disorder", "PTSD", "Unknown"]
+
+    return {
+        "generate_patient_prompt": (lambda: [generate_patient_prompt(*args) for args in prompts], len(prompts)),
+        "get_speech_pattern_guidance": (lambda: [get_speech_pattern_guidance(c) for c in conditions], len(conditions)),
+        "clean_response": (lambda: [clean_response(raw) for raw in replies], len(replies)),
+        "parse_evaluation": (lambda: [parse_evaluation(raw) for raw in evaluations], len(evaluations)),
+        "select_patient_condition": (lambda: [select_patient_condition() for _ in range(100)], 100),
+    }
+
+
+def measure(fn, calls_per_pass, repeats=5):
+    """
+    Time fn alternately with the calibration loop.
+
+    Each repeat times one batch of fn and one batch of the calibration right
+    after it, so both see the same machine speed; the median of the per-repeat
+    ratios is the relative rate.
+
+    Returns:
+        tuple: (best calls per second, relative rate)
+    """
+    timer = timeit.Timer(fn)
+    calibration = timeit.Timer(_calibration)
+    passes, _ = timer.autorange()  # Enough passes for ~0.2 s per batch
+    calibration_passes, _ = calibration.autorange()
+
+    rates = []
+    ratios = []
+    for _ in range(repeats):
+        rate = passes * calls_per_pass / timer.timeit(passes)
+        calibration_rate = calibration_passes / calibration.timeit(calibration_passes)
+        rates.append(rate)
+        ratios.append(rate / calibration_rate)
+    return max(rates), statistics.median(ratios)
+
+
+def run_benchmark(repeats=5):
+    """
+    Returns:
+        dict: per-function ops_per_sec and rate relative to the calibration loop
+    """
+    timeit.Timer(_calibration).autorange()  # Warm-up, lets the CPU clock settle
+    results = {}
+    for name, (fn, calls) in build_benchmarks().items():
+        ops, relative = measure(fn, calls, repeats)
+        results[name] = {"ops_per_sec": round(ops, 1), "relative": round(relative, 4)}
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, max_slowdown=MAX_SLOWDOWN):
+    """
+    Returns:
+        list: (name, change) for every function slower than allowed
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = result["relative"] / before["relative"] - 1
+        result["change"] = round(change, 4)
+        if change < -max_slowdown:
+            regressions.append((name, change))
+    return regressions
+
+
+def print_report(current):
+    print(f"\n{'='*72}")
+    print("TURN-PATH MICROBENCHMARK")
+    print(f"{'='*72}")
+    print(f"{'function':<30}{'ops/sec':>14}{'relative':>12}{'vs baseline':>14}")
+    for name, result in current["results"].items():
+        change = f"{result['change']:+.1%}" if "change" in result else "-"
+        print(f"{name:<30}{result['ops_per_sec']:>14,.0f}{result['relative']:>12.4f}{change:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the per-turn text functions and check for regressions")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats per function (best is kept)")
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN,
+                        help="Fail if a function's relative rate drops by more than this fraction")
+    parser.add_argument("--baseline", default=HOTPATH_BASELINE_PATH, help="Baseline file to compare with / save")
+    parser.add_argument("--save-baseline", action="store_true", help="Save this run as the baseline")
+    args = parser.parse_args()
+
+    print("Checking correctness...")
+    if not run_tests():
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    current = run_benchmark(args.repeats)
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.max_slowdown)
+    print_report(current)
+    print(f"\nFinished in {time.perf_counter() - start:.1f}s")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"✓ Baseline saved to: {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print(f"⚠ No baseline at {args.baseline} - run with --save-baseline first")
+    elif regressions:
+        for name, change in regressions:
+            print(f"❌ {name} is {-change:.1%} slower than the baseline (allowed {args.max_slowdown:.0%})")
+        raise SystemExit(1)
+    else:
+        print(f"✓ No function slower than the baseline by more than {args.max_slowdown:.0%}")
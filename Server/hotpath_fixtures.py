@@ -0,0 +1,172 @@
+"""
+Fixture corpora for test_hotpath.py and hotpath_benchmark.py: raw patient
+replies and evaluation texts as the models actually return them (role
+prefixes, stage directions, markdown, truncation), each with the result the
+turn path must produce.
+"""
+
+# (raw model output, expected clean_response() result)
+PATIENT_REPLY_CASES = [
+    ("Patient: I guess I've just been feeling really on edge lately. Like something bad is about to happen.",
+     "I guess I've just been feeling really on edge lately. Like something bad is about to happen."),
+    ("Sarah: *fidgets with her sleeve* I don't know... it's hard to explain.",
+     "I don't know... it's hard to explain."),
+    ('"Honestly? I haven\'t slept properly in weeks. Is that normal?"',
+     "Honestly? I haven't slept properly in weeks. Is that normal?"),
+    ("[pauses] Um, I'm not really sure where to start. [looks away] Work, I suppose.",
+     "Um, I'm not really sure where to start. Work, I suppose."),
+    ("(sighs heavily) What's the point of talking about it? Nothing changes anyway.",
+     "What's the point of talking about it? Nothing changes anyway."),
+    ("You: It's probably nothing, but my heart has been racing every time my phone buzzes.",
+     "It's probably nothing, but my heart has been racing every time my phone buzzes."),
+    ("Response: I mean...   I keep telling myself   I'm fine.\n\nBut I'm not, am I?",
+     "I mean... I keep telling myself I'm fine. But I'm not, am I?"),
+    ("As the patient: I just... zoned out for a second. Sorry, what were you asking?",
+     "I just... zoned out for a second. Sorry, what were you asking?"),
+    ("*takes a deep breath* *looks down at hands* Okay. It started after the accident.",
+     "Okay. It started after the accident."),
+    ("...and that's when I stopped going to the gym. (pauses) I don't really go anywhere now.",
+     "and that's when I stopped going to the gym. I don't really go anywhere now."),
+    ("'I feel like everyone at work is judging me. Do you think I'm overreacting?'",
+     "I feel like everyone at work is judging me. Do you think I'm overreacting?"),
+    ("Sarah:I've had so much energy this week! I started three new projects and reorganized my whole apartment at 3am.",
+     "I've had so much energy this week! I started three new projects and reorganized my whole apartment at 3am."),
+    ("(my sister) thinks I should have come here months ago. Maybe she's right.",
+     "(my sister) thinks I should have come here months ago. Maybe she's right."),
+    ("*nods*", "I'm not sure how to answer that right now."),
+    ("Okay.", "I'm not sure how to answer that right now."),
+    ("", "I'm not sure how to answer that right now."),
+    ("As an AI roleplaying Sarah, I should respond with hesitation.", "I'm not sure how to answer that right now."),
+    ("```python\nprint('I feel anxious')\n```", "I'm not sure how to answer that right now."),
+    ("I don't know how to say this (fidgeting with my ring) but I've been drinking more than I should.",
+     "I don't know how to say this but I've been drinking more than I should."),
+    ("Patient:   \t  I keep replaying it in my head. The sound, the lights... I can't make it stop.",
+     "I keep replaying it in my head. The sound, the lights... I can't make it stop."),
+    ("Honestly, I'm a bit nervous being here. My mind just keeps racing and I can't seem to switch it off. "
+     "Every time I try to relax, I start thinking about all the deadlines at work, and what happens if I miss "
+     "one, and whether my manager already thinks I'm not good enough. It's exhausting. *rubs temples* "
+     "Is that something you hear a lot?",
+     "Honestly, I'm a bit nervous being here. My mind just keeps racing and I can't seem to switch it off. "
+     "Every time I try to relax, I start thinking about all the deadlines at work, and what happens if I miss "
+     "one, and whether my manager already thinks I'm not good enough. It's exhausting. "
+     "Is that something you hear a lot?"),
+]
+
+DEFAULT_STRENGTHS = ["Completed the therapy session", "Engaged with the patient", "Maintained professionalism"]
+DEFAULT_IMPROVEMENTS = ["Practice more active listening", "Ask more open-ended questions", "Deepen emotional exploration"]
+DEFAULT_FEEDBACK = "Continue developing your therapeutic skills through practice and supervision."
+
+# (raw evaluation text, expected parse_evaluation() result)
+EVALUATION_CASES = [
+    ("""SCORE: 72
+
+STRENGTHS:
+- Used open-ended questions to invite the patient to elaborate
+- Reflected the patient's feelings about work accurately
+- Maintained a calm, non-judgmental tone
+
+IMPROVEMENTS:
+- Allow more silence before moving to the next question
+- Explore the sleep disturbance in more depth
+- Avoid offering reassurance too early
+
+FEEDBACK:
+You built rapport quickly and the patient began to open up by the third exchange.
+Slowing down and staying with difficult emotions would deepen the work.""",
+     {"score": 72,
+      "strengths": ["Used open-ended questions to invite the patient to elaborate",
+                    "Reflected the patient's feelings about work accurately",
+                    "Maintained a calm, non-judgmental tone"],
+      "improvements": ["Allow more silence before moving to the next question",
+                       "Explore the sleep disturbance in more depth",
+                       "Avoid offering reassurance too early"],
+      "feedback": "You built rapport quickly and the patient began to open up by the third exchange. "
+                  "Slowing down and staying with difficult emotions would deepen the work."}),
+
+    ("""Here is my evaluation of the session.
+
+SCORE: 85/100
+STRENGTHS:
+-Validated the patient's frustration
+- Summarized key concerns
+IMPROVEMENTS:
+- Ask about safety and support systems
+FEEDBACK:
+Strong session overall.
+The summary at the end was particularly effective.""",
+     {"score": 85,
+      "strengths": ["Validated the patient's frustration", "Summarized key concerns"],
+      "improvements": ["Ask about safety and support systems"],
+      "feedback": "Strong session overall. The summary at the end was particularly effective."}),
+
+    ("""SCORE: 140
+STRENGTHS:
+- Empathic
+IMPROVEMENTS:
+- Pacing
+FEEDBACK:
+Good.""",
+     {"score": 100, "strengths": ["Empathic"], "improvements": ["Pacing"], "feedback": "Good."}),
+
+    ("""**SCORE:** 64
+
+**STRENGTHS:**
+- Warm greeting
+
+**IMPROVEMENTS:**
+- Fewer closed questions""",
+     {"score": 60, "strengths": DEFAULT_STRENGTHS, "improvements": DEFAULT_IMPROVEMENTS,
+      "feedback": DEFAULT_FEEDBACK}),
+
+    ("""SCORE: 58
+STRENGTHS:
+- Stayed on topic
+- Used the patient's name
+- Checked understanding
+- Normalized the patient's anxiety
+- Kept a steady pace
+- Closed the session well
+- Thanked the patient
+IMPROVEMENTS:
+• Reflect feelings, not just content
+• Avoid giving advice in the first turn
+FEEDBACK:
+A solid foundation; reflective listening is the next skill to build.""",
+     {"score": 58,
+      "strengths": ["Stayed on topic", "Used the patient's name", "Checked understanding",
+                    "Normalized the patient's anxiety", "Kept a steady pace"],
+      "improvements": DEFAULT_IMPROVEMENTS,
+      "feedback": "A solid foundation; reflective listening is the next skill to build."}),
+
+    ("""SCORE: around seventy
+STRENGTHS:
+- Listened attentively
+IMPROVEMENTS:
+- Explore triggers
+FEEDBACK:
+The patient felt heard, but the session stayed at surface level and the""",
+     {"score": 60, "strengths": ["Listened attentively"], "improvements": ["Explore triggers"],
+      "feedback": "The patient felt heard, but the session stayed at surface level and the"}),
+
+    ("",
+     {"score": 60, "strengths": DEFAULT_STRENGTHS, "improvements": DEFAULT_IMPROVEMENTS,
+      "feedback": DEFAULT_FEEDBACK}),
+]
+
+# Therapist lines used to build per-turn prompts
+THERAPIST_MESSAGES = [
+    "Hi Sarah, thanks for coming in today. What brings you here?",
+    "It sounds like work has been really overwhelming lately. Can you tell me more about that?",
+    "What goes through your mind when you can't fall asleep?",
+    "You mentioned feeling like nothing helps. When did you first notice that?",
+    "How have the people close to you responded to what you've been going through?",
+]
+
+
+def build_message_history(turns):
+    """Alternating therapist/patient history with `turns` exchanges."""
+    history = []
+    for index in range(turns):
+        history.append({"role": "therapist", "content": THERAPIST_MESSAGES[index % len(THERAPIST_MESSAGES)]})
+        history.append({"role": "patient", "content": PATIENT_REPLY_CASES[index % len(PATIENT_REPLY_CASES)][1]})
+    return history
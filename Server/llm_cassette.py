@@ -0,0 +1,247 @@
+"""
+LLM Record/Replay Cassettes
+---------------------------
+Wraps the Hugging Face InferenceClient so every chat_completion /
+text_generation call can be recorded to a compact cassette file and served back
+later without touching the network.
+
+- record: calls go to the live API; each response is appended to the cassette as
+  (prompt hash, params) -> chunks with their arrival offsets
+- replay: responses are served from the cassette at the recorded pace, scaled
+  by `speed` (2.0 = twice as fast, 0 = no delays)
+
+The cassette is gzip-compressed JSON lines. Only a SHA-256 of the request is
+stored, never the prompt itself, so cassettes do not contain transcripts.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: waitress serves from a single process
+
+from structured_logging import get_logger
+
+logger = get_logger("cassette")
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no recording matches a request."""
+
+
+def cassette_key(method, payload, model, params):
+    """Hash a request (method, prompt/messages, model, params) into a cassette key."""
+    blob = json.dumps(
+        {"method": method, "payload": payload, "model": model, "params": params},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _stream_chunk(text):
+    """Build an object shaped like a streamed chat_completion chunk."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _chat_result(text):
+    """Build an object shaped like a non-streamed chat_completion result."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class CassetteClient:
+    """
+    Drop-in wrapper around InferenceClient with record/replay support.
+
+    Args:
+        client: The real InferenceClient (unused in replay mode)
+        path: Cassette file path (.jsonl.gz)
+        mode: "record" or "replay"
+        speed: Replay speed multiplier (0 disables delays)
+        strict: In replay mode, only serve exact request matches. When False, a
+                miss is served from any recording of the same method, which is
+                useful for load tests where prompts vary run to run.
+    """
+
+    def __init__(self, client, path, mode="replay", speed=1.0, strict=True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.client = client
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._recordings = {}   # key -> list of entries
+        self._by_method = {}    # method -> list of entries
+        self._cursor = {}       # key -> next recording index (round robin)
+
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self._recordings.setdefault(entry["key"], []).append(entry)
+                self._by_method.setdefault(entry["method"], []).append(entry)
+        count = sum(len(v) for v in self._recordings.values())
+        logger.info("Loaded %d LLM recordings from cassette %s", count, self.path)
+
+    def _append(self, entry):
+        # Each append is a separate gzip member; gzip readers concatenate them.
+        # The member is written in one call under a file lock, so processes
+        # appending to the same cassette cannot interleave their writes.
+        member = gzip.compress((json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8"))
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(member)
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _next_recording(self, key, method):
+        with self._lock:
+            candidates = self._recordings.get(key)
+            cursor_key = key
+            if not candidates and not self.strict:
+                candidates = self._by_method.get(method)
+                cursor_key = method
+            if not candidates:
+                raise CassetteMissError(f"No cassette recording for {method} request {key[:12]}")
+            index = self._cursor.get(cursor_key, 0)
+            self._cursor[cursor_key] = index + 1
+            return candidates[index % len(candidates)]
+
+    def _sleep(self, seconds):
+        if self.speed and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def _replay_stream(self, entry, wrap):
+        previous = 0
+        for offset_ms, text in entry["chunks"]:
+            self._sleep((offset_ms - previous) / 1000.0)
+            previous = offset_ms
+            yield wrap(text)
+
+    def _replay(self, entry, stream, wrap_chunk, wrap_result):
+        if stream:
+            return self._replay_stream(entry, wrap_chunk)
+        self._sleep(entry["chunks"][-1][0] / 1000.0 if entry["chunks"] else 0)
+        return wrap_result("".join(text for _, text in entry["chunks"]))
+
+    # ------------------------------------------------------------------
+    # Record
+    # ------------------------------------------------------------------
+
+    def _record_stream(self, iterator, key, method, model, extract):
+        start = time.perf_counter()
+        chunks = []
+        failed = False
+        try:
+            for chunk in iterator:
+                text = extract(chunk)
+                if text:
+                    chunks.append([int((time.perf_counter() - start) * 1000), text])
+                yield chunk
+        except Exception:
+            failed = True  # Upstream error: nothing worth replaying
+            raise
+        finally:
+            # Also runs when the caller stops early (close()): record what was streamed
+            # so far and close the upstream stream as well
+            if hasattr(iterator, "close"):
+                iterator.close()
+            if not failed:
+                self._append({"key": key, "method": method, "model": model, "chunks": chunks})
+
+    def _record_result(self, result, start, key, method, model, text):
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        self._append({"key": key, "method": method, "model": model, "chunks": [[elapsed_ms, text]]})
+        return result
+
+    # ------------------------------------------------------------------
+    # InferenceClient API
+    # ------------------------------------------------------------------
+
+    def chat_completion(self, messages, model=None, stream=False, **kwargs):
+        key = cassette_key("chat_completion", messages, model, dict(kwargs, stream=stream))
+
+        if self.mode == "replay":
+            entry = self._next_recording(key, "chat_completion")
+            return self._replay(entry, stream, _stream_chunk, _chat_result)
+
+        start = time.perf_counter()
+        result = self.client.chat_completion(messages=messages, model=model, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(result, key, "chat_completion", model, _chunk_text)
+        text = result.choices[0].message.content if getattr(result, "choices", None) else ""
+        return self._record_result(result, start, key, "chat_completion", model, text or "")
+
+    def text_generation(self, prompt, model=None, stream=False, **kwargs):
+        key = cassette_key("text_generation", prompt, model, dict(kwargs, stream=stream))
+
+        if self.mode == "replay":
+            entry = self._next_recording(key, "text_generation")
+            return self._replay(entry, stream, lambda text: text, lambda text: text)
+
+        start = time.perf_counter()
+        result = self.client.text_generation(prompt=prompt, model=model, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(result, key, "text_generation", model,
+                                       lambda chunk: chunk if isinstance(chunk, str) else "")
+        text = result if isinstance(result, str) else str(result)
+        return self._record_result(result, start, key, "text_generation", model, text)
+
+    def __getattr__(self, name):
+        # Anything not recorded is passed straight through to the real client
+        return getattr(self.client, name)
+
+
+def _chunk_text(chunk):
+    """Extract the text content from a streamed chat_completion chunk."""
+    if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
+        delta = chunk.choices[0].delta
+        if hasattr(delta, 'content') and delta.content:
+            return delta.content
+    return ""
+
+
+def wrap_client_with_cassette(client, mode, path, speed=1.0, strict=True):
+    """
+    Wrap a client for recording or replay based on config.
+
+    Args:
+        client: InferenceClient instance
+        mode: "off", "record" or "replay"
+        path: Cassette file path
+        speed: Replay speed multiplier
+        strict: Only replay exact request matches
+
+    Returns:
+        The original client when mode is "off", otherwise a CassetteClient
+    """
+    if not mode or mode == "off":
+        return client
+    logger.info("LLM cassette mode: %s (%s)", mode, path)
+    return CassetteClient(client, path, mode=mode, speed=speed, strict=strict)
@@ -0,0 +1,496 @@
+"""
+Deadline-aware LLM calls
+------------------------
+Runs the LLM call modes (streaming chat -> chat -> text_generation) against a
+per-turn latency budget instead of strictly one after another:
+
+- each attempt runs on a worker thread and is abandoned (and told to stop
+  streaming) once the turn deadline passes. The deadline starts when the
+  first attempt starts running, so time spent queued behind other calls'
+  threads is not blamed on the provider
+- if an attempt is still running after HEDGE_AFTER_FRACTION of the budget, the
+  next mode is launched in parallel and whichever answers first wins
+- a circuit breaker per (model, mode) remembers which modes are currently
+  failing and skips them until a cooldown has passed; an abandoned half-open
+  trial counts as neither success nor failure
+- outcome counts and latency percentiles per (model, mode) are exported via
+  get_llm_metrics() (served at GET /metrics/llm)
+
+call_with_fallbacks_async() does the same for coroutine attempts (async_app.py):
+attempts are asyncio tasks instead of threads, and an abandoned attempt is
+cancelled instead of signalled.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from structured_logging import get_logger, with_log_context
+
+logger = get_logger("llm")
+
+
+# Latency budgets per task, in seconds (see configure_llm_resilience)
+LLM_BUDGETS = {
+    "patient_reply": 20.0,
+    "evaluation": 60.0,
+    "summarization": 30.0,
+}
+HEDGE_AFTER_FRACTION = 0.5     # Launch a backup attempt after this fraction of the budget
+FAILURE_THRESHOLD = 3          # Consecutive failures before a breaker opens
+COOLDOWN_SECONDS = 30.0        # How long an open breaker skips its mode
+LATENCY_WINDOW = 200           # Recent samples kept per (model, mode)
+QUEUE_POLL_SECONDS = 0.05      # How often a call checks whether its queued attempt has started
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm")
+_lock = threading.Lock()
+_breakers = {}   # (model, mode) -> CircuitBreaker
+_stats = {}      # (model, mode) -> CallStats
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of one call mode and skips it while open."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown_seconds=COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """
+        Check whether the mode may be attempted now.
+
+        Returns:
+            str or None: "closed" for a normal attempt, "trial" for the single
+                         half-open probe (release_trial() it if abandoned), None to skip
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_in_flight:
+                # Let a single trial call through to probe recovery
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def release_trial(self):
+        """An abandoned trial (a hedge won, or the call was cancelled) proves nothing either way."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class CallStats:
+    """Outcome counters and a rolling window of latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW, outcomes=("success", "failure", "timeout")):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = {outcome: 0 for outcome in outcomes}
+        self._lock = threading.Lock()
+
+    def record(self, outcome, latency_seconds=None):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if latency_seconds is not None:
+                self.latencies.append(latency_seconds)
+
+    def reset(self):
+        """Forget the latency window (outcome counts are kept)."""
+        with self._lock:
+            self.latencies.clear()
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            count = len(self.latencies)
+        return {
+            **outcomes,
+            "samples": count,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+
+_turn_stats = CallStats()   # End-to-end outcome of each call_with_fallbacks()
+_task_stats = {}            # (task, model) -> CallStats of end-to-end calls, used for routing
+
+
+def configure_llm_resilience(patient_reply_budget=None, evaluation_budget=None, hedge_after_fraction=None,
+                             failure_threshold=None, cooldown_seconds=None):
+    """Override the default budgets and breaker settings (called from app.py with config values)."""
+    global HEDGE_AFTER_FRACTION, FAILURE_THRESHOLD, COOLDOWN_SECONDS
+    if patient_reply_budget is not None:
+        LLM_BUDGETS["patient_reply"] = float(patient_reply_budget)
+    if evaluation_budget is not None:
+        LLM_BUDGETS["evaluation"] = float(evaluation_budget)
+    if hedge_after_fraction is not None:
+        HEDGE_AFTER_FRACTION = float(hedge_after_fraction)
+    if failure_threshold is not None:
+        FAILURE_THRESHOLD = int(failure_threshold)
+    if cooldown_seconds is not None:
+        COOLDOWN_SECONDS = float(cooldown_seconds)
+
+
+def get_breaker(model_name, mode):
+    with _lock:
+        key = (model_name, mode)
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(FAILURE_THRESHOLD, COOLDOWN_SECONDS)
+        return _breakers[key]
+
+
+def get_call_stats(model_name, mode):
+    with _lock:
+        key = (model_name, mode)
+        if key not in _stats:
+            _stats[key] = CallStats()
+        return _stats[key]
+
+
+def get_task_stats(task, model_name):
+    """End-to-end latency of call_with_fallbacks() for one task on one model."""
+    with _lock:
+        key = (task, model_name)
+        if key not in _task_stats:
+            _task_stats[key] = CallStats()
+        return _task_stats[key]
+
+
+def model_available(model_name):
+    """False while every call mode tried on model_name has an open circuit breaker."""
+    with _lock:
+        breakers = [breaker for (model, _), breaker in _breakers.items() if model == model_name]
+    return not breakers or any(breaker.state != "open" for breaker in breakers)
+
+
+class _Attempt:
+    """One launched call mode of a call_with_fallbacks() call."""
+
+    def __init__(self, mode, admission):
+        self.mode = mode
+        self.trial = admission == "trial"
+        self.cancel_event = threading.Event()
+        self.started_at = None   # Set by the worker thread when the attempt starts running
+
+
+def _abandon(model_name, attempt):
+    attempt.cancel_event.set()
+    if attempt.trial:
+        get_breaker(model_name, attempt.mode).release_trial()
+
+
+def _run_attempt(model_name, mode, attempt, cancel_event, state=None):
+    """Run one call mode, recording its outcome and latency."""
+    start = time.perf_counter()
+    if state is not None:
+        state.started_at = start
+    if cancel_event.is_set():
+        return ""  # Abandoned while queued for a thread
+    try:
+        result = attempt(cancel_event)
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        if not cancel_event.is_set():
+            logger.warning("LLM call mode '%s' failed for %s: %s", mode, model_name, e)
+            get_breaker(model_name, mode).record_failure()
+            get_call_stats(model_name, mode).record("failure", elapsed)
+        raise
+
+    elapsed = time.perf_counter() - start
+    if cancel_event.is_set():
+        # Abandoned (deadline passed or another attempt won) - already accounted for
+        return result
+    if result:
+        get_breaker(model_name, mode).record_success()
+        get_call_stats(model_name, mode).record("success", elapsed)
+        logger.debug("LLM call succeeded", extra={"fields": {
+            "model": model_name, "mode": mode, "latency_ms": round(elapsed * 1000, 1)}})
+    else:
+        get_breaker(model_name, mode).record_failure()
+        get_call_stats(model_name, mode).record("failure", elapsed)
+    return result
+
+
+def call_with_fallbacks(model_name, attempts, budget_seconds, task=None):
+    """
+    Run call modes under a deadline with hedging and circuit breaking.
+
+    Args:
+        model_name: Model the attempts call (breakers and stats are per model)
+        attempts: List of (mode_name, callable) in preference order. Each callable
+                  takes a threading.Event (set when the attempt should stop) and
+                  returns the response text; an empty string counts as failure.
+        budget_seconds: Total time allowed for this call
+        task: Optional task name; the end-to-end outcome is also recorded per
+              (task, model) for latency-based routing (see model_router.py)
+
+    Returns:
+        str: The first non-empty response, or "" if every mode failed, was
+             skipped by its breaker, or the deadline passed
+    """
+    turn_start = time.perf_counter()
+    task_stats = get_task_stats(task, model_name) if task else None
+
+    def finish(outcome, with_latency=True):
+        elapsed = time.perf_counter() - turn_start if with_latency else None
+        _turn_stats.record(outcome, time.perf_counter() - turn_start)
+        if task_stats is not None:
+            task_stats.record(outcome, elapsed)
+    hedge_interval = budget_seconds * HEDGE_AFTER_FRACTION
+
+    queue = list(attempts)
+    pending = {}          # future -> _Attempt
+    launched = []
+
+    def launch():
+        """Start the next mode whose breaker allows it. Returns False if none is left."""
+        while queue:
+            mode, fn = queue.pop(0)
+            admission = get_breaker(model_name, mode).allow()
+            if not admission:
+                logger.info("Skipping LLM call mode '%s' for %s (circuit breaker open)", mode, model_name)
+                continue
+            state = _Attempt(mode, admission)
+            future = _executor.submit(with_log_context(_run_attempt), model_name, mode, fn,
+                                      state.cancel_event, state)
+            pending[future] = state
+            launched.append(state)
+            return True
+        return False
+
+    def cancel_all():
+        for future, state in pending.items():
+            future.cancel()  # Frees the thread pool slot if it has not started yet
+            _abandon(model_name, state)
+
+    if queue:
+        launch()
+
+    while pending:
+        now = time.perf_counter()
+        starts = [state.started_at for state in launched if state.started_at is not None]
+        # The budget runs from the first attempt's start; queueing for a thread may take
+        # up to another budget before the call gives up without blaming the provider
+        deadline = (min(starts) if starts else turn_start) + budget_seconds
+        if now >= deadline:
+            break
+        timeout = deadline - now
+        if not starts:
+            timeout = min(timeout, QUEUE_POLL_SECONDS)
+        elif queue:
+            latest = launched[-1].started_at
+            timeout = min(timeout, max(0.0, latest + hedge_interval - now) if latest is not None else QUEUE_POLL_SECONDS)
+
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            pending.pop(future)
+            try:
+                result = future.result()
+            except Exception:
+                result = ""
+            if result:
+                cancel_all()
+                finish("success")
+                return result
+            # This mode failed - move straight on to the next one
+            if queue:
+                launch()
+
+        latest = launched[-1].started_at if launched else None
+        if queue and pending and latest is not None and time.perf_counter() >= latest + hedge_interval:
+            logger.info("LLM call slow for %s - launching a hedged attempt", model_name)
+            launch()
+
+    if pending:
+        running = {future: state for future, state in pending.items() if state.started_at is not None}
+        for state in running.values():
+            logger.warning("LLM call mode '%s' exceeded the %.1fs budget for %s", state.mode, budget_seconds,
+                           model_name)
+            get_breaker(model_name, state.mode).record_failure()
+            get_call_stats(model_name, state.mode).record("timeout")
+        if not running:
+            logger.warning("LLM call for %s never got a worker thread within %.1fs", model_name, budget_seconds)
+        cancel_all()
+        if running:
+            finish("timeout")
+        else:
+            # Local congestion says nothing about the model's latency
+            _turn_stats.record("timeout", time.perf_counter() - turn_start)
+    else:
+        # Fast failures must not make a model look fast to the router
+        finish("failure", with_latency=False)
+    return ""
+
+
+async def _run_attempt_async(model_name, mode, attempt):
+    """Coroutine version of _run_attempt (cancellation means abandoned, and is not recorded)."""
+    start = time.perf_counter()
+    try:
+        result = await attempt()
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        logger.warning("LLM call mode '%s' failed for %s: %s", mode, model_name, e)
+        get_breaker(model_name, mode).record_failure()
+        get_call_stats(model_name, mode).record("failure", elapsed)
+        raise
+
+    elapsed = time.perf_counter() - start
+    if result:
+        get_breaker(model_name, mode).record_success()
+        get_call_stats(model_name, mode).record("success", elapsed)
+        logger.debug("LLM call succeeded", extra={"fields": {
+            "model": model_name, "mode": mode, "latency_ms": round(elapsed * 1000, 1)}})
+    else:
+        get_breaker(model_name, mode).record_failure()
+        get_call_stats(model_name, mode).record("failure", elapsed)
+    return result
+
+
+async def call_with_fallbacks_async(model_name, attempts, budget_seconds, task=None):
+    """
+    Coroutine version of call_with_fallbacks.
+
+    Args:
+        attempts: List of (mode_name, coroutine function) in preference order;
+                  each takes no arguments and returns the response text
+        (others as for call_with_fallbacks)
+
+    Returns:
+        str: The first non-empty response, or ""
+    """
+    turn_start = time.perf_counter()
+    deadline = turn_start + budget_seconds
+    task_stats = get_task_stats(task, model_name) if task else None
+
+    def finish(outcome, with_latency=True):
+        elapsed = time.perf_counter() - turn_start if with_latency else None
+        _turn_stats.record(outcome, time.perf_counter() - turn_start)
+        if task_stats is not None:
+            task_stats.record(outcome, elapsed)
+    hedge_interval = budget_seconds * HEDGE_AFTER_FRACTION
+
+    queue = list(attempts)
+    pending = {}          # asyncio task -> _Attempt
+    next_hedge_at = None
+
+    def launch():
+        """Start the next mode whose breaker allows it. Returns False if none is left."""
+        nonlocal next_hedge_at
+        while queue:
+            mode, fn = queue.pop(0)
+            admission = get_breaker(model_name, mode).allow()
+            if not admission:
+                logger.info("Skipping LLM call mode '%s' for %s (circuit breaker open)", mode, model_name)
+                continue
+            pending[asyncio.ensure_future(_run_attempt_async(model_name, mode, fn))] = _Attempt(mode, admission)
+            next_hedge_at = time.perf_counter() + hedge_interval
+            return True
+        return False
+
+    def cancel_all():
+        for attempt, state in pending.items():
+            attempt.cancel()
+            _abandon(model_name, state)
+
+    if queue:
+        launch()
+
+    try:
+        while pending:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            timeout = deadline - now
+            if queue:
+                timeout = min(timeout, max(0.0, next_hedge_at - now))
+
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for attempt in done:
+                pending.pop(attempt)
+                try:
+                    result = attempt.result()
+                except Exception:
+                    result = ""
+                if result:
+                    cancel_all()
+                    finish("success")
+                    return result
+                # This mode failed - move straight on to the next one
+                if queue:
+                    launch()
+
+            if queue and pending and time.perf_counter() >= next_hedge_at:
+                logger.info("LLM call slow for %s - launching a hedged attempt", model_name)
+                launch()
+    except asyncio.CancelledError:
+        cancel_all()  # The turn itself was cancelled
+        raise
+
+    if pending:
+        for state in pending.values():
+            logger.warning("LLM call mode '%s' exceeded the %.1fs budget for %s", state.mode, budget_seconds,
+                           model_name)
+            get_breaker(model_name, state.mode).record_failure()
+            get_call_stats(model_name, state.mode).record("timeout")
+        cancel_all()
+        finish("timeout")
+    else:
+        # Fast failures must not make a model look fast to the router
+        finish("failure", with_latency=False)
+    return ""
+
+
+def get_llm_metrics():
+    """Export breaker state, outcome counts and latency percentiles per (model, mode)."""
+    with _lock:
+        keys = sorted(set(_breakers) | set(_stats))
+    modes = {}
+    for model_name, mode in keys:
+        modes[f"{model_name}::{mode}"] = {
+            "breaker": get_breaker(model_name, mode).state,
+            **get_call_stats(model_name, mode).snapshot(),
+        }
+    return {
+        "budgets_seconds": dict(LLM_BUDGETS),
+        "calls": _turn_stats.snapshot(),
+        "modes": modes,
+    }
@@ -0,0 +1,230 @@
+"""
+Multi-headset Load Generator
+----------------------------
+Spawns N virtual headsets that run the real client loop against a local server:
+
+    /reset_conversation -> (/process_wav -> poll /check_status -> /get_audio) x turns
+
+and reports request rates, error rates and full-turn latency distributions.
+
+Run the server with stub backends first so the test measures the server, not
+the inference API (add to config.json, or use VR_THERAPIST_CONFIG):
+    "STUB_BACKENDS": true, "STUB_LATENCY_SCALE": 1.0
+
+Then:
+    python load_test.py --clients 10
+    python load_test.py --clients 50 --turns 3 --think-time 2 --audio fixtures/patient_speech.wav
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import wave
+from collections import defaultdict
+
+import requests
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+def write_fixture_wav(path, seconds=3.0, sample_rate=16000):
+    """Write a silent mono 16-bit WAV to use as the trainee's utterance."""
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+class LoadStats:
+    """Thread-safe request and turn statistics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self.request_latencies = defaultdict(list)
+        self.turn_latencies = []
+        self.turns_failed = 0
+
+    def record_request(self, endpoint, status_code, latency):
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.request_latencies[endpoint].append(latency)
+            if status_code == 429:
+                self.throttled[endpoint] += 1
+            elif status_code is None or status_code >= 400:
+                self.errors[endpoint] += 1
+
+    def record_turn(self, latency):
+        with self.lock:
+            if latency is None:
+                self.turns_failed += 1
+            else:
+                self.turn_latencies.append(latency)
+
+
+class VirtualHeadset(threading.Thread):
+    """One simulated headset running sessions back to back."""
+
+    def __init__(self, index, args, stats, stop_at):
+        super().__init__(name=f"headset-{index}", daemon=True)
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.stop_at = stop_at
+        self.session_id = f"loadtest-{index}"
+        self.seq = 0  # Turn number within the current session
+        self.http = requests.Session()
+        self.audio_dir = os.path.join(args.work_dir, self.session_id) + os.sep
+        os.makedirs(self.audio_dir, exist_ok=True)
+
+    def request(self, method, endpoint, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.args.server}{path}", timeout=self.args.timeout, **kwargs)
+            self.stats.record_request(endpoint, response.status_code, time.perf_counter() - start)
+            return response
+        except requests.RequestException:
+            self.stats.record_request(endpoint, None, time.perf_counter() - start)
+            return None
+
+    def think(self):
+        if self.args.think_time > 0:
+            time.sleep(random.uniform(0.5, 1.5) * self.args.think_time)
+
+    def run_turn(self):
+        shutil.copyfile(self.args.audio, f"{self.audio_dir}patient_speech.wav")
+        start = time.perf_counter()
+
+        self.seq += 1
+        response = self.request("POST", "process_wav", "/process_wav", data={
+            "path": self.audio_dir,
+            "loaded_wav_file": "patient_speech",
+            "session_id": self.session_id,
+            "seq": self.seq,
+            "idempotency_key": uuid.uuid4().hex,
+        })
+        if response is None or response.status_code != 200:
+            return None
+
+        deadline = start + self.args.timeout
+        while time.perf_counter() < deadline:
+            response = self.request("GET", "check_status", "/check_status",
+                                    params={"session_id": self.session_id, "seq": self.seq})
+            if response is None:
+                return None
+            if response.status_code == 429:
+                time.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            if response.status_code != 200:
+                return None
+            if response.json().get("status") == "done":
+                break
+            time.sleep(self.args.poll_interval)
+        else:
+            return None
+
+        audio_path = urllib.parse.quote_plus(f"{self.audio_dir}therapist_speech.wav")
+        response = self.request("GET", "get_audio", f"/get_audio/{audio_path}")
+        if response is None or response.status_code != 200:
+            return None
+        return time.perf_counter() - start
+
+    def run(self):
+        if self.args.ramp_up > 0:
+            time.sleep(self.args.ramp_up * self.index / max(1, self.args.clients))
+
+        for _ in range(self.args.sessions):
+            if time.perf_counter() >= self.stop_at:
+                return
+            self.request("POST", "reset_conversation", "/reset_conversation",
+                         data={"reset_conversation": "yes", "session_id": self.session_id})
+            self.seq = 0
+            for _ in range(self.args.turns):
+                if time.perf_counter() >= self.stop_at:
+                    return
+                self.think()
+                self.stats.record_turn(self.run_turn())
+
+
+def print_report(stats, elapsed, args):
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+    print(f"\n{'='*72}")
+    print(f"LOAD TEST RESULTS - {args.clients} headsets, {elapsed:.1f}s")
+    print(f"{'='*72}")
+    print(f"{'endpoint':<20}{'requests':>9}{'req/s':>8}{'errors':>8}{'429s':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint in sorted(stats.requests):
+        latencies = stats.request_latencies[endpoint]
+        print(f"{endpoint:<20}{stats.requests[endpoint]:>9}{stats.requests[endpoint] / elapsed:>8.1f}"
+              f"{stats.errors[endpoint]:>8}{stats.throttled[endpoint]:>7}"
+              f"{ms(percentile(latencies, 50)):>9}{ms(percentile(latencies, 95)):>9}{ms(percentile(latencies, 99)):>9}")
+
+    turns = stats.turn_latencies
+    total_turns = len(turns) + stats.turns_failed
+    print(f"\nFull turns: {len(turns)} completed, {stats.turns_failed} failed "
+          f"({(stats.turns_failed / total_turns * 100) if total_turns else 0:.1f}% error rate), "
+          f"{len(turns) / elapsed:.2f} turns/s")
+    if turns:
+        print("Full-turn latency (process_wav -> audio received):")
+        for pct in (50, 90, 95, 99):
+            print(f"  p{pct:<3} {ms(percentile(turns, pct))} ms")
+        print(f"  max  {ms(max(turns))} ms")
+    print(f"{'='*72}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many VR headsets against the Flask API")
+    parser.add_argument("--server", default="http://127.0.0.1:5000", help="Server base URL")
+    parser.add_argument("--clients", type=int, default=10, help="Number of virtual headsets")
+    parser.add_argument("--sessions", type=int, default=1, help="Sessions per headset")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between turns (+/-50%%)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which headsets start")
+    parser.add_argument("--duration", type=float, default=None, help="Stop starting new turns after N seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between /check_status polls")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request and per-turn timeout")
+    parser.add_argument("--audio", default=None, help="WAV fixture for the trainee's speech (default: 3s silence)")
+    parser.add_argument("--work-dir", default=None, help="Directory for per-headset audio (must be readable by the server)")
+    args = parser.parse_args()
+
+    cleanup = args.work_dir is None
+    args.work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="vr_therapist_load_"))
+    if args.audio is None:
+        args.audio = os.path.join(args.work_dir, "fixture.wav")
+        write_fixture_wav(args.audio)
+
+    stats = LoadStats()
+    stop_at = time.perf_counter() + args.duration if args.duration else float("inf")
+    headsets = [VirtualHeadset(i, args, stats, stop_at) for i in range(args.clients)]
+
+    print(f"Starting {args.clients} virtual headsets against {args.server} ...")
+    start = time.perf_counter()
+    for headset in headsets:
+        headset.start()
+    for headset in headsets:
+        headset.join()
+    elapsed = time.perf_counter() - start
+
+    print_report(stats, elapsed, args)
+    if cleanup:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Model Lifecycle Manager
+-----------------------
+Keeps large local models (currently the TTS instance pool; ASR goes to the
+Google Web Speech API and holds no local model) resident only while they are
+needed:
+
+1. Idle unload: a model nobody has used for MODEL_IDLE_UNLOAD_SECONDS is
+   unloaded and its memory returned to the OS. The next request reloads it.
+2. Scheduled preload: at each MODEL_PRELOAD_TIMES entry ("HH:MM", local
+   time) models are loaded ahead of training hours, so the first trainee of
+   the day does not wait for a cold load.
+3. Memory-mapped weights: PyTorch checkpoints are re-opened with
+   torch.load(mmap=True) and assigned to the model in place of the copies
+   Coqui loaded. The weights then live in the page cache, shared by every
+   worker process that maps the same file, instead of one private copy per
+   process. Parameters the checkpoint does not hold in their final form
+   (e.g. vocoders that fold weight norm after loading) stay private.
+
+Memory per model (weights, mapped bytes, private RSS growth at load) and the
+process RSS are served at /metrics/models.
+
+Each gunicorn worker runs its own lifecycle thread (restarted after fork),
+since every process holds its own model instances.
+"""
+
+import ctypes
+import gc
+import os
+import threading
+import time
+from datetime import datetime
+
+from structured_logging import get_logger
+
+logger = get_logger("model_lifecycle")
+
+
+MODEL_IDLE_UNLOAD_SECONDS = 0     # Unload after this long unused (0 = keep loaded)
+MODEL_PRELOAD_TIMES = []          # Local "HH:MM" times to load models ahead of sessions
+MODEL_MMAP_WEIGHTS = True         # Serve PyTorch weights from memory-mapped checkpoints
+LIFECYCLE_CHECK_SECONDS = 30
+
+_models = {}
+_lock = threading.Lock()
+_lifecycle_thread = None
+_stop_event = threading.Event()
+
+
+class ManagedModel:
+    """
+    Args:
+        name: Model name in /metrics/models
+        load: Callable loading the model (a no-op if it is already loaded)
+        unload: Callable releasing it; returns False if it is in use
+        usage: Callable returning {"loaded": bool, "in_use": int, "last_used": epoch seconds or None}
+    """
+
+    def __init__(self, name, load, unload, usage):
+        self.name = name
+        self.load = load
+        self.unload = unload
+        self.usage = usage
+        self.loads = 0
+        self.unloads = 0
+        self.last_load_seconds = None
+        self.loaded_at = None
+        self.activated_at = None  # Last load or preload; counts as use for idle unloading
+        self.instances = 0
+        self.weight_bytes = 0
+        self.mapped_bytes = 0
+        self.private_rss_delta_bytes = 0
+
+    def snapshot(self):
+        usage = self.usage()
+        return {
+            "loaded": usage["loaded"],
+            "in_use": usage["in_use"],
+            "last_used": _isoformat(usage["last_used"]),
+            "loaded_at": _isoformat(self.loaded_at),
+            "instances": self.instances,
+            "weight_bytes": self.weight_bytes,
+            "mapped_bytes": self.mapped_bytes,
+            "private_rss_delta_bytes": self.private_rss_delta_bytes,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "last_load_seconds": self.last_load_seconds,
+        }
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+
+def configure_model_lifecycle(idle_unload_seconds=None, preload_times=None, mmap_weights=None):
+    """
+    Args:
+        idle_unload_seconds: Unload models unused for this long (0 disables)
+        preload_times: List of local "HH:MM" times to load models at
+        mmap_weights: Memory-map PyTorch checkpoints (call before models load)
+    """
+    global MODEL_IDLE_UNLOAD_SECONDS, MODEL_PRELOAD_TIMES, MODEL_MMAP_WEIGHTS
+    if idle_unload_seconds is not None:
+        MODEL_IDLE_UNLOAD_SECONDS = float(idle_unload_seconds)
+    if preload_times is not None:
+        for preload_time in preload_times:
+            datetime.strptime(preload_time, "%H:%M")  # Fail at startup on a malformed time
+        MODEL_PRELOAD_TIMES = list(preload_times)
+    if mmap_weights is not None:
+        MODEL_MMAP_WEIGHTS = bool(mmap_weights)
+
+
+def register_model(name, load, unload, usage):
+    """Put a model under lifecycle management (see ManagedModel)."""
+    with _lock:
+        _models[name] = ManagedModel(name, load, unload, usage)
+
+
+# ---------------------------------------------------------------------------
+# Memory accounting
+# ---------------------------------------------------------------------------
+
+def process_memory():
+    """
+    Resident memory of this process from /proc (Linux).
+
+    Returns:
+        dict: rss, rss_anon (private heap) and rss_file (file-backed, incl. mapped weights) in bytes,
+              empty where /proc is not available
+    """
+    fields = {"VmRSS:": "rss", "RssAnon:": "rss_anon", "RssFile:": "rss_file"}
+    memory = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    memory[fields[parts[0]]] = int(parts[1]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+def _torch_modules(instance):
+    """The PyTorch modules of a Coqui TTS instance (acoustic model and vocoder)."""
+    synthesizer = getattr(instance, "synthesizer", None)
+    for attribute in ("tts_model", "vocoder_model"):
+        module = getattr(synthesizer, attribute, None)
+        if module is not None and hasattr(module, "state_dict"):
+            yield attribute, module
+
+
+def weight_bytes(instance):
+    """Size of a model instance's weights (PyTorch tensors, or the ONNX graph file)."""
+    model_path = getattr(instance, "model_path", None)
+    if model_path and os.path.exists(model_path):
+        return os.path.getsize(model_path)
+    return sum(tensor.numel() * tensor.element_size()
+               for _, module in _torch_modules(instance)
+               for tensor in module.state_dict().values())
+
+
+def map_checkpoint_weights(module, checkpoint_path):
+    """
+    Replace module's tensors by memory-mapped views of checkpoint_path.
+
+    Only tensors stored in the checkpoint with the module's exact name, shape
+    and dtype are mapped; the rest keep the copies already loaded.
+
+    Returns:
+        int: Bytes now served from the mapped file
+    """
+    import torch
+
+    try:
+        checkpoint = torch.load(checkpoint_path, map_location="cpu", mmap=True, weights_only=False)
+    except (TypeError, RuntimeError, OSError) as e:
+        # torch < 2.1, or a legacy (non-zip) checkpoint that cannot be mapped
+        logger.info("Not memory-mapping %s: %s", checkpoint_path, e)
+        return 0
+
+    state = checkpoint.get("model", checkpoint) if isinstance(checkpoint, dict) else {}
+    current = module.state_dict()
+    mapped = {name: tensor for name, tensor in state.items()
+              if name in current and getattr(tensor, "shape", None) == current[name].shape
+              and tensor.dtype == current[name].dtype}
+    if not mapped:
+        return 0
+    try:
+        module.load_state_dict(mapped, strict=False, assign=True)
+    except TypeError:
+        return 0  # assign= needs torch >= 2.1
+    return sum(tensor.numel() * tensor.element_size() for tensor in mapped.values())
+
+
+def map_model_weights(instance):
+    """
+    Memory-map the weights of a freshly loaded Coqui TTS instance (no-op for
+    ONNX instances, or when MODEL_MMAP_WEIGHTS is off).
+
+    Returns:
+        int: Bytes served from mapped checkpoints
+    """
+    if not MODEL_MMAP_WEIGHTS:
+        return 0
+    synthesizer = getattr(instance, "synthesizer", None)
+    checkpoints = {"tts_model": getattr(synthesizer, "tts_checkpoint", None),
+                   "vocoder_model": getattr(synthesizer, "vocoder_checkpoint", None)}
+    mapped = 0
+    for attribute, module in _torch_modules(instance):
+        if checkpoints.get(attribute):
+            mapped += map_checkpoint_weights(module, checkpoints[attribute])
+    return mapped
+
+
+def tracked_load(name, factory):
+    """
+    Create one instance of model `name` with factory, memory-mapping its
+    weights and recording load time and memory for /metrics/models.
+
+    Returns:
+        The new instance
+    """
+    before = process_memory().get("rss_anon", 0)
+    start = time.perf_counter()
+    instance = factory()
+    mapped = map_model_weights(instance)
+    gc.collect()
+    elapsed = time.perf_counter() - start
+    delta = process_memory().get("rss_anon", 0) - before
+
+    model = _models.get(name)
+    if model is not None:
+        with _lock:
+            model.loads += 1
+            model.instances += 1
+            model.last_load_seconds = round(elapsed, 2)
+            model.loaded_at = model.loaded_at or time.time()
+            model.activated_at = time.time()
+            model.weight_bytes += weight_bytes(instance)
+            model.mapped_bytes += mapped
+            model.private_rss_delta_bytes += max(0, delta)
+    logger.info("Model loaded", extra={"fields": {"model": name, "seconds": round(elapsed, 2),
+                                                  "mapped_bytes": mapped, "private_rss_delta_bytes": delta}})
+    return instance
+
+
+def _release_memory():
+    """Collect the dropped model and hand freed heap pages back to the OS (glibc)."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Load / unload
+# ---------------------------------------------------------------------------
+
+def load_model(name):
+    """Load model `name` now (e.g. ahead of a session); restarts its idle timer."""
+    model = _models[name]
+    model.load()
+    model.activated_at = time.time()
+
+
+def unload_model(name):
+    """
+    Unload model `name` if nobody is using it.
+
+    Returns:
+        bool: True if it was unloaded
+    """
+    model = _models[name]
+    if not model.usage()["loaded"] or not model.unload():
+        return False
+    with _lock:
+        model.unloads += 1
+        model.instances = 0
+        model.weight_bytes = model.mapped_bytes = model.private_rss_delta_bytes = 0
+        model.loaded_at = None
+    _release_memory()
+    logger.info("Model unloaded", extra={"fields": {"model": name, "rss": process_memory().get("rss")}})
+    return True
+
+
+def unload_idle_models(now=None):
+    """
+    Unload every model unused for MODEL_IDLE_UNLOAD_SECONDS.
+
+    Returns:
+        list: Names of the unloaded models
+    """
+    if MODEL_IDLE_UNLOAD_SECONDS <= 0:
+        return []
+    now = now or time.time()
+    unloaded = []
+    for name, model in list(_models.items()):
+        usage = model.usage()
+        last_active = max(usage["last_used"] or 0, model.activated_at or 0)
+        if usage["loaded"] and not usage["in_use"] and now - last_active >= MODEL_IDLE_UNLOAD_SECONDS:
+            if unload_model(name):
+                unloaded.append(name)
+    return unloaded
+
+
+def _preload_due(previous, now):
+    """True if a MODEL_PRELOAD_TIMES entry falls in (previous, now]."""
+    for preload_time in MODEL_PRELOAD_TIMES:
+        hour, minute = (int(part) for part in preload_time.split(":"))
+        due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if previous < due <= now:
+            return True
+    return False
+
+
+def _lifecycle_loop():
+    previous = datetime.now()
+    while not _stop_event.wait(LIFECYCLE_CHECK_SECONDS):
+        now = datetime.now()
+        if _preload_due(previous, now):
+            for name in list(_models):
+                try:
+                    load_model(name)
+                    logger.info("Scheduled preload done", extra={"fields": {"model": name}})
+                except Exception as e:
+                    logger.warning("Scheduled preload of %s failed: %s", name, e)
+        previous = now
+        try:
+            unload_idle_models()
+        except Exception as e:
+            logger.warning("Idle model unload failed: %s", e)
+
+
+def start_model_lifecycle():
+    """Start the idle-unload/preload thread (idempotent; restarted in forked workers)."""
+    global _lifecycle_thread
+    if not MODEL_IDLE_UNLOAD_SECONDS and not MODEL_PRELOAD_TIMES:
+        return
+    if _lifecycle_thread is not None and _lifecycle_thread.is_alive():
+        return
+    _stop_event.clear()
+    _lifecycle_thread = threading.Thread(target=_lifecycle_loop, name="model-lifecycle", daemon=True)
+    _lifecycle_thread.start()
+
+
+def stop_model_lifecycle():
+    _stop_event.set()
+
+
+def _restart_after_fork():
+    # Threads do not survive fork: each gunicorn worker manages its own instances
+    global _lifecycle_thread, _lock, _stop_event
+    _lifecycle_thread = None
+    _lock = threading.Lock()
+    _stop_event = threading.Event()
+    start_model_lifecycle()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def get_model_metrics():
+    """Per-model state and memory, plus this process's resident memory."""
+    return {
+        "process": process_memory(),
+        "idle_unload_seconds": MODEL_IDLE_UNLOAD_SECONDS,
+        "preload_times": MODEL_PRELOAD_TIMES,
+        "mmap_weights": MODEL_MMAP_WEIGHTS,
+        "models": {name: model.snapshot() for name, model in list(_models.items())},
+    }
@@ -0,0 +1,176 @@
+"""
+Latency-Tiered Model Routing
+----------------------------
+Chooses the model for each LLM task (patient reply, evaluation,
+summarization) from an ordered candidate list in config.json:
+
+    "MODEL_ROUTES": {
+        "patient_reply": {"candidates": ["microsoft/Phi-3-mini-4k-instruct",
+                                         "meta-llama/Meta-Llama-3-8B-Instruct"],
+                          "latency_target_seconds": 4},
+        "evaluation":    {"candidates": ["meta-llama/Meta-Llama-3-70B-Instruct",
+                                         "meta-llama/Meta-Llama-3-8B-Instruct"],
+                          "latency_target_seconds": 45}
+    }
+
+Candidates are listed in order of preference. Each call goes to the first
+candidate whose recent end-to-end latency for that task (measured by
+llm_resilience) meets the task's target and whose call modes are not all
+circuit-broken. If none qualifies, the fastest measured candidate is used.
+A candidate skipped for being slow gets another chance after
+ROUTE_RETRY_SECONDS. Tasks without a route use MODEL_NAME.
+
+MODEL_ROUTES is re-read when config.json changes, without a restart.
+"""
+
+import json
+import os
+import threading
+import time
+
+from llm_resilience import get_task_stats, model_available
+from structured_logging import get_logger
+
+logger = get_logger("router")
+
+
+ROUTING_PERCENTILE = 90        # Recent latency percentile compared with the target
+ROUTING_MIN_SAMPLES = 3        # Below this a candidate counts as meeting its target
+ROUTE_RETRY_SECONDS = 300      # Re-measure a candidate this long after it was skipped as slow
+RELOAD_CHECK_SECONDS = 2.0     # How often config.json's mtime is checked
+
+TASKS = ("patient_reply", "evaluation", "summarization")
+
+
+class ModelRouter:
+    """
+    Args:
+        config_path: config.json to read (and watch) for MODEL_ROUTES
+        default_model: Model for tasks without a route
+    """
+
+    def __init__(self, config_path, default_model):
+        self.config_path = config_path
+        self.default_model = default_model
+        self.routes = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._slow_since = {}     # (task, model) -> time it was skipped for missing its target
+        self._decisions = {}      # task -> model chosen last
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        """Re-read MODEL_ROUTES if config.json changed. Keeps the old routes on a bad file."""
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        try:
+            with open(self.config_path) as file:
+                routes = json.load(file).get('MODEL_ROUTES', {})
+            routes = {task: _normalize_route(route) for task, route in routes.items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Could not reload MODEL_ROUTES from %s: %s", self.config_path, e)
+            self._mtime = mtime  # Don't retry until the file changes again
+            return False
+
+        with self._lock:
+            changed = routes != self.routes
+            self.routes = routes
+            self._mtime = mtime
+        if changed and not force:
+            logger.info("Model routes reloaded", extra={"fields": {"routes": routes}})
+        return changed
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check >= RELOAD_CHECK_SECONDS:
+            self._last_check = now
+            self.reload()
+
+    def candidates(self, task):
+        with self._lock:
+            route = self.routes.get(task)
+        if not route or not route["candidates"]:
+            return [self.default_model], None
+        return route["candidates"], route["latency_target_seconds"]
+
+    def route(self, task):
+        """
+        Pick the model for one call of `task`.
+
+        Returns:
+            str: Model name
+        """
+        self._maybe_reload()
+        candidates, target = self.candidates(task)
+        if len(candidates) == 1:
+            return self._decide(task, candidates[0])
+
+        now = time.monotonic()
+        measured = []
+        for model_name in candidates:
+            if not model_available(model_name):
+                continue
+            stats = get_task_stats(task, model_name)
+            latency = stats.percentile(ROUTING_PERCENTILE) if len(stats.latencies) >= ROUTING_MIN_SAMPLES else None
+
+            slow_since = self._slow_since.get((task, model_name))
+            if slow_since is not None and now - slow_since >= ROUTE_RETRY_SECONDS:
+                # Give a previously slow candidate a fresh measurement
+                stats.reset()
+                self._slow_since.pop((task, model_name), None)
+                latency = None
+
+            if latency is None or target is None or latency <= target:
+                return self._decide(task, model_name)
+
+            self._slow_since.setdefault((task, model_name), now)
+            measured.append((latency, model_name))
+
+        if measured:
+            return self._decide(task, min(measured)[1])
+        # Everything is circuit-broken; let the first candidate's breakers decide
+        return self._decide(task, candidates[0])
+
+    def _decide(self, task, model_name):
+        previous = self._decisions.get(task)
+        if previous != model_name:
+            if previous is not None:
+                logger.info("Routing %s from %s to %s", task, previous, model_name)
+            self._decisions[task] = model_name
+        return model_name
+
+    def snapshot(self):
+        """Routes, current choices and per-candidate latency, for /metrics/routing."""
+        tasks = {}
+        for task in sorted(set(TASKS) | set(self.routes)):
+            candidates, target = self.candidates(task)
+            tasks[task] = {
+                "latency_target_seconds": target,
+                "current_model": self._decisions.get(task),
+                "candidates": {
+                    model_name: {
+                        "available": model_available(model_name),
+                        **get_task_stats(task, model_name).snapshot(),
+                    }
+                    for model_name in candidates
+                },
+            }
+        return {"routing_percentile": ROUTING_PERCENTILE, "tasks": tasks}
+
+
+def _normalize_route(route):
+    if isinstance(route, list):
+        route = {"candidates": route}
+    candidates = route.get("candidates") or []
+    if isinstance(candidates, str):
+        candidates = [candidates]
+    target = route.get("latency_target_seconds")
+    return {
+        "candidates": [str(model_name) for model_name in candidates],
+        "latency_target_seconds": float(target) if target is not None else None,
+    }
@@ -0,0 +1,115 @@
+"""
+ONNX Runtime TTS Backend
+------------------------
+Runs a TTS model exported to ONNX (see tts_onnx_export.py) with ONNX Runtime
+instead of Coqui's eager PyTorch inference. Optionally int8-quantized.
+
+OnnxTTS has the parts of the TTS.api.TTS interface the server uses (tts(),
+tts_to_file() and synthesizer.output_sample_rate), so it drops into the TTS
+instance pool unchanged.
+
+Only end-to-end VITS models have a Coqui ONNX exporter: the graph maps
+phoneme ids straight to a waveform, so there is no separate vocoder graph.
+Text is turned into ids with the model's own Coqui tokenizer, read from the
+config saved next to the .onnx file.
+
+Enable with "TTS_BACKEND": "onnx" and "TTS_ONNX_MODEL": "<path to .onnx>"
+in config.json (requires `pip install onnxruntime`).
+"""
+
+import os
+import re
+
+import numpy as np
+
+from audio_buffer import wav_header, float_to_pcm16
+
+try:
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+SENTENCE_SILENCE_SAMPLES = 10000  # Pause inserted between sentences, as Coqui's synthesizer does
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def onnx_config_path(model_path):
+    """Config saved by tts_onnx_export.py for a model (shared by its fp32 and int8 graphs)."""
+    base = os.path.splitext(model_path)[0]
+    if base.endswith(".int8"):
+        base = base[:-len(".int8")]
+    return base + ".config.json"
+
+
+def default_intra_op_threads(pool_size):
+    """Split the cores between pool instances, so parallel syntheses don't oversubscribe the CPU."""
+    return max(1, (os.cpu_count() or 1) // max(1, int(pool_size)))
+
+
+class _Synthesizer:
+    def __init__(self, output_sample_rate):
+        self.output_sample_rate = output_sample_rate
+
+
+class OnnxTTS:
+    """
+    Args:
+        model_path: Exported .onnx graph (fp32 or int8)
+        config_path: Coqui model config (default: onnx_config_path(model_path))
+        intra_op_threads: ONNX Runtime intra-op threads (0 = runtime default)
+    """
+
+    def __init__(self, model_path, config_path=None, intra_op_threads=0):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed (pip install onnxruntime)")
+        from TTS.config import load_config
+        from TTS.tts.utils.text.tokenizer import TTSTokenizer
+
+        self.model_path = model_path
+        config = load_config(config_path or onnx_config_path(model_path))
+        self.tokenizer, config = TTSTokenizer.init_from_config(config)
+        self.scales = np.array([getattr(config, "inference_noise_scale", 0.667),
+                                getattr(config, "length_scale", 1.0),
+                                getattr(config, "inference_noise_scale_dp", 1.0)], dtype=np.float32)
+        self.synthesizer = _Synthesizer(config.audio.sample_rate)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self._inputs = {graph_input.name for graph_input in self.session.get_inputs()}
+
+    def _synthesize_sentence(self, sentence):
+        ids = np.array([self.tokenizer.text_to_ids(sentence)], dtype=np.int64)
+        feeds = {"input": ids, "input_lengths": np.array([ids.shape[1]], dtype=np.int64), "scales": self.scales,
+                 "sid": np.array([0], dtype=np.int64), "langid": np.array([0], dtype=np.int64)}
+        # Speaker/language ids only exist in multi-speaker/multilingual graphs
+        audio = self.session.run(None, {name: value for name, value in feeds.items() if name in self._inputs})[0]
+        return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+    def tts(self, text, **kwargs):
+        """
+        Returns:
+            numpy.ndarray: Float samples at synthesizer.output_sample_rate
+        """
+        sentences = [s for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+        parts = []
+        for sentence in sentences:
+            parts.append(self._synthesize_sentence(sentence))
+            parts.append(np.zeros(SENTENCE_SILENCE_SAMPLES, dtype=np.float32))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def tts_to_file(self, text, file_path, **kwargs):
+        pcm = float_to_pcm16(self.tts(text))
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(wav_header(len(pcm), self.synthesizer.output_sample_rate))
+            f.write(pcm)
+        return file_path
@@ -0,0 +1,133 @@
+"""
+Parallel Sentence Synthesis
+---------------------------
+Splits a reply at sentence boundaries and synthesizes the sentences
+concurrently, each on its own instance from the TTS pool, then joins the
+audio with short equal-power crossfades so playback stays continuous.
+
+A 3-sentence reply takes roughly as long as its longest sentence instead of
+the sum of all three, up to TTS_POOL_SIZE sentences at a time. Joining
+happens on the float samples, so the reply is normalized once as a whole
+(same loudness as a single-call synthesis).
+
+Each pooled PyTorch model would otherwise use every core for every call, so
+parallel synthesis gives each pool instance an equal share of the cores.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from onnx_tts import default_intra_op_threads
+from structured_logging import get_logger, with_log_context
+
+logger = get_logger("tts")
+
+
+TTS_PARALLEL_SENTENCES = True   # Synthesize the sentences of a reply concurrently
+TTS_CROSSFADE_MS = 10           # Crossfade between joined sentences
+MIN_SENTENCE_CHARS = 20         # Shorter sentences ("Okay.") are synthesized with the next one
+SENTENCE_WORKERS = 8            # Threads waiting on pool instances, shared by all replies
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_executor = ThreadPoolExecutor(max_workers=SENTENCE_WORKERS, thread_name_prefix="tts-sentence")
+
+
+def configure_parallel_synthesis(enabled=None, crossfade_ms=None, pool_size=None):
+    """
+    Args:
+        enabled: Synthesize sentences concurrently
+        crossfade_ms: Crossfade length between sentences
+        pool_size: TTS pool size; PyTorch intra-op threads are set to cores / pool_size
+    """
+    global TTS_PARALLEL_SENTENCES, TTS_CROSSFADE_MS
+    if enabled is not None:
+        TTS_PARALLEL_SENTENCES = bool(enabled)
+    if crossfade_ms is not None:
+        TTS_CROSSFADE_MS = float(crossfade_ms)
+    if TTS_PARALLEL_SENTENCES and pool_size and int(pool_size) > 1:
+        try:
+            import torch
+            torch.set_num_threads(default_intra_op_threads(pool_size))
+        except ImportError:
+            pass
+
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS):
+    """Split text into sentences, merging very short ones into the following sentence."""
+    sentences = []
+    pending = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {sentence}".strip() if pending else sentence.strip()
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def crossfade_concat(segments, crossfade_samples):
+    """
+    Join float audio segments, overlapping each boundary by crossfade_samples
+    with an equal-power (sin/cos) fade.
+
+    Returns:
+        numpy.ndarray: float32 samples
+    """
+    segments = [np.asarray(segment, dtype=np.float32).reshape(-1) for segment in segments]
+    segments = [segment for segment in segments if segment.size]
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+
+    overlaps = [min(int(crossfade_samples), previous.size, following.size)
+                for previous, following in zip(segments, segments[1:])]
+    output = np.empty(sum(segment.size for segment in segments) - sum(overlaps), dtype=np.float32)
+
+    position = 0
+    for index, segment in enumerate(segments):
+        overlap = overlaps[index - 1] if index else 0
+        if overlap:
+            phase = np.linspace(0.0, np.pi / 2, overlap, dtype=np.float32)
+            start = position - overlap
+            output[start:position] = output[start:position] * np.cos(phase) + segment[:overlap] * np.sin(phase)
+        output[position:position + segment.size - overlap] = segment[overlap:]
+        position += segment.size - overlap
+    return output
+
+
+def _synthesize(pool, text):
+    with pool.checkout() as tts:
+        samples = tts.tts(text=text)
+        return np.asarray(samples, dtype=np.float32), tts.synthesizer.output_sample_rate
+
+
+def synthesize_samples(pool, text):
+    """
+    Synthesize text with instances from pool, sentences in parallel when enabled.
+
+    Returns:
+        tuple: (float32 samples, sample_rate)
+    """
+    sentences = split_sentences(text) if TTS_PARALLEL_SENTENCES and pool.max_size > 1 else [text]
+    if len(sentences) <= 1:
+        return _synthesize(pool, text)
+
+    # The caller synthesizes the first sentence itself; the rest wait for free instances
+    futures = [_executor.submit(with_log_context(_synthesize), pool, sentence) for sentence in sentences[1:]]
+    try:
+        results = [_synthesize(pool, sentences[0])] + [future.result() for future in futures]
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    sample_rate = results[0][1]
+    samples = crossfade_concat([samples for samples, _ in results], sample_rate * TTS_CROSSFADE_MS / 1000.0)
+    logger.debug("Synthesized %d sentences in parallel", len(sentences))
+    return samples, sample_rate
@@ -1,10 +1,118 @@
-import sys
+"""
+Production launcher for the VR Therapist server.
+
+Runs app.py under a production WSGI server instead of Flask's debug server:
+- Linux/macOS: gunicorn with worker processes + threads. The app (and the TTS
+  models it loads) is imported once in the master before forking, so workers
+  share the model memory copy-on-write.
+- Windows: waitress (threads only - Windows cannot fork).
+
+Settings come from config.json (optional keys) and can be overridden on the
+command line:
+    SERVER_HOST     (default "0.0.0.0")
+    SERVER_PORT     (default 5000)
+    SERVER_WORKERS  (default 1)
+    SERVER_THREADS  (default 8)
+    SERVER_TIMEOUT  (default 300) - seconds before a stuck worker is restarted
+
+Usage:
+    python run_server.py
+    python run_server.py --workers 2 --threads 16 --port 8000
+"""
+
+import argparse
+import gc
+import json
 import os
+import sys
+
+# Run from the Server directory so config.json and relative paths resolve
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(SERVER_DIR)
+sys.path.insert(0, SERVER_DIR)
+
+
+def load_server_config(args):
+    """Merge config.json server settings with command-line overrides."""
+    with open(os.environ.get('VR_THERAPIST_CONFIG', 'config.json')) as file:
+        data = json.load(file)
+
+    settings = {
+        "host": args.host or data.get('SERVER_HOST', '0.0.0.0'),
+        "port": int(args.port or data.get('SERVER_PORT', 5000)),
+        "workers": int(args.workers or data.get('SERVER_WORKERS', 1)),
+        "threads": int(args.threads or data.get('SERVER_THREADS', 8)),
+        "timeout": int(data.get('SERVER_TIMEOUT', 300)),
+    }
+    if data.get('LLM_CASSETTE_MODE') == 'record' and settings["workers"] > 1:
+        # One writer keeps the cassette in request order (and replay cursors per process meaningful)
+        print("⚠ LLM_CASSETTE_MODE 'record' needs a single worker - using 1 worker")
+        settings["workers"] = 1
+    return settings
+
+
+def run_gunicorn(settings):
+    """Serve with gunicorn, preloading the app (and models) before forking workers."""
+    from gunicorn.app.base import BaseApplication
+
+    def pre_fork(server, worker):
+        # Move everything allocated during preload out of the GC's reach so the
+        # collector does not touch (and un-share) those pages in the workers
+        gc.freeze()
+
+    class VRTherapistApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    options = {
+        "bind": f"{settings['host']}:{settings['port']}",
+        "workers": settings["workers"],
+        "threads": settings["threads"],
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": settings["timeout"],
+        "pre_fork": pre_fork,
+    }
+    VRTherapistApplication(options).run()
+
+
+def run_waitress(settings):
+    """Serve with waitress (Windows)."""
+    from waitress import serve
+
+    if settings["workers"] > 1:
+        print("⚠ Multiple worker processes are not supported on Windows - using threads only")
+
+    from app import app
+    serve(app, host=settings["host"], port=settings["port"], threads=settings["threads"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the VR Therapist server for real traffic")
+    parser.add_argument("--host", help="Bind address (SERVER_HOST)")
+    parser.add_argument("--port", type=int, help="Bind port (SERVER_PORT)")
+    parser.add_argument("--workers", type=int, help="Worker processes (SERVER_WORKERS)")
+    parser.add_argument("--threads", type=int, help="Threads per worker (SERVER_THREADS)")
+    args = parser.parse_args()
+
+    settings = load_server_config(args)
+    print(f"Starting VR Therapist server on {settings['host']}:{settings['port']} "
+          f"({settings['workers']} worker(s) x {settings['threads']} thread(s))")
+
+    if sys.platform == "win32":
+        run_waitress(settings)
+    else:
+        run_gunicorn(settings)
 
-# Change to the Server directory
-server_dir = r"c:\Users\srini\Downloads\VR-Therapist-Virtual-Mental-Health-Experience\Server"
-os.chdir(server_dir)
-sys.path.insert(0, server_dir)
 
-# Now run the app
-exec(open('app.py').read())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Stage Scheduler
+---------------
+Admission control in front of the ASR, LLM and TTS stages. When many headsets
+finish speaking at once, work is ordered instead of competing freely:
+
+- priority classes: live patient reply > end-of-session evaluation > batch jobs
+  (conversation summaries, audio library builds)
+- per-session fair queuing within a class (round robin between sessions, so one
+  session's burst cannot starve another)
+- a global concurrency cap per stage
+- load shedding: new turns are refused with 429 + Retry-After while any stage
+  queue is over its bound
+
+Coroutines (async_app.py) wait in the same queues with stage_slot_async(),
+without holding a thread while they wait.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+
+from llm_resilience import CallStats
+from structured_logging import get_logger, log_context
+
+logger = get_logger("scheduler")
+
+
+PRIORITY_LIVE = 0
+PRIORITY_EVALUATION = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {PRIORITY_LIVE: "live", PRIORITY_EVALUATION: "evaluation", PRIORITY_BATCH: "batch"}
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a stage queue is over its bound; retry_after is in seconds."""
+
+    def __init__(self, stage, retry_after):
+        super().__init__(f"{stage} queue is full, retry after {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("session_id", "granted", "enqueued_at", "on_grant")
+
+    def __init__(self, session_id, on_grant=None):
+        self.session_id = session_id
+        self.granted = False
+        self.enqueued_at = time.perf_counter()
+        self.on_grant = on_grant   # Wakes a waiting coroutine (see acquire_async)
+
+
+class StageScheduler:
+    """
+    Priority + per-session fair queue with a concurrency cap for one stage.
+
+    Args:
+        name: Stage name ("asr", "llm", "tts")
+        max_concurrency: Jobs allowed to run at once
+        max_queue: Waiting jobs above which new turns are shed
+    """
+
+    def __init__(self, name, max_concurrency, max_queue):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self._cond = threading.Condition()
+        # priority -> OrderedDict(session_id -> deque of tickets); order = round robin
+        self._queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._waiting = 0
+        self._service_time = None   # EWMA of job duration, for Retry-After estimates
+        self.wait_stats = {p: CallStats(outcomes=("admitted",)) for p in PRIORITY_NAMES}
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+    def _next_ticket(self):
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session_id, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            del sessions[session_id]
+            if tickets:
+                sessions[session_id] = tickets   # Back of the round robin
+            return ticket
+        return None
+
+    def _dispatch(self):
+        granted = False
+        while self.active < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._waiting -= 1
+            self.active += 1
+            granted = True
+            if ticket.on_grant is not None:
+                ticket.on_grant()
+        if granted:
+            self._cond.notify_all()
+
+    def acquire(self, session_id, priority=PRIORITY_LIVE):
+        """Block until this stage has capacity for the job. Returns the time waited in seconds."""
+        with self._cond:
+            ticket = _Ticket(session_id)
+            self._queues[priority].setdefault(session_id, deque()).append(ticket)
+            self._waiting += 1
+            self._dispatch()
+            while not ticket.granted:
+                self._cond.wait()
+        waited = time.perf_counter() - ticket.enqueued_at
+        self.wait_stats[priority].record("admitted", waited)
+        return waited
+
+    async def acquire_async(self, session_id, priority=PRIORITY_LIVE):
+        """Coroutine version of acquire: waits in the same queue without blocking a thread."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = _Ticket(session_id, on_grant=wake)
+        with self._cond:
+            self._queues[priority].setdefault(session_id, deque()).append(ticket)
+            self._waiting += 1
+            self._dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            self._withdraw(ticket, priority)
+            raise
+        waited = time.perf_counter() - ticket.enqueued_at
+        self.wait_stats[priority].record("admitted", waited)
+        return waited
+
+    def _withdraw(self, ticket, priority):
+        """Take a cancelled waiter out of the queue (or give back the slot it was just granted)."""
+        with self._cond:
+            granted = ticket.granted
+            if not granted:
+                tickets = self._queues[priority].get(ticket.session_id)
+                if tickets is not None and ticket in tickets:
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._queues[priority][ticket.session_id]
+                    self._waiting -= 1
+        if granted:
+            self.release()
+
+    def release(self, duration=None):
+        with self._cond:
+            self.active -= 1
+            if duration is not None:
+                if self._service_time is None:
+                    self._service_time = duration
+                else:
+                    self._service_time = 0.8 * self._service_time + 0.2 * duration
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, session_id, priority=PRIORITY_LIVE):
+        """Run the body once the scheduler admits it (records logged inside are tagged with the stage)."""
+        queued = time.perf_counter()
+        self.acquire(session_id, priority)
+        start = time.perf_counter()
+        with log_context(stage=self.name):
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                self.release(elapsed)
+                logger.debug("Stage finished", extra={"fields": {
+                    "priority": PRIORITY_NAMES[priority],
+                    "wait_ms": round((start - queued) * 1000, 1),
+                    "run_ms": round(elapsed * 1000, 1)}})
+
+    @asynccontextmanager
+    async def slot_async(self, session_id, priority=PRIORITY_LIVE):
+        """Coroutine version of slot: `async with scheduler.slot_async(sid): ...`"""
+        queued = time.perf_counter()
+        await self.acquire_async(session_id, priority)
+        start = time.perf_counter()
+        with log_context(stage=self.name):
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                self.release(elapsed)
+                logger.debug("Stage finished", extra={"fields": {
+                    "priority": PRIORITY_NAMES[priority],
+                    "wait_ms": round((start - queued) * 1000, 1),
+                    "run_ms": round(elapsed * 1000, 1)}})
+
+    def retry_after(self):
+        """Estimated seconds until the current backlog drains (at least 1)."""
+        service_time = self._service_time or 1.0
+        backlog = self._waiting + self.active
+        return max(1, int(round(service_time * backlog / max(1, self.max_concurrency))))
+
+    def overloaded(self):
+        return self._waiting >= self.max_queue
+
+    def snapshot(self):
+        with self._cond:
+            waiting = {PRIORITY_NAMES[p]: sum(len(t) for t in q.values()) for p, q in self._queues.items()}
+            active = self.active
+        return {
+            "active": active,
+            "max_concurrency": self.max_concurrency,
+            "waiting": waiting,
+            "max_queue": self.max_queue,
+            "wait_times": {PRIORITY_NAMES[p]: stats.snapshot() for p, stats in self.wait_stats.items()},
+        }
+
+
+# Stage schedulers (see configure_schedulers)
+SCHEDULERS = {
+    "asr": StageScheduler("asr", max_concurrency=4, max_queue=32),
+    "llm": StageScheduler("llm", max_concurrency=8, max_queue=32),
+    "tts": StageScheduler("tts", max_concurrency=2, max_queue=32),
+}
+
+
+def configure_schedulers(asr_concurrency=None, llm_concurrency=None, tts_concurrency=None, max_queue=None):
+    """Override the default caps (called from app.py with config values)."""
+    for stage, value in (("asr", asr_concurrency), ("llm", llm_concurrency), ("tts", tts_concurrency)):
+        if value is not None:
+            SCHEDULERS[stage].max_concurrency = int(value)
+    if max_queue is not None:
+        for scheduler in SCHEDULERS.values():
+            scheduler.max_queue = int(max_queue)
+
+
+def stage_slot(stage, session_id, priority=PRIORITY_LIVE):
+    """Context manager admitting one job to a stage: `with stage_slot("llm", sid): ...`"""
+    return SCHEDULERS[stage].slot(session_id, priority)
+
+
+def stage_slot_async(stage, session_id, priority=PRIORITY_LIVE):
+    """Async context manager admitting one coroutine job: `async with stage_slot_async("llm", sid): ...`"""
+    return SCHEDULERS[stage].slot_async(session_id, priority)
+
+
+def check_admission():
+    """Raise SchedulerOverloaded if any stage queue is over its bound."""
+    for scheduler in SCHEDULERS.values():
+        if scheduler.overloaded():
+            raise SchedulerOverloaded(scheduler.name, scheduler.retry_after())
+
+
+def get_scheduler_metrics():
+    return {name: scheduler.snapshot() for name, scheduler in SCHEDULERS.items()}
@@ -0,0 +1,89 @@
+"""
+Per-session Conversation State
+------------------------------
+The conversation of one headset: patient condition and severity, trainee,
+turn count, message history and rolling memory. Both servers (app.py and
+async_app.py) keep one SessionState per session id, so headsets running at
+the same time each get their own patient, transcript and evaluation, and a
+reset only starts over the session that asked for it.
+
+Turns of one session are processed one at a time (turn_queue.py), so a
+SessionState is only changed by one turn at a time.
+"""
+
+import threading
+import time
+
+from conversation_memory import ConversationMemory
+from turn_queue import SESSION_IDLE_SECONDS
+
+
+MEMORY_RECENT_TOKENS = 400
+MEMORY_SUMMARY_TOKENS = 200
+_token_counter = None
+
+
+def configure_session_memory(recent_tokens=None, summary_tokens=None, token_counter=None):
+    """
+    Args:
+        recent_tokens: Token budget for turns kept verbatim in the prompt
+        summary_tokens: Token budget for the rolling summary
+        token_counter: Function returning the token count of a string
+    """
+    global MEMORY_RECENT_TOKENS, MEMORY_SUMMARY_TOKENS, _token_counter
+    if recent_tokens is not None:
+        MEMORY_RECENT_TOKENS = int(recent_tokens)
+    if summary_tokens is not None:
+        MEMORY_SUMMARY_TOKENS = int(summary_tokens)
+    if token_counter is not None:
+        _token_counter = token_counter
+
+
+class SessionState:
+    """Conversation state of one headset."""
+
+    def __init__(self, trainee_id, condition=None, severity=None):
+        self.trainee_id = trainee_id   # Trainee the evaluation is filed under (None counts as "unknown")
+        self.condition = condition     # e.g., "Anxiety", "Depression", "Bipolar Disorder", "PTSD"
+        self.severity = severity       # e.g., "mild", "moderate", "severe"
+        self.turn_count = 0
+        self.message_history = []      # Full conversation history for AI context
+        self.chat_history = []         # Patient lines (and the evaluation summary) as spoken
+        self.memory = ConversationMemory(
+            self.message_history,
+            recent_tokens=MEMORY_RECENT_TOKENS,
+            summary_tokens=MEMORY_SUMMARY_TOKENS,
+            token_counter=_token_counter
+        )
+        self.last_active = time.monotonic()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(session_id):
+    """The conversation of session_id (created on first use; idle sessions are dropped)."""
+    now = time.monotonic()
+    with _sessions_lock:
+        for stale in [sid for sid, session in _sessions.items()
+                      if now - session.last_active > SESSION_IDLE_SECONDS]:
+            del _sessions[stale]
+        session = _sessions.get(session_id)
+        if session is None:
+            session = _sessions[session_id] = SessionState(None)
+        session.last_active = now
+        return session
+
+
+def start_session(session_id, trainee_id=None, condition=None, severity=None):
+    """Replace session_id's conversation with a new one (other sessions are untouched)."""
+    session = SessionState(trainee_id, condition, severity)
+    with _sessions_lock:
+        _sessions[session_id] = session
+    return session
+
+
+def session_count():
+    with _sessions_lock:
+        return len(_sessions)
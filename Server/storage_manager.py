@@ -0,0 +1,418 @@
+"""
+Artifact Storage Manager
+------------------------
+Keeps the Evaluations/ directory (and, optionally, session audio directories)
+from growing without limit. A background compaction pass:
+
+1. Moves files older than STORAGE_HOT_DAYS into per-day archives
+   (Archive/YYYY-MM-DD.tar). Each member is compressed on its own:
+   JSON with zstd (gzip if `zstandard` is not installed), WAV as Opus
+   (gzip if `soundfile` cannot write Opus), PDFs stored as-is.
+2. Records every archived file in an sqlite index (Archive/index.sqlite)
+   with its archive, byte offset and codec, so it can still be fetched by id.
+3. If configured, deletes whole day archives older than STORAGE_RETENTION_DAYS,
+   then the oldest archives until the total is under STORAGE_MAX_ARCHIVE_MB.
+   Nothing is deleted unless one of the two is set, and the pass run at
+   server start only archives.
+
+An artifact's id is its path relative to the Server directory, e.g.
+"Evaluations/evaluation_20250101_120000.json".
+
+Usage:
+    python storage_manager.py            # one compaction pass
+    python storage_manager.py --stats    # index statistics only
+"""
+
+import argparse
+import gzip
+import io
+import os
+import sqlite3
+import tarfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from structured_logging import get_logger
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import soundfile
+    OPUS_AVAILABLE = "OPUS" in soundfile.available_subtypes("OGG")
+except (ImportError, OSError):
+    OPUS_AVAILABLE = False
+
+logger = get_logger("storage")
+
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SERVER_DIR, "Archive")
+INDEX_FILENAME = "index.sqlite"
+
+STORAGE_HOT_DAYS = 7             # Files younger than this stay as plain files
+STORAGE_RETENTION_DAYS = None    # Archives older than this are deleted (None keeps them)
+STORAGE_MAX_ARCHIVE_MB = None    # Oldest archives are deleted above this total (None: no limit)
+STORAGE_AUDIO_DIRS = []          # Extra directories of session WAVs to compact
+STORAGE_AUDIO_CODEC = "opus"     # "opus" or "gzip"
+STORAGE_COMPACTION_INTERVAL_SECONDS = 3600
+
+_compaction_lock = threading.Lock()
+_compaction_thread = None
+_stop_event = threading.Event()
+_last_run = {}
+
+
+def configure_storage(hot_days=None, retention_days=None, max_archive_mb=None, audio_dirs=None,
+                      audio_codec=None, interval_seconds=None):
+    """Override retention and compaction settings (None keeps the default)."""
+    global STORAGE_HOT_DAYS, STORAGE_RETENTION_DAYS, STORAGE_MAX_ARCHIVE_MB, STORAGE_AUDIO_DIRS
+    global STORAGE_AUDIO_CODEC, STORAGE_COMPACTION_INTERVAL_SECONDS
+    if hot_days is not None:
+        STORAGE_HOT_DAYS = float(hot_days)
+    if retention_days is not None:
+        STORAGE_RETENTION_DAYS = float(retention_days)
+    if max_archive_mb is not None:
+        STORAGE_MAX_ARCHIVE_MB = float(max_archive_mb)
+    if audio_dirs is not None:
+        STORAGE_AUDIO_DIRS = list(audio_dirs)
+    if audio_codec is not None:
+        STORAGE_AUDIO_CODEC = audio_codec
+    if interval_seconds is not None:
+        STORAGE_COMPACTION_INTERVAL_SECONDS = float(interval_seconds)
+
+
+def managed_directories():
+    """Directories whose cold files are compacted."""
+    return [os.path.join(SERVER_DIR, "Evaluations")] + [os.path.abspath(d) for d in STORAGE_AUDIO_DIRS]
+
+
+def artifact_id_for(path):
+    """Stable id of a managed file (relative to the Server directory when possible)."""
+    path = os.path.abspath(path)
+    relative = os.path.relpath(path, SERVER_DIR)
+    artifact_id = path if relative.startswith("..") else relative
+    return artifact_id.replace(os.sep, "/")
+
+
+def _connect():
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(ARCHIVE_DIR, INDEX_FILENAME), timeout=30)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS artifacts (
+            id TEXT PRIMARY KEY,
+            archive TEXT NOT NULL,
+            member TEXT NOT NULL,
+            data_offset INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            original_size INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            modified_at REAL NOT NULL,
+            archived_at REAL NOT NULL
+        )""")
+    connection.execute("CREATE INDEX IF NOT EXISTS artifacts_archive ON artifacts (archive)")
+    return connection
+
+
+# ---------------------------------------------------------------------------
+# Codecs
+# ---------------------------------------------------------------------------
+
+def _encode(path):
+    """
+    Compress one file for archiving.
+
+    Returns:
+        tuple: (stored bytes, codec name, member suffix)
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".wav" and STORAGE_AUDIO_CODEC == "opus" and OPUS_AVAILABLE:
+        data, sample_rate = soundfile.read(path, dtype="float32")
+        buffer = io.BytesIO()
+        soundfile.write(buffer, data, sample_rate, format="OGG", subtype="OPUS")
+        return buffer.getvalue(), "opus", ".opus"
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    if extension == ".pdf":
+        return raw, "raw", ""
+    if extension == ".json" and ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=10).compress(raw), "zstd", ".zst"
+    return gzip.compress(raw, compresslevel=6), "gzip", ".gz"
+
+
+def _decode(stored, codec):
+    """Restore the original file bytes (Opus audio comes back as a 16-bit WAV)."""
+    if codec == "raw":
+        return stored
+    if codec == "gzip":
+        return gzip.decompress(stored)
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read this artifact (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(stored)
+    if codec == "opus":
+        if not OPUS_AVAILABLE:
+            raise RuntimeError("soundfile with Opus support is required to read this artifact")
+        data, sample_rate = soundfile.read(io.BytesIO(stored), dtype="int16")
+        buffer = io.BytesIO()
+        soundfile.write(buffer, data, sample_rate, format="WAV", subtype="PCM_16")
+        return buffer.getvalue()
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+# ---------------------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------------------
+
+def _cold_files(now):
+    """Group managed files older than STORAGE_HOT_DAYS by the day they were written."""
+    cutoff = now - STORAGE_HOT_DAYS * 86400
+    by_day = {}
+    for directory in managed_directories():
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in (".json", ".pdf", ".wav"):
+                continue
+            modified = entry.stat().st_mtime
+            if modified < cutoff:
+                day = datetime.fromtimestamp(modified).strftime("%Y-%m-%d")
+                by_day.setdefault(day, []).append((entry.path, modified))
+    return by_day
+
+
+def _archive_day(connection, day, files):
+    """Append one day's files to its archive, index them, then remove the originals."""
+    archive_name = f"{day}.tar"
+    archive_path = os.path.join(ARCHIVE_DIR, archive_name)
+    archived = 0
+    saved = 0
+
+    with tarfile.open(archive_path, "a") as tar:
+        for path, modified in files:
+            try:
+                stored, codec, suffix = _encode(path)
+            except Exception as e:
+                logger.warning("Could not compress %s: %s", path, e)
+                continue
+
+            artifact_id = artifact_id_for(path)
+            info = tarfile.TarInfo(name=artifact_id.lstrip("/") + suffix)
+            info.size = len(stored)
+            info.mtime = modified
+            # Data starts after this member's header block(s); kept for direct reads
+            data_offset = tar.offset + len(info.tobuf(tar.format, tar.encoding, tar.errors))
+            tar.addfile(info, io.BytesIO(stored))
+
+            original_size = os.path.getsize(path)
+            connection.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (artifact_id, archive_name, info.name, data_offset, len(stored),
+                 original_size, codec, modified, time.time()))
+            connection.commit()
+            os.remove(path)  # Only after the index points at the archived copy
+
+            archived += 1
+            saved += original_size - len(stored)
+
+    return archived, saved
+
+
+def _archive_day_name(archive_name):
+    try:
+        return datetime.strptime(archive_name[:-len(".tar")], "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _enforce_retention(connection, now):
+    """Delete whole day archives past the age limit, then the oldest until under the size limit."""
+    if STORAGE_RETENTION_DAYS is None and STORAGE_MAX_ARCHIVE_MB is None:
+        return []
+
+    archives = []
+    for name in os.listdir(ARCHIVE_DIR):
+        day = _archive_day_name(name) if name.endswith(".tar") else None
+        if day is not None:
+            archives.append((day, name, os.path.getsize(os.path.join(ARCHIVE_DIR, name))))
+    archives.sort()
+
+    expire_before = (datetime.fromtimestamp(now) - timedelta(days=STORAGE_RETENTION_DAYS)
+                     if STORAGE_RETENTION_DAYS is not None else datetime.min)
+    total = sum(size for _, _, size in archives)
+    limit = STORAGE_MAX_ARCHIVE_MB * 1024 * 1024 if STORAGE_MAX_ARCHIVE_MB is not None else float("inf")
+    deleted = []
+
+    for day, name, size in archives:
+        if day >= expire_before and total <= limit:
+            break
+        connection.execute("DELETE FROM artifacts WHERE archive = ?", (name,))
+        connection.commit()
+        os.remove(os.path.join(ARCHIVE_DIR, name))
+        total -= size
+        deleted.append(name)
+
+    return deleted
+
+
+def run_compaction(now=None, apply_retention=True):
+    """
+    Run one compaction pass (archive cold files, then apply retention).
+
+    Args:
+        now: Timestamp to age files against (default: current time)
+        apply_retention: Also delete archives past the configured limits
+
+    Returns:
+        dict: Counts for this pass, or {"skipped": True} if a pass is already running
+    """
+    if not _compaction_lock.acquire(blocking=False):
+        return {"skipped": True}
+    try:
+        now = now or time.time()
+        start = time.perf_counter()
+        connection = _connect()
+        try:
+            archived = 0
+            saved = 0
+            for day, files in sorted(_cold_files(now).items()):
+                count, day_saved = _archive_day(connection, day, files)
+                archived += count
+                saved += day_saved
+            deleted = _enforce_retention(connection, now) if apply_retention else []
+        finally:
+            connection.close()
+
+        result = {
+            "archived_files": archived,
+            "bytes_saved": saved,
+            "deleted_archives": deleted,
+            "seconds": round(time.perf_counter() - start, 3),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        _last_run.clear()
+        _last_run.update(result)
+        if archived or deleted:
+            logger.info("Storage compaction: archived %d file(s), saved %.1f MB, deleted %d archive(s)",
+                        archived, saved / 1e6, len(deleted))
+        return result
+    finally:
+        _compaction_lock.release()
+
+
+def _compaction_loop():
+    while not _stop_event.wait(STORAGE_COMPACTION_INTERVAL_SECONDS):
+        try:
+            run_compaction()
+        except Exception as e:
+            logger.warning("Storage compaction failed: %s", e)
+
+
+def start_background_compaction(run_now=True):
+    """Start the compaction thread (idempotent). Compaction never runs on the request path."""
+    global _compaction_thread
+    if _compaction_thread is not None and _compaction_thread.is_alive():
+        return
+    _stop_event.clear()
+
+    def run():
+        if run_now:
+            # Archive only: a first start after an upgrade must not delete old evaluations
+            try:
+                run_compaction(apply_retention=False)
+            except Exception as e:
+                logger.warning("Storage compaction failed: %s", e)
+        _compaction_loop()
+
+    _compaction_thread = threading.Thread(target=run, name="storage-compaction", daemon=True)
+    _compaction_thread.start()
+
+
+def stop_background_compaction():
+    _stop_event.set()
+
+
+# ---------------------------------------------------------------------------
+# Retrieval
+# ---------------------------------------------------------------------------
+
+def retrieve_artifact(artifact_id):
+    """
+    Fetch an artifact by id, whether it is still a plain file or archived.
+
+    Returns:
+        tuple: (bytes, filename) or None if the id is unknown or expired
+    """
+    artifact_id = artifact_id.replace("\\", "/")
+    path = os.path.abspath(os.path.join(SERVER_DIR, artifact_id))
+    if not any(os.path.dirname(path) == directory for directory in managed_directories()):
+        return None
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            return f.read(), os.path.basename(path)
+
+    connection = _connect()
+    try:
+        row = connection.execute(
+            "SELECT archive, data_offset, stored_size, codec FROM artifacts WHERE id = ?",
+            (artifact_id,)).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+
+    archive_name, data_offset, stored_size, codec = row
+    try:
+        with open(os.path.join(ARCHIVE_DIR, archive_name), "rb") as f:
+            f.seek(data_offset)
+            stored = f.read(stored_size)
+    except FileNotFoundError:
+        return None
+    return _decode(stored, codec), os.path.basename(path)
+
+
+def get_storage_metrics():
+    """Index and archive totals plus the last compaction pass, for /metrics/storage."""
+    connection = _connect()
+    try:
+        count, original, stored = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(original_size), 0), COALESCE(SUM(stored_size), 0) FROM artifacts"
+        ).fetchone()
+        by_codec = dict(connection.execute("SELECT codec, COUNT(*) FROM artifacts GROUP BY codec").fetchall())
+    finally:
+        connection.close()
+
+    archives = [name for name in os.listdir(ARCHIVE_DIR) if name.endswith(".tar")]
+    return {
+        "archived_artifacts": count,
+        "original_bytes": original,
+        "stored_bytes": stored,
+        "compression_ratio": round(original / stored, 2) if stored else None,
+        "artifacts_by_codec": by_codec,
+        "archives": len(archives),
+        "archive_bytes": sum(os.path.getsize(os.path.join(ARCHIVE_DIR, name)) for name in archives),
+        "codecs_available": {"zstd": ZSTD_AVAILABLE, "opus": OPUS_AVAILABLE},
+        "last_compaction": dict(_last_run) or None,
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Archive cold evaluation/audio files and apply retention")
+    parser.add_argument("--stats", action="store_true", help="Only print index statistics")
+    parser.add_argument("--hot-days", type=float, help="Archive files older than this many days")
+    args = parser.parse_args()
+
+    configure_storage(hot_days=args.hot_days)
+    if not args.stats:
+        print(json.dumps(run_compaction(), indent=2))
+    print(json.dumps(get_storage_metrics(), indent=2))
@@ -0,0 +1,201 @@
+"""
+Structured Logging
+------------------
+Non-blocking, correlated logging for the turn path.
+
+- Request threads only put records on an in-memory queue (QueueHandler); a
+  background QueueListener thread formats and writes them, so a slow stdout
+  never blocks a turn.
+- Every record carries the session id, turn id and stage of the code that
+  logged it (contextvars set with log_context()).
+- Records are written as JSON lines (LOG_FORMAT "json") or readable text.
+- LOG_SAMPLE_RATE keeps that fraction of turns' DEBUG/INFO records. A turn is
+  kept or dropped as a whole, so sampled turns stay fully traceable. Warnings
+  and errors are always kept.
+
+Thread pools and background threads do not inherit contextvars on their own;
+wrap their callables with with_log_context() to keep the turn's ids.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import traceback
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+LOGGER_NAME = "vr_therapist"
+
+_session_id = contextvars.ContextVar("session_id", default=None)
+_turn_id = contextvars.ContextVar("turn_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+_listener = None
+_handler = None
+
+
+@contextmanager
+def log_context(session_id=None, turn_id=None, stage=None):
+    """Tag every record logged inside the block (in this thread/context) with these ids."""
+    tokens = []
+    if session_id is not None:
+        tokens.append((_session_id, _session_id.set(session_id)))
+    if turn_id is not None:
+        tokens.append((_turn_id, _turn_id.set(turn_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def with_log_context(fn):
+    """Bind fn to the caller's log context, for thread pools and background threads."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+def current_log_context():
+    return {"session_id": _session_id.get(), "turn_id": _turn_id.get(), "stage": _stage.get()}
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the context ids in the logging thread, then apply turn sampling."""
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        record.session_id = _session_id.get()
+        record.turn_id = _turn_id.get()
+        record.stage = _stage.get()
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        key = record.turn_id or record.session_id
+        if key is None:
+            return True
+        # Same decision for every record of a turn
+        return (zlib.crc32(key.encode("utf-8")) % 10000) < self.sample_rate * 10000
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.msg,
+            "session_id": getattr(record, "session_id", None),
+            "turn_id": getattr(record, "turn_id", None),
+            "stage": getattr(record, "stage", None),
+            "thread": record.threadName,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        ids = "/".join(str(getattr(record, name, None) or "-") for name in ("session_id", "turn_id", "stage"))
+        line = f"{datetime.fromtimestamp(record.created):%H:%M:%S.%f}"[:-3] + \
+               f" {record.levelname:<7} [{ids}] {record.msg}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text.rstrip()
+        return line
+
+
+def setup_logging(level="INFO", log_format="json", sample_rate=1.0, stream=None):
+    """
+    Route the vr_therapist loggers through a queue to a background writer.
+
+    Args:
+        level: Minimum level ("DEBUG", "INFO", ...)
+        log_format: "json" or "text"
+        sample_rate: Fraction of turns whose DEBUG/INFO records are kept
+        stream: Output stream (default stdout)
+    """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _handler = DeferredQueueHandler(log_queue)
+    _handler.addFilter(ContextFilter(float(sample_rate)))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [_handler]
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    return logger
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork (gunicorn preload_app): give each
+    # worker its own queue and writer, and drop records copied from the parent
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=False)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def get_logger(name):
+    """Logger for one module, e.g. get_logger("app")."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
@@ -0,0 +1,204 @@
+"""
+Stub Backends for Load Testing
+------------------------------
+Offline stand-ins for speech recognition, the Hugging Face client and Mozilla
+TTS, with configurable simulated latency. Enable them with
+"STUB_BACKENDS": true in config.json to load-test the Flask API (see
+load_test.py) without network access, API costs or TTS models.
+StubAsyncInferenceClient stands in for AsyncInferenceClient in async_app.py.
+
+For production-shaped LLM timing, use a recorded cassette instead of the stub
+client (LLM_CASSETTE_MODE = "replay", see llm_cassette.py).
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+
+# Simulated latencies in seconds (scaled by STUB_LATENCY_SCALE)
+STUB_ASR_SECONDS = 0.5
+STUB_LLM_FIRST_TOKEN_SECONDS = 0.4
+STUB_LLM_TOKEN_SECONDS = 0.02
+STUB_TTS_REAL_TIME_FACTOR = 0.3
+STUB_LATENCY_SCALE = 1.0
+
+STUB_SAMPLE_RATE = 22050
+
+STUB_THERAPIST_LINES = [
+    "Hi, thank you for coming in today. How are you feeling?",
+    "That sounds really difficult. Can you tell me more about what's been going on?",
+    "What has been the hardest part for you?",
+    "How long have you been feeling this way?",
+    "It sounds like you're carrying a lot right now.",
+]
+
+STUB_PATIENT_LINES = [
+    "I'm... not great, honestly. Everything just feels overwhelming lately.",
+    "Work, mostly. I can't focus, and I keep thinking something bad will happen.",
+    "Maybe six months? It's gotten worse recently, and I don't really know why.",
+    "I guess I realized I can't handle it alone anymore. It's affecting everything.",
+]
+
+STUB_EVALUATION = """SCORE: 68
+
+STRENGTHS:
+- Used open-ended questions
+- Reflected the patient's feelings
+- Maintained a calm, non-judgmental tone
+
+IMPROVEMENTS:
+- Explore the patient's symptoms in more depth
+- Summarize what the patient said more often
+- Allow more silence before moving on
+
+FEEDBACK:
+The therapist built early rapport and asked good open questions. Deeper exploration of the patient's experience and more frequent summarizing would strengthen the alliance."""
+
+STUB_EVALUATION_JSON = json.dumps({
+    "score": 68,
+    "strengths": ["Used open-ended questions", "Reflected the patient's feelings",
+                  "Maintained a calm, non-judgmental tone"],
+    "improvements": ["Explore the patient's symptoms in more depth", "Summarize what the patient said more often",
+                     "Allow more silence before moving on"],
+    "feedback": "The therapist built early rapport and asked good open questions. Deeper exploration of the "
+                "patient's experience and more frequent summarizing would strengthen the alliance.",
+})
+
+_line_cycle = itertools.cycle(STUB_THERAPIST_LINES)
+_line_lock = threading.Lock()
+
+
+def configure_stub_backends(latency_scale=None):
+    """Scale all simulated latencies (0 = as fast as possible)."""
+    global STUB_LATENCY_SCALE
+    if latency_scale is not None:
+        STUB_LATENCY_SCALE = float(latency_scale)
+
+
+def _sleep(seconds):
+    if STUB_LATENCY_SCALE > 0 and seconds > 0:
+        time.sleep(seconds * STUB_LATENCY_SCALE)
+
+
+async def _sleep_async(seconds):
+    if STUB_LATENCY_SCALE > 0 and seconds > 0:
+        await asyncio.sleep(seconds * STUB_LATENCY_SCALE)
+
+
+def stub_transcribe_audio(input_path):
+    """Pretend to transcribe input_path; returns a canned therapist line."""
+    if not os.path.exists(input_path):
+        return f"Error occurred during speech recognition: {input_path} not found"
+    _sleep(STUB_ASR_SECONDS)
+    with _line_lock:
+        return next(_line_cycle)
+
+
+def _stub_response_text(prompt_text):
+    if "EVALUATION TASK" in prompt_text:
+        return STUB_EVALUATION_JSON if "JSON" in prompt_text else STUB_EVALUATION
+    return random.choice(STUB_PATIENT_LINES)
+
+
+def _tokens(text):
+    """Split text into word-sized pseudo tokens, keeping whitespace."""
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+
+class StubInferenceClient:
+    """Offline replacement for huggingface_hub.InferenceClient."""
+
+    def _stream(self, text, wrap):
+        _sleep(STUB_LLM_FIRST_TOKEN_SECONDS)
+        for token in _tokens(text):
+            _sleep(STUB_LLM_TOKEN_SECONDS)
+            yield wrap(token)
+
+    def chat_completion(self, messages, model=None, stream=False, **kwargs):
+        text = _stub_response_text(messages[-1]["content"])
+        if stream:
+            return self._stream(text, lambda token: SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))]))
+        _sleep(STUB_LLM_FIRST_TOKEN_SECONDS + STUB_LLM_TOKEN_SECONDS * len(_tokens(text)))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+    def text_generation(self, prompt, model=None, stream=False, **kwargs):
+        text = _stub_response_text(prompt)
+        if stream:
+            return self._stream(text, lambda token: token)
+        _sleep(STUB_LLM_FIRST_TOKEN_SECONDS + STUB_LLM_TOKEN_SECONDS * len(_tokens(text)))
+        return text
+
+
+class StubAsyncInferenceClient:
+    """Offline replacement for huggingface_hub.AsyncInferenceClient."""
+
+    async def _stream(self, text, wrap):
+        await _sleep_async(STUB_LLM_FIRST_TOKEN_SECONDS)
+        for token in _tokens(text):
+            await _sleep_async(STUB_LLM_TOKEN_SECONDS)
+            yield wrap(token)
+
+    async def chat_completion(self, messages, model=None, stream=False, **kwargs):
+        text = _stub_response_text(messages[-1]["content"])
+        if stream:
+            return self._stream(text, lambda token: SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))]))
+        await _sleep_async(STUB_LLM_FIRST_TOKEN_SECONDS + STUB_LLM_TOKEN_SECONDS * len(_tokens(text)))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+    async def text_generation(self, prompt, model=None, stream=False, **kwargs):
+        text = _stub_response_text(prompt)
+        if stream:
+            return self._stream(text, lambda token: token)
+        await _sleep_async(STUB_LLM_FIRST_TOKEN_SECONDS + STUB_LLM_TOKEN_SECONDS * len(_tokens(text)))
+        return text
+
+
+class StubTTS:
+    """Offline replacement for TTS.api.TTS producing silence of a plausible length."""
+
+    def __init__(self, model_name=None, progress_bar=False, gpu=False):
+        self.model_name = model_name
+        self.synthesizer = SimpleNamespace(output_sample_rate=STUB_SAMPLE_RATE)
+
+    def _duration(self, text):
+        # Roughly 15 characters of speech per second
+        return max(0.5, len(text) / 15.0)
+
+    def tts(self, text, **kwargs):
+        duration = self._duration(text)
+        _sleep(duration * STUB_TTS_REAL_TIME_FACTOR)
+        return [0.0] * int(duration * STUB_SAMPLE_RATE)
+
+    def tts_to_file(self, text, file_path, **kwargs):
+        duration = self._duration(text)
+        _sleep(duration * STUB_TTS_REAL_TIME_FACTOR)
+        write_silent_wav(file_path, duration)
+        return file_path
+
+
+def write_silent_wav(path, seconds, sample_rate=STUB_SAMPLE_RATE):
+    """Write a mono 16-bit WAV of silence."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+def install_stub_tts():
+    """Make therapy_session load StubTTS instead of Coqui models."""
+    import therapy_session
+    therapy_session.TTS = StubTTS
+    therapy_session.TTS_MODEL_CANDIDATES = ["stub"]
+    therapy_session.TTS_RANKING_PATH = ""   # Ignore any real benchmark ranking
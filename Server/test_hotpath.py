@@ -0,0 +1,106 @@
+"""
+Offline tests for the per-turn text functions of therapy_session.py
+Needs no server, HF token or network. Run with `python test_hotpath.py` or pytest.
+See hotpath_benchmark.py for their speed.
+"""
+
+import random
+
+from therapy_session import (
+    PATIENT_CONDITIONS,
+    select_patient_condition,
+    generate_patient_prompt,
+    build_static_prompt_prefix,
+    get_speech_pattern_guidance,
+    clean_response,
+    parse_evaluation
+)
+from hotpath_fixtures import PATIENT_REPLY_CASES, EVALUATION_CASES, THERAPIST_MESSAGES, build_message_history
+
+SEVERITIES = ["mild", "moderate", "severe"]
+
+
+def test_clean_response():
+    """Noisy model replies are reduced to Sarah's spoken words"""
+    for raw, expected in PATIENT_REPLY_CASES:
+        assert clean_response(raw) == expected, raw
+
+
+def test_parse_evaluation():
+    """Evaluation texts (well-formed, markdown, truncated, empty) parse to the expected fields"""
+    for raw, expected in EVALUATION_CASES:
+        assert parse_evaluation(raw) == expected, raw
+
+
+def test_speech_pattern_guidance():
+    """Every condition has bullet-point guidance; unknown conditions get none"""
+    for condition in PATIENT_CONDITIONS:
+        guidance = get_speech_pattern_guidance(condition)
+        assert guidance.startswith("- ") and guidance.count("\n") >= 3, condition
+    assert get_speech_pattern_guidance("Unknown") == ""
+
+
+def test_select_patient_condition():
+    """Draws are valid and cover every condition and severity"""
+    rng_state = random.getstate()
+    random.seed(1234)
+    try:
+        draws = {select_patient_condition() for _ in range(500)}
+    finally:
+        random.setstate(rng_state)
+    assert {condition for condition, _ in draws} == set(PATIENT_CONDITIONS)
+    assert {severity for _, severity in draws} == set(SEVERITIES)
+
+
+def test_generate_patient_prompt():
+    """Static prefix first, then the last two exchanges, the therapist line and turn guidance"""
+    for condition in PATIENT_CONDITIONS:
+        for severity in SEVERITIES:
+            opening = generate_patient_prompt(condition, severity, THERAPIST_MESSAGES[0], [], 1)
+            assert opening.startswith(build_static_prompt_prefix(condition, severity))
+            assert "This is the start of the session." in opening
+            assert "This is the beginning of the therapy session." in opening
+            assert f'"{THERAPIST_MESSAGES[0]}"' in opening
+            assert opening.endswith("Respond now as Sarah, the patient:")
+
+    history = build_message_history(4)
+    prompt = generate_patient_prompt("Depression", "moderate", THERAPIST_MESSAGES[4], history, 5)
+    assert "This is turn 5 of the session." in prompt
+    for message in history[-4:]:
+        assert message["content"] in prompt
+    for message in history[:2]:
+        assert message["content"] not in prompt
+    assert f"Therapist: {history[-2]['content']}" in prompt
+    assert f"You: {history[-1]['content']}" in prompt
+
+
+TESTS = [
+    test_clean_response,
+    test_parse_evaluation,
+    test_speech_pattern_guidance,
+    test_select_patient_condition,
+    test_generate_patient_prompt,
+]
+
+
+def run_tests():
+    """
+    Run every test, printing one line per test.
+
+    Returns:
+        bool: True if all passed
+    """
+    passed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✓ PASS - {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ FAIL - {test.__name__}: {e}")
+    print(f"Results: {passed}/{len(TESTS)} tests passed")
+    return passed == len(TESTS)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if run_tests() else 1)
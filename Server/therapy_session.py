@@ -4,7 +4,23 @@ from TTS.api import TTS
 import os
 import random
 import json
+import time
+import uuid
+from functools import lru_cache
 from datetime import datetime
+from llm_resilience import call_with_fallbacks, LLM_BUDGETS
+from generation_control import GENERATION_BUDGETS, StreamController, truncate_to_budget
+from tts_pool import TTSPool
+from model_lifecycle import register_model, tracked_load
+from onnx_tts import OnnxTTS, default_intra_op_threads
+from structured_logging import get_logger
+from audio_buffer import publish_audio, float_to_pcm16, wav_header
+from parallel_synthesis import synthesize_samples
+from chunked_transcription import should_chunk, transcribe_audio_chunked
+from trainee_analytics import record_evaluation, UNKNOWN_TRAINEE
+from evaluation_schema import (IncrementalEvaluationParser, parse_evaluation_json, build_json_evaluation_instructions,
+                               build_field_repair_prompt, field_schema, EVALUATION_SCHEMA, EVALUATION_DEFAULTS,
+                               EVALUATION_FIELDS)
 try:
     from reportlab.lib.pagesizes import letter
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -17,8 +33,30 @@ except ImportError:
     print("⚠ Warning: reportlab not installed. PDF export disabled. Install with: pip install reportlab")
 
 
-# Global TTS instance
+logger = get_logger("therapy_session")
+
+# Global TTS instance (first instance of the pool below)
 _tts_instance = None
+_tts_model_name = None
+
+# Pool of TTS instances shared by concurrent syntheses (see tts_pool.py)
+_tts_pool = None
+TTS_POOL_SIZE = 2
+
+# TTS models tried by initialize_tts(), in default preference order.
+# Run `python tts_benchmark.py` to rank them by speed on this machine.
+TTS_MODEL_CANDIDATES = [
+    "tts_models/en/ljspeech/tacotron2-DDC",
+    "tts_models/en/ljspeech/glow-tts",
+    "tts_models/en/ljspeech/fast_pitch",
+]
+TTS_RANKING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_ranking.json")
+
+# "coqui" runs TTS.api models in PyTorch; "onnx" runs a model exported by
+# tts_onnx_export.py with ONNX Runtime (see onnx_tts.py), falling back to Coqui
+TTS_BACKEND = "coqui"
+TTS_ONNX_MODEL = None
+TTS_ONNX_THREADS = 0   # Intra-op threads per instance; 0 splits the cores across the pool
 
 
 # Patient condition definitions
@@ -66,47 +104,168 @@ PATIENT_CONDITIONS = {
 }
 
 
-def initialize_client(hf_token):
-    """Initialize Hugging Face Inference client."""
-    client = InferenceClient(token=hf_token)
+def initialize_client(hf_token, timeout=None):
+    """Initialize Hugging Face Inference client (timeout in seconds bounds each HTTP request)."""
+    client = InferenceClient(token=hf_token, timeout=timeout)
     return client
 
 
-def initialize_tts():
-    """Initialize Mozilla TTS model (singleton pattern)."""
+def load_tts_ranking(path=None):
+    """
+    Read the model ranking written by tts_benchmark.py.
+    
+    Returns:
+        dict: {"ranking": [fastest working model first], "failed": [models that failed]}
+              or None if no ranking file exists
+    """
+    path = path or TTS_RANKING_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return {
+            "ranking": list(data.get("ranking", [])),
+            "failed": [r["model_name"] for r in data.get("results", []) if r.get("status") != "ok"]
+        }
+    except Exception as e:
+        logger.warning("Could not read TTS ranking %s: %s", path, e)
+        return None
+
+
+def get_tts_model_order():
+    """
+    Order in which initialize_tts() tries TTS models.
+    
+    Uses the benchmark ranking (fastest first, known failures skipped) when
+    tts_ranking.json exists, otherwise the default TTS_MODEL_CANDIDATES order.
+    """
+    ranking = load_tts_ranking()
+    if ranking is None:
+        return list(TTS_MODEL_CANDIDATES)
+    
+    order = [m for m in ranking["ranking"] if m not in ranking["failed"]]
+    # Candidates that were never benchmarked go last, in default order
+    order += [m for m in TTS_MODEL_CANDIDATES if m not in order and m not in ranking["failed"]]
+    return order
+
+
+def configure_tts_pool(max_size):
+    """Set the maximum number of pooled TTS instances (call before initialize_tts)."""
+    global TTS_POOL_SIZE
+    TTS_POOL_SIZE = max(1, int(max_size))
+
+
+def configure_tts_backend(backend=None, onnx_model=None, onnx_threads=None):
+    """Select the synthesis backend (call before initialize_tts)."""
+    global TTS_BACKEND, TTS_ONNX_MODEL, TTS_ONNX_THREADS
+    if backend is not None:
+        TTS_BACKEND = backend
+    if onnx_model is not None:
+        TTS_ONNX_MODEL = onnx_model
+    if onnx_threads is not None:
+        TTS_ONNX_THREADS = int(onnx_threads)
+
+
+def _create_onnx_instance():
+    threads = TTS_ONNX_THREADS or default_intra_op_threads(TTS_POOL_SIZE)
+    return OnnxTTS(TTS_ONNX_MODEL, intra_op_threads=threads)
+
+
+def _create_tts_instance():
+    """Load another instance of the selected TTS model for the pool."""
+    if _tts_model_name.startswith("onnx:"):
+        return tracked_load("tts", _create_onnx_instance)
+    return tracked_load("tts", lambda: TTS(model_name=_tts_model_name, progress_bar=False, gpu=False))
+
+
+def get_tts_pool():
+    """Return the TTS instance pool, initializing TTS on first use."""
+    initialize_tts()
+    return _tts_pool
+
+
+def get_tts_pool_metrics():
+    """Pool size/utilisation/wait metrics, or None if TTS has not been initialized."""
+    if _tts_pool is None:
+        return None
+    return dict(_tts_pool.snapshot(), model_name=_tts_model_name)
+
+
+def unload_tts():
+    """
+    Release every pooled TTS instance if none is in use (see model_lifecycle.py).
+    The selected model is kept; the pool reloads it on the next checkout.
+
+    Returns:
+        bool: True if the instances were released
+    """
     global _tts_instance
-    if _tts_instance is None:
+    if _tts_pool is None or not _tts_pool.clear():
+        return False
+    _tts_instance = None
+    return True
+
+
+def _tts_usage():
+    if _tts_pool is None:
+        return {"loaded": False, "in_use": 0, "last_used": None}
+    snapshot = _tts_pool.snapshot()
+    return {"loaded": snapshot["size"] > 0, "in_use": snapshot["in_use"], "last_used": _tts_pool.last_used}
+
+
+def initialize_tts():
+    """Initialize Mozilla TTS model and the instance pool (singleton pattern)."""
+    global _tts_instance, _tts_model_name, _tts_pool
+    if _tts_pool is not None:
+        # Model already selected; instances unloaded when idle are reloaded by the pool
+        return _tts_instance
+
+    if _tts_instance is None and TTS_BACKEND == "onnx":
         try:
-            # Initialize TTS with a pretrained model
-            # Using Tacotron2-DDC for English (simpler, more reliable)
-            _tts_instance = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC", 
-                               progress_bar=False,
-                               gpu=False)
-            print("✓ Mozilla TTS initialized successfully")
+            _tts_instance = tracked_load("tts", _create_onnx_instance)
+            _tts_model_name = f"onnx:{os.path.basename(TTS_ONNX_MODEL)}"
+            logger.info("ONNX Runtime TTS initialized with %s", TTS_ONNX_MODEL)
         except Exception as e:
-            print(f"⚠ Error initializing TTS model tacotron2-DDC: {e}")
-            print("Attempting alternative TTS model (glow-tts)...")
+            logger.warning("Could not load ONNX TTS model %s: %s - falling back to Coqui TTS", TTS_ONNX_MODEL, e)
+
+    if _tts_instance is None:
+        model_order = get_tts_model_order()
+        if not model_order:
+            raise RuntimeError("No TTS models available - every candidate failed the benchmark (see tts_ranking.json)")
+        
+        for model_name in model_order:
             try:
-                _tts_instance = TTS(model_name="tts_models/en/ljspeech/glow-tts", 
-                                   progress_bar=False,
-                                   gpu=False)
-                print("✓ Mozilla TTS initialized with glow-tts model")
-            except Exception as e2:
-                print(f"⚠ Failed to initialize alternative model: {e2}")
-                print("Attempting fast_pitch model...")
-                try:
-                    _tts_instance = TTS(model_name="tts_models/en/ljspeech/fast_pitch",
-                                       progress_bar=False,
-                                       gpu=False)
-                    print("✓ Mozilla TTS initialized with fast_pitch model")
-                except Exception as e3:
-                    print(f"❌ All TTS models failed: {e3}")
+                _tts_instance = tracked_load("tts", lambda: TTS(model_name=model_name,
+                                                                progress_bar=False,
+                                                                gpu=False))
+                _tts_model_name = model_name
+                logger.info("Mozilla TTS initialized with %s", model_name)
+                break
+            except Exception as e:
+                logger.warning("Error initializing TTS model %s: %s", model_name, e)
+                if model_name == model_order[-1]:
+                    logger.error("All TTS models failed")
                     raise
+        
+    # Further instances of the same model are loaded lazily, up to TTS_POOL_SIZE
+    _tts_pool = TTSPool(_create_tts_instance, max_size=TTS_POOL_SIZE, initial=_tts_instance)
     return _tts_instance
 
 
+register_model("tts", load=lambda: get_tts_pool().warm(1), unload=unload_tts, usage=_tts_usage)
+
+
 def transcribe_audio(input_path):
-    """Transcribe audio file to text using Google Speech Recognition."""
+    """
+    Transcribe audio file to text using Google Speech Recognition.
+
+    Utterances longer than one ASR window are streamed and transcribed in
+    overlapping windows (see chunked_transcription.py).
+    """
+    if should_chunk(input_path):
+        return transcribe_audio_chunked(input_path)
+
     recognizer = sr.Recognizer()
     with sr.AudioFile(input_path) as source:
         audio = recognizer.record(source)
@@ -119,72 +278,132 @@ def transcribe_audio(input_path):
             return f"Error occurred during speech recognition: {e}"
 
 
-def generate_patient_response_from_ai(client, prompt_message, hf_token, model_name="meta-llama/Meta-Llama-3-8B-Instruct"):
+# Spoken when every LLM call mode fails or the turn budget runs out
+FALLBACK_PATIENT_LINE = "I... I'm having trouble focusing right now. Can you repeat that?"
+
+
+def _format_kwargs(response_format):
+    """Extra chat_completion arguments for schema-constrained output (omitted when unused)."""
+    return {"response_format": response_format} if response_format else {}
+
+
+def stream_chunk_text(message):
+    """Text of one streamed chat completion chunk (None if it carries none)."""
+    # Handle different response formats
+    if hasattr(message, 'choices') and len(message.choices) > 0:
+        delta = message.choices[0].delta
+        if hasattr(delta, 'content') and delta.content:
+            return delta.content
+    elif hasattr(message, 'delta') and hasattr(message.delta, 'content'):
+        return message.delta.content
+    return None
+
+
+def _chat_completion_stream(client, messages, model_name, budget, cancel_event=None,
+                            on_chunk=None, response_format=None):
+    """
+    Streaming chat completion.
+
+    Stops reading (and closes the upstream stream) once the generation budget
+    is met or cancel_event is set. on_chunk(text) sees each accepted chunk.
+    """
+    controller = StreamController(budget)
+    stream = client.chat_completion(
+        messages=messages,
+        model=model_name,
+        max_tokens=budget.max_tokens,
+        temperature=0.7,
+        stream=True,
+        **_format_kwargs(response_format)
+    )
+    try:
+        for message in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            content = stream_chunk_text(message)
+            if content:
+                done = controller.feed(content)
+                if on_chunk is not None:
+                    on_chunk(content)
+                if done:
+                    break
+    finally:
+        # Closing the generator releases the upstream HTTP stream
+        if hasattr(stream, 'close'):
+            stream.close()
+    return controller.text
+
+
+def _chat_completion_once(client, messages, model_name, budget, response_format=None):
+    """Non-streaming chat completion, trimmed to the generation budget."""
+    result = client.chat_completion(
+        messages=messages,
+        model=model_name,
+        max_tokens=budget.max_tokens,
+        temperature=0.7,
+        stream=False,
+        **_format_kwargs(response_format)
+    )
+    if hasattr(result, 'choices') and len(result.choices) > 0:
+        return truncate_to_budget((result.choices[0].message.content or "").strip(), budget)
+    return ""
+
+
+def _text_generation(client, prompt_message, model_name, budget, response_format=None):
+    """Plain text generation for models without chat completion support."""
+    extra = {"grammar": response_format} if response_format else {}
+    result = client.text_generation(
+        prompt=prompt_message,
+        model=model_name,
+        max_new_tokens=budget.max_tokens,
+        temperature=0.7,
+        return_full_text=False,
+        **extra
+    )
+    text = result.strip() if isinstance(result, str) else str(result)
+    return truncate_to_budget(text, budget)
+
+
+def generate_patient_response_from_ai(client, prompt_message, hf_token, model_name="meta-llama/Meta-Llama-3-8B-Instruct",
+                                      task="patient_reply", on_chunk=None, response_format=None):
     """
     Generate AI patient response using Hugging Face Inference API.
     
+    Call modes (streaming chat, non-streaming chat, text_generation) are tried
+    under the task's latency budget, with hedging and per-mode circuit breakers
+    (see llm_resilience.py). Output is cut off once the task's sentence/length
+    budget is met (see generation_control.py).
+    
     Args:
         client: HuggingFace InferenceClient instance
         prompt_message: The prompt to send to the model
         hf_token: Hugging Face API token
         model_name: Model to use for inference
+        task: Budgets to apply ("patient_reply" or "evaluation")
+        on_chunk: Optional callback(text) for each chunk of the streaming call mode
+        response_format: Optional {"type": "json", "value": schema} to constrain the output
         
     Returns:
         str: Generated AI patient response (AI simulating a patient with mental health condition)
     """
-    try:
-        # Use chat completion with message history support
-        messages = [
-            {"role": "user", "content": prompt_message}
-        ]
-        
-        response = ""
-        for message in client.chat_completion(
-            messages=messages,
-            model=model_name,
-            max_tokens=500,
-            temperature=0.7,
-            stream=True
-        ):
-            # Handle different response formats
-            if hasattr(message, 'choices') and len(message.choices) > 0:
-                delta = message.choices[0].delta
-                if hasattr(delta, 'content') and delta.content:
-                    response += delta.content
-            elif hasattr(message, 'delta') and hasattr(message.delta, 'content'):
-                if message.delta.content:
-                    response += message.delta.content
-        
-        ai_patient_response = response.strip()
-        
-        # If no response, try non-streaming
-        if not ai_patient_response:
-            result = client.chat_completion(
-                messages=messages,
-                model=model_name,
-                max_tokens=500,
-                temperature=0.7,
-                stream=False
-            )
-            if hasattr(result, 'choices') and len(result.choices) > 0:
-                ai_patient_response = result.choices[0].message.content.strip()
-        
-    except Exception as e:
-        print(f"Error with Hugging Face API: {e}")
-        print("Attempting text generation instead of chat completion...")
-        try:
-            # Fallback to text_generation
-            result = client.text_generation(
-                prompt=prompt_message,
-                model=model_name,
-                max_new_tokens=500,
-                temperature=0.7,
-                return_full_text=False
-            )
-            ai_patient_response = result.strip() if isinstance(result, str) else str(result)
-        except Exception as e2:
-            print(f"Text generation also failed: {e2}")
-            ai_patient_response = "I... I'm having trouble focusing right now. Can you repeat that?"
+    messages = [
+        {"role": "user", "content": prompt_message}
+    ]
+    budget = GENERATION_BUDGETS.get(task, GENERATION_BUDGETS["patient_reply"])
+
+    attempts = [
+        ("chat_stream", lambda cancel: _chat_completion_stream(client, messages, model_name, budget, cancel,
+                                                               on_chunk, response_format)),
+        ("chat", lambda cancel: _chat_completion_once(client, messages, model_name, budget, response_format)),
+        ("text_generation", lambda cancel: _text_generation(client, prompt_message, model_name, budget,
+                                                            response_format)),
+    ]
+
+    ai_patient_response = call_with_fallbacks(model_name, attempts, LLM_BUDGETS.get(task, LLM_BUDGETS["patient_reply"]),
+                                              task=task)
+    if not ai_patient_response:
+        logger.warning("All LLM call modes failed or timed out - using fallback response")
+        ai_patient_response = FALLBACK_PATIENT_LINE
     
     return ai_patient_response
 
@@ -202,7 +421,7 @@ def synthesize_speech(text, output_path):
     """
     try:
         # Initialize TTS if not already done
-        tts = initialize_tts()
+        pool = get_tts_pool()
         
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -213,14 +432,43 @@ def synthesize_speech(text, output_path):
         else:
             wav_path = output_path
         
-        # Generate speech
-        tts.tts_to_file(text=text, file_path=wav_path)
+        # Sentences are synthesized concurrently on pooled instances (see parallel_synthesis.py)
+        samples, sample_rate = synthesize_samples(pool, text)
+        pcm = float_to_pcm16(samples)
+        with open(wav_path, 'wb') as f:
+            f.write(wav_header(len(pcm), sample_rate))
+            f.write(pcm)
         
-        print(f"Speech synthesized successfully: {wav_path}")
+        logger.info("Speech synthesized", extra={"fields": {"path": wav_path}})
         return True
         
     except Exception as e:
-        print(f"Error synthesizing speech: {e}")
+        logger.error("Error synthesizing speech: %s", e)
+        return False
+
+
+def synthesize_speech_to_buffer(text, output_path):
+    """
+    Synthesize speech straight into the shared audio buffer (see audio_buffer.py).
+
+    /get_audio serves the reply from memory; the WAV file at output_path is
+    written in the background when AUDIO_PERSIST_TO_DISK is on.
+    
+    Args:
+        text: Text to convert to speech
+        output_path: Audio path the client will request
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        samples, sample_rate = synthesize_samples(get_tts_pool(), text)
+        publish_audio(output_path, float_to_pcm16(samples), sample_rate)
+        logger.info("Speech synthesized to shared buffer", extra={"fields": {"path": output_path}})
+        return True
+
+    except Exception as e:
+        logger.error("Error synthesizing speech: %s", e)
         return False
 
 
@@ -236,51 +484,27 @@ def select_patient_condition():
     return condition, severity
 
 
-def generate_patient_prompt(condition, severity, therapist_message, message_history, turn_count):
+@lru_cache(maxsize=64)
+def build_static_prompt_prefix(condition, severity):
     """
-    Generate a realistic patient prompt based on condition and conversation context.
+    The part of the patient prompt that is fixed for a whole session.
+
+    It comes first in every prompt, so providers with prefix caching only
+    process the per-turn suffix, and it is built once per condition/severity.
     
     Args:
         condition: The patient's mental health condition
         severity: Severity level (mild, moderate, severe)
-        therapist_message: What the therapist just said
-        message_history: Full conversation history
-        turn_count: Current turn number
         
     Returns:
-        str: Prompt for the AI to generate patient response
+        str: Static prompt prefix
     """
     condition_data = PATIENT_CONDITIONS[condition]
     symptoms = ", ".join(condition_data["symptoms"][:4])
     behaviors = ", ".join(condition_data["behaviors"][:3])
     severity_desc = condition_data["severity_levels"][severity]
-    
-    # Build conversation context
-    recent_context = ""
-    if len(message_history) > 0:
-        recent_exchanges = message_history[-4:]  # Last 2 exchanges
-        context_parts = []
-        for msg in recent_exchanges:
-            role = "Therapist" if msg["role"] == "therapist" else "You"
-            context_parts.append(f"{role}: {msg['content']}")
-        recent_context = "\n".join(context_parts)
-    
-    # Opening behavior for first message
-    opening_guidance = ""
-    if turn_count == 1:
-        opening_guidance = """This is the beginning of the therapy session. You are hesitant, perhaps nervous or guarded. You might:
-- Give brief, cautious responses initially
-- Test the therapist's empathy and understanding
-- Show visible signs of your condition (anxiety, low energy, emotional volatility, or trauma responses)
-- Not immediately open up about deep issues"""
-    else:
-        opening_guidance = f"""This is turn {turn_count} of the session. Based on how the therapist has been treating you:
-- If they've shown empathy and good listening skills, gradually open up more
-- If they've been judgmental or dismissive, become more guarded or defensive
-- If they've asked good questions, provide more detailed answers
-- Show realistic emotional progression (don't change too quickly)"""
-    
-    prompt = f"""You are roleplaying as a patient in a therapy training simulation. Your role is to help train therapists by acting as a realistic patient with mental health challenges.
+
+    return f"""You are roleplaying as a patient in a therapy training simulation. Your role is to help train therapists by acting as a realistic patient with mental health challenges.
 
 YOUR CONDITION:
 - Diagnosis: {condition}
@@ -291,14 +515,6 @@ YOUR CONDITION:
 YOUR CHARACTER:
 You are Sarah, a 32-year-old software developer. You've been struggling with {condition.lower()} for about 6 months. You're skeptical about therapy but decided to try it because things have been getting worse. You are intelligent, articulate, but emotionally struggling. You have a tendency to intellectualize your feelings as a defense mechanism.
 
-CONVERSATION SO FAR:
-{recent_context if recent_context else "This is the start of the session."}
-
-THE THERAPIST JUST SAID:
-"{therapist_message}"
-
-{opening_guidance}
-
 YOUR RESPONSE GUIDELINES:
 1. Stay completely in character as Sarah with {condition}
 2. Show symptoms through your WORDS, not action descriptions - never use *asterisks* or [brackets] for actions
@@ -322,12 +538,118 @@ Just say what Sarah would say out loud in 2-3 sentences.
 
 AUTHENTIC SPEECH PATTERNS FOR {condition.upper()}:
 {get_speech_pattern_guidance(condition)}
+"""
+
+
+def generate_patient_prompt(condition, severity, therapist_message, message_history, turn_count, memory=None):
+    """
+    Generate a realistic patient prompt based on condition and conversation context.
+    
+    The session-static part (see build_static_prompt_prefix) comes first and
+    the conversation-dependent part last.
+    
+    Args:
+        condition: The patient's mental health condition
+        severity: Severity level (mild, moderate, severe)
+        therapist_message: What the therapist just said
+        message_history: Full conversation history
+        turn_count: Current turn number
+        memory: Optional ConversationMemory; when given, its token-budgeted
+                summary + recent turns replace the last-2-exchanges window
+        
+    Returns:
+        str: Prompt for the AI to generate patient response
+    """
+    # Build conversation context
+    recent_context = ""
+    if memory is not None:
+        recent_context = memory.render_context()
+    elif len(message_history) > 0:
+        recent_exchanges = message_history[-4:]  # Last 2 exchanges
+        context_parts = []
+        for msg in recent_exchanges:
+            role = "Therapist" if msg["role"] == "therapist" else "You"
+            context_parts.append(f"{role}: {msg['content']}")
+        recent_context = "\n".join(context_parts)
+    
+    # Opening behavior for first message
+    opening_guidance = ""
+    if turn_count == 1:
+        opening_guidance = """This is the beginning of the therapy session. You are hesitant, perhaps nervous or guarded. You might:
+- Give brief, cautious responses initially
+- Test the therapist's empathy and understanding
+- Show visible signs of your condition (anxiety, low energy, emotional volatility, or trauma responses)
+- Not immediately open up about deep issues"""
+    else:
+        opening_guidance = f"""This is turn {turn_count} of the session. Based on how the therapist has been treating you:
+- If they've shown empathy and good listening skills, gradually open up more
+- If they've been judgmental or dismissive, become more guarded or defensive
+- If they've asked good questions, provide more detailed answers
+- Show realistic emotional progression (don't change too quickly)"""
+    
+    prompt = f"""{build_static_prompt_prefix(condition, severity)}
+CONVERSATION SO FAR:
+{recent_context if recent_context else "This is the start of the session."}
+
+THE THERAPIST JUST SAID:
+"{therapist_message}"
+
+{opening_guidance}
 
 Respond now as Sarah, the patient:"""
 
     return prompt
 
 
+def prewarm_session(client, condition, severity, hf_token, model_name):
+    """
+    Warm everything the session's first turn needs, right after the condition is chosen.
+
+    Builds and caches the static prompt prefix, sends it as a one-token
+    priming request (warms the provider's prefix cache and the pooled HTTP
+    connection), and makes sure a TTS instance is loaded.
+    
+    Args:
+        client: HuggingFace InferenceClient
+        condition: The patient's mental health condition
+        severity: Severity level (mild, moderate, severe)
+        hf_token: HuggingFace token
+        model_name: Model the session's turns will use
+        
+    Returns:
+        dict: Seconds spent on each step (None where a step failed)
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    prefix = build_static_prompt_prefix(condition, severity)
+    timings["prompt_prefix"] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    try:
+        client.chat_completion(
+            messages=[{"role": "user", "content": prefix}],
+            model=model_name,
+            max_tokens=1,
+            stream=False
+        )
+        timings["llm_priming"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logger.warning("LLM priming request failed: %s", e)
+        timings["llm_priming"] = None
+
+    start = time.perf_counter()
+    try:
+        get_tts_pool().warm(1)
+        timings["tts"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logger.warning("TTS warm-up failed: %s", e)
+        timings["tts"] = None
+
+    logger.info("Session prewarmed", extra={"fields": {"condition": condition, "severity": severity, **timings}})
+    return timings
+
+
 def get_speech_pattern_guidance(condition):
     """Get condition-specific speech pattern guidance."""
     patterns = {
@@ -397,29 +719,54 @@ def clean_response(response):
     return response
 
 
-def evaluate_therapist_performance(client, message_history, patient_condition, hf_token, model_name):
-    """
-    Evaluate the therapist's performance using LLM analysis.
-    
-    Args:
-        client: HuggingFace InferenceClient
-        message_history: Full conversation history
-        patient_condition: The patient's condition
-        hf_token: HuggingFace token
-        model_name: Model to use
-        
-    Returns:
-        dict: Evaluation results with score, strengths, improvements, and feedback
-    """
+EVALUATION_SCORING_GUIDANCE = ("Be honest and constructive. A typical beginner therapist scores 50-65. "
+                               "Good therapists score 70-85. Excellent therapists score 85+.")
+
+
+TEXT_EVALUATION_FORMAT = f"""
+Provide your evaluation in this EXACT format:
+
+SCORE: [number from 0-100]
+
+STRENGTHS:
+- [strength 1]
+- [strength 2]
+- [strength 3]
+
+IMPROVEMENTS:
+- [improvement area 1]
+- [improvement area 2]
+- [improvement area 3]
+
+FEEDBACK:
+[2-3 sentences of detailed, constructive feedback]
+
+{EVALUATION_SCORING_GUIDANCE}"""
+
+# Returned when the text-format evaluation cannot be generated
+FALLBACK_EVALUATION = {
+    "score": 60,
+    "strengths": ["Showed basic empathy", "Asked some relevant questions", "Maintained professional demeanor"],
+    "improvements": ["Could ask more open-ended questions", "Could validate emotions more explicitly", "Could explore patient's feelings more deeply"],
+    "feedback": "The session showed basic therapeutic skills but there's room for growth in building deeper rapport and using advanced techniques. Continue practicing active listening and validation.",
+    "fallback": True
+}
+
+
+def build_evaluation_prompt(message_history, patient_condition, memory=None, transcript_tokens=1500):
+    """Evaluation prompt up to (not including) the output format instructions."""
     # Build conversation transcript
-    transcript = []
-    for msg in message_history:
-        role = "Therapist" if msg["role"] == "therapist" else "Patient"
-        transcript.append(f"{role}: {msg['content']}")
-    
-    conversation_text = "\n".join(transcript)
+    if memory is not None:
+        conversation_text = memory.render_transcript(transcript_tokens)
+    else:
+        transcript = []
+        for msg in message_history:
+            role = "Therapist" if msg["role"] == "therapist" else "Patient"
+            transcript.append(f"{role}: {msg['content']}")
+        
+        conversation_text = "\n".join(transcript)
     
-    evaluation_prompt = f"""You are an expert clinical supervisor evaluating a therapy training session. The trainee therapist was working with a simulated patient who has {patient_condition}.
+    return f"""You are an expert clinical supervisor evaluating a therapy training session. The trainee therapist was working with a simulated patient who has {patient_condition}.
 
 THERAPY SESSION TRANSCRIPT:
 {conversation_text}
@@ -446,43 +793,144 @@ Analyze this therapy session and provide a comprehensive evaluation of the thera
    - Inappropriate responses or questions
    - Breaking therapeutic alliance
    - Over-directing or under-directing
+"""
 
-Provide your evaluation in this EXACT format:
 
-SCORE: [number from 0-100]
+def build_json_evaluation_prompt(evaluation_prompt):
+    """Evaluation prompt with the JSON output instructions (see evaluation_schema.py)."""
+    return f"{evaluation_prompt}\n{build_json_evaluation_instructions()}\n\n{EVALUATION_SCORING_GUIDANCE}"
 
-STRENGTHS:
-- [strength 1]
-- [strength 2]
-- [strength 3]
 
-IMPROVEMENTS:
-- [improvement area 1]
-- [improvement area 2]
-- [improvement area 3]
+def apply_evaluation_defaults(evaluation):
+    """Fill fields that are still missing after the repair call with their defaults."""
+    for field in EVALUATION_FIELDS:
+        if field not in evaluation:
+            logger.warning("Evaluation field '%s' still invalid - using default", field)
+            evaluation[field] = EVALUATION_DEFAULTS[field]
+    return evaluation
 
-FEEDBACK:
-[2-3 sentences of detailed, constructive feedback]
 
-Be honest and constructive. A typical beginner therapist scores 50-65. Good therapists score 70-85. Excellent therapists score 85+."""
+def evaluate_therapist_performance(client, message_history, patient_condition, hf_token, model_name,
+                                   memory=None, transcript_tokens=1500, output_format="text",
+                                   on_partial=None, json_grammar=False):
+    """
+    Evaluate the therapist's performance using LLM analysis.
+    
+    Args:
+        client: HuggingFace InferenceClient
+        message_history: Full conversation history
+        patient_condition: The patient's condition
+        hf_token: HuggingFace token
+        model_name: Model to use
+        memory: Optional ConversationMemory; bounds the transcript to transcript_tokens
+        transcript_tokens: Token budget for the transcript when memory is given
+        output_format: "text" (SCORE:/STRENGTHS: format) or "json" (see evaluation_schema.py)
+        on_partial: Optional callback(field, value) for fields parsed while the JSON reply streams
+        json_grammar: Also constrain the JSON reply server-side with response_format/grammar
+        
+    Returns:
+        dict: Evaluation results with score, strengths, improvements, and feedback
+              ("fallback": True when the LLM could not be reached and defaults were used)
+    """
+    evaluation_prompt = build_evaluation_prompt(message_history, patient_condition, memory, transcript_tokens)
+
+    if output_format == "json":
+        try:
+            return _evaluate_json(client, evaluation_prompt, hf_token, model_name, on_partial, json_grammar)
+        except Exception as e:
+            logger.error("Error generating JSON evaluation: %s", e)
+            return dict(EVALUATION_DEFAULTS, fallback=True)
+
+    evaluation_prompt += TEXT_EVALUATION_FORMAT
 
     try:
         # Generate evaluation
-        evaluation_text = generate_patient_response_from_ai(client, evaluation_prompt, hf_token, model_name)
+        evaluation_text = generate_patient_response_from_ai(client, evaluation_prompt, hf_token, model_name,
+                                                            task="evaluation")
+        if evaluation_text == FALLBACK_PATIENT_LINE:
+            raise RuntimeError("all LLM call modes failed")
         
         # Parse the evaluation
         parsed = parse_evaluation(evaluation_text)
         return parsed
         
     except Exception as e:
-        print(f"Error generating evaluation: {e}")
+        logger.error("Error generating evaluation: %s", e)
         # Return default evaluation on error
-        return {
-            "score": 60,
-            "strengths": ["Showed basic empathy", "Asked some relevant questions", "Maintained professional demeanor"],
-            "improvements": ["Could ask more open-ended questions", "Could validate emotions more explicitly", "Could explore patient's feelings more deeply"],
-            "feedback": "The session showed basic therapeutic skills but there's room for growth in building deeper rapport and using advanced techniques. Continue practicing active listening and validation."
-        }
+        return dict(FALLBACK_EVALUATION)
+
+
+def _evaluate_json(client, evaluation_prompt, hf_token, model_name, on_partial=None, json_grammar=False):
+    """
+    JSON-mode evaluation: stream and parse the reply incrementally, then
+    re-request only the fields that came back missing or malformed.
+    """
+    response_format = {"type": "json", "value": EVALUATION_SCHEMA} if json_grammar else None
+    prompt = build_json_evaluation_prompt(evaluation_prompt)
+
+    # Only the streaming call mode feeds the parser; the final reply is re-parsed below
+    parser = IncrementalEvaluationParser(on_partial)
+    evaluation_text = generate_patient_response_from_ai(client, prompt, hf_token, model_name, task="evaluation",
+                                                        on_chunk=parser.feed, response_format=response_format)
+    if evaluation_text == FALLBACK_PATIENT_LINE:
+        raise RuntimeError("all LLM call modes failed")
+    evaluation, invalid_fields = parse_evaluation_json(evaluation_text)
+
+    if invalid_fields:
+        logger.warning("Evaluation fields missing or malformed - re-requesting them",
+                       extra={"fields": {"invalid_fields": invalid_fields}})
+        repair_prompt = build_field_repair_prompt(evaluation_prompt, evaluation, invalid_fields)
+        # Constrain the repair to the invalid fields only, or the grammar would force all of them again
+        repair_format = {"type": "json", "value": field_schema(invalid_fields)} if json_grammar else None
+        repair_text = generate_patient_response_from_ai(client, repair_prompt, hf_token, model_name,
+                                                        task="evaluation", response_format=repair_format)
+        repaired, _ = parse_evaluation_json(repair_text)
+        for field in invalid_fields:
+            if field in repaired:
+                evaluation[field] = repaired[field]
+
+    return apply_evaluation_defaults(evaluation)
+
+
+def build_summary_prompt(previous_summary, new_messages, max_tokens):
+    """Prompt folding new_messages into the rolling session summary."""
+    transcript = "\n".join(
+        f"{'Therapist' if msg['role'] == 'therapist' else 'Patient'}: {msg['content']}"
+        for msg in new_messages
+    )
+    max_words = max(20, int(max_tokens * 0.75))
+    
+    return f"""You are keeping running notes on a therapy training session between a therapist and a patient.
+
+NOTES SO FAR:
+{previous_summary if previous_summary else "(none yet)"}
+
+NEW PART OF THE CONVERSATION:
+{transcript}
+
+Update the notes to cover the new part of the conversation. Keep what the patient has disclosed, how they are feeling, and how the therapist has approached them. Write plain prose in under {max_words} words. Reply with the updated notes only."""
+
+
+def summarize_conversation(client, previous_summary, new_messages, max_tokens, hf_token, model_name):
+    """
+    Fold new messages into a rolling session summary (used by ConversationMemory).
+    
+    Args:
+        client: HuggingFace InferenceClient
+        previous_summary: Summary so far ("" for the first update)
+        new_messages: Messages to fold into the summary
+        max_tokens: Rough token budget for the summary
+        hf_token: HuggingFace token
+        model_name: Model to use
+        
+    Returns:
+        str: Updated summary, or "" if generation failed
+    """
+    summary_prompt = build_summary_prompt(previous_summary, new_messages, max_tokens)
+    summary = generate_patient_response_from_ai(client, summary_prompt, hf_token, model_name, task="summarization")
+    if summary == FALLBACK_PATIENT_LINE:
+        return ""
+    return summary
 
 
 def parse_evaluation(evaluation_text):
@@ -546,7 +994,7 @@ def parse_evaluation(evaluation_text):
         }
         
     except Exception as e:
-        print(f"Error parsing evaluation: {e}")
+        logger.error("Error parsing evaluation: %s", e)
         return {
             "score": 60,
             "strengths": ["Showed engagement", "Maintained session structure"],
@@ -555,41 +1003,49 @@ def parse_evaluation(evaluation_text):
         }
 
 
-def save_evaluation(evaluation, base_path):
-    """Save evaluation results to PDF and JSON files in project directory."""
+def save_evaluation(evaluation, base_path, trainee_id=None, condition=None, severity=None, session_id=None):
+    """
+    Save evaluation results to PDF and JSON files in project directory.
+    
+    The JSON is tagged with the trainee, condition and severity, and the
+    evaluation is folded into the trainee progress aggregates (see trainee_analytics.py).
+    """
     try:
         # Create evaluations directory in the Server folder
         current_dir = os.path.dirname(os.path.abspath(__file__))
         eval_dir = os.path.join(current_dir, "Evaluations")
         os.makedirs(eval_dir, exist_ok=True)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        # Concurrent sessions can finish in the same second; the name is also the analytics key
+        name = f"evaluation_{now.strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}"
+        record = dict(evaluation, trainee_id=trainee_id or UNKNOWN_TRAINEE, condition=condition,
+                      severity=severity, session_id=session_id, saved_at=now.isoformat(timespec="seconds"))
         
         # Save JSON version
-        json_path = os.path.join(eval_dir, f"evaluation_{timestamp}.json")
+        json_path = os.path.join(eval_dir, f"{name}.json")
         with open(json_path, 'w') as f:
-            json.dump(evaluation, f, indent=2)
-        print(f"✓ Evaluation JSON saved to: {json_path}")
+            json.dump(record, f, indent=2)
+        logger.info("Evaluation JSON saved", extra={"fields": {"path": json_path}})
+        
+        try:
+            record_evaluation(f"Evaluations/{name}.json", record)
+        except Exception as e:
+            logger.warning("Could not update trainee analytics: %s", e)
         
         # Save PDF version if reportlab is available
         if REPORTLAB_AVAILABLE:
-            pdf_path = os.path.join(eval_dir, f"evaluation_{timestamp}.pdf")
+            pdf_path = os.path.join(eval_dir, f"{name}.pdf")
             create_evaluation_pdf(evaluation, pdf_path, timestamp)
-            print(f"✓ Evaluation PDF saved to: {pdf_path}")
-            print(f"\n{'='*60}")
-            print(f"EVALUATION FILES SAVED TO:")
-            print(f"{eval_dir}")
-            print(f"{'='*60}\n")
+            logger.info("Evaluation PDF saved", extra={"fields": {"path": pdf_path}})
         else:
-            print(f"⚠ PDF not created (reportlab not installed)")
-            print(f"JSON saved to: {eval_dir}")
+            logger.warning("PDF not created (reportlab not installed)", extra={"fields": {"directory": eval_dir}})
         
         return True
         
     except Exception as e:
-        print(f"Error saving evaluation: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error saving evaluation: %s", e)
         return False
 
 
@@ -706,7 +1162,5 @@ def create_evaluation_pdf(evaluation, pdf_path, timestamp):
         doc.build(elements)
         
     except Exception as e:
-        print(f"Error creating PDF: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating PDF: %s", e)
 
@@ -0,0 +1,338 @@
+"""
+Trainee Progress Analytics
+--------------------------
+Materialized per-trainee aggregates of evaluation results, updated as each
+evaluation is saved instead of recomputed from the evaluation_*.json files:
+
+- running score statistics (count, mean, stdev, min, max, last) per trainee
+  and condition,
+- a 10-point score histogram per trainee and condition,
+- weekly average score per trainee and condition (progress over time),
+- counts of recurring improvement themes, for the top-k areas to work on.
+
+Aggregates live in Evaluations/analytics.sqlite. Every row is keyed by
+trainee (and condition), so a dashboard query reads a handful of rows no
+matter how many evaluations exist. Each evaluation is folded in once
+(keyed by its artifact id); evaluations marked as fallbacks are not counted.
+
+Evaluations saved before trainee tagging count under trainee "unknown".
+
+Usage:
+    python trainee_analytics.py --backfill          # fold in evaluations not yet counted
+    python trainee_analytics.py --trainee alice     # print one trainee's summary
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from structured_logging import get_logger
+
+logger = get_logger("analytics")
+
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+EVALUATIONS_DIR = os.path.join(SERVER_DIR, "Evaluations")
+ANALYTICS_DB_PATH = os.path.join(EVALUATIONS_DIR, "analytics.sqlite")
+
+UNKNOWN_TRAINEE = "unknown"
+TOP_IMPROVEMENTS = 5
+
+# Improvement items are counted under the first theme whose keywords they contain
+IMPROVEMENT_THEMES = [
+    ("Risk and safety assessment", ("safety", "risk", "suicid", "self-harm", "harm")),
+    ("Open-ended questions", ("open-ended", "open ended", "closed question", "yes/no")),
+    ("Reflecting feelings", ("reflect", "paraphras", "mirror")),
+    ("Active listening", ("listen", "interrupt")),
+    ("Empathy and validation", ("empath", "validat", "acknowledg")),
+    ("Premature advice or reassurance", ("advice", "reassur", "fix", "solution")),
+    ("Pacing and silence", ("pace", "pacing", "silence", "slow", "rush", "pause")),
+    ("Summarizing", ("summar", "recap")),
+    ("Emotional exploration", ("explor", "deepen", "emotion", "feeling")),
+    ("Rapport and trust", ("rapport", "trust", "alliance", "warmth")),
+    ("Session structure and goals", ("goal", "agenda", "structure", "next step")),
+]
+OTHER_THEME = "Other"
+
+_lock = threading.Lock()
+
+
+def _connect(path=None):
+    path = path or ANALYTICS_DB_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS evaluations (
+            id TEXT PRIMARY KEY,
+            trainee TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            severity TEXT,
+            score INTEGER NOT NULL,
+            saved_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS score_stats (
+            trainee TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_sq_sum REAL NOT NULL,
+            min_score INTEGER NOT NULL,
+            max_score INTEGER NOT NULL,
+            last_score INTEGER NOT NULL,
+            last_at TEXT NOT NULL,
+            PRIMARY KEY (trainee, condition)
+        );
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            trainee TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (trainee, condition, bucket)
+        );
+        CREATE TABLE IF NOT EXISTS weekly_scores (
+            trainee TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            week TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            PRIMARY KEY (trainee, condition, week)
+        );
+        CREATE TABLE IF NOT EXISTS improvement_themes (
+            trainee TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (trainee, condition, theme)
+        );
+    """)
+    return connection
+
+
+def classify_improvement(text):
+    """Theme of one improvement item (OTHER_THEME if no keyword matches)."""
+    lowered = text.lower()
+    for theme, keywords in IMPROVEMENT_THEMES:
+        if any(keyword in lowered for keyword in keywords):
+            return theme
+    return OTHER_THEME
+
+
+def _bucket_label(bucket):
+    return f"{bucket * 10}-{bucket * 10 + 9 if bucket < 9 else 100}"
+
+
+def _week(saved_at):
+    year, week, _ = datetime.fromisoformat(saved_at).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def record_evaluation(evaluation_id, evaluation, trainee_id=None, condition=None, severity=None,
+                      saved_at=None, db_path=None):
+    """
+    Fold one saved evaluation into the aggregates (once per evaluation_id).
+
+    Args:
+        evaluation_id: Artifact id of the saved JSON, e.g. "Evaluations/evaluation_20250101_120000.json"
+        evaluation: Dict with score and improvements
+        trainee_id, condition, severity: Tags (fall back to the evaluation's own fields)
+        saved_at: ISO timestamp (default now)
+
+    Returns:
+        bool: True if it was counted, False if skipped (fallback, untagged score, already counted)
+    """
+    if evaluation.get("fallback"):
+        return False
+    try:
+        score = int(evaluation["score"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    trainee = trainee_id or evaluation.get("trainee_id") or UNKNOWN_TRAINEE
+    condition = condition or evaluation.get("condition") or "Unknown"
+    severity = severity or evaluation.get("severity")
+    saved_at = saved_at or evaluation.get("saved_at") or datetime.now().isoformat(timespec="seconds")
+    themes = {classify_improvement(item) for item in evaluation.get("improvements", []) if isinstance(item, str)}
+
+    with _lock:
+        connection = _connect(db_path)
+        try:
+            with connection:
+                inserted = connection.execute(
+                    "INSERT OR IGNORE INTO evaluations VALUES (?, ?, ?, ?, ?, ?)",
+                    (evaluation_id, trainee, condition, severity, score, saved_at)).rowcount
+                if not inserted:
+                    return False
+                connection.execute("""
+                    INSERT INTO score_stats VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (trainee, condition) DO UPDATE SET
+                        count = count + 1,
+                        score_sum = score_sum + excluded.score_sum,
+                        score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                        min_score = MIN(min_score, excluded.min_score),
+                        max_score = MAX(max_score, excluded.max_score),
+                        last_score = CASE WHEN excluded.last_at >= last_at THEN excluded.last_score ELSE last_score END,
+                        last_at = MAX(last_at, excluded.last_at)""",
+                    (trainee, condition, score, score * score, score, score, score, saved_at))
+                connection.execute("""
+                    INSERT INTO score_histogram VALUES (?, ?, ?, 1)
+                    ON CONFLICT (trainee, condition, bucket) DO UPDATE SET count = count + 1""",
+                    (trainee, condition, min(score // 10, 9)))
+                connection.execute("""
+                    INSERT INTO weekly_scores VALUES (?, ?, ?, 1, ?)
+                    ON CONFLICT (trainee, condition, week) DO UPDATE SET
+                        count = count + 1, score_sum = score_sum + excluded.score_sum""",
+                    (trainee, condition, _week(saved_at), score))
+                connection.executemany("""
+                    INSERT INTO improvement_themes VALUES (?, ?, ?, 1)
+                    ON CONFLICT (trainee, condition, theme) DO UPDATE SET count = count + 1""",
+                    [(trainee, condition, theme) for theme in themes])
+        finally:
+            connection.close()
+    return True
+
+
+def list_trainees(db_path=None):
+    """Every trainee with their evaluation count and mean score."""
+    connection = _connect(db_path)
+    try:
+        rows = connection.execute("""
+            SELECT trainee, SUM(count), SUM(score_sum) FROM score_stats
+            GROUP BY trainee ORDER BY trainee""").fetchall()
+    finally:
+        connection.close()
+    return [{"trainee_id": trainee, "evaluations": count, "mean_score": round(total / count, 1)}
+            for trainee, count, total in rows]
+
+
+def get_trainee_summary(trainee_id, condition=None, top_k=TOP_IMPROVEMENTS, db_path=None):
+    """
+    Dashboard view of one trainee, read from the materialized aggregates.
+
+    Args:
+        trainee_id: Trainee to summarize
+        condition: Only this condition (default: all, plus an overall total)
+        top_k: Number of improvement themes to return
+
+    Returns:
+        dict: overall, per-condition stats with histogram and weekly trend,
+              and the top-k improvement themes; None for an unknown trainee
+    """
+    where = "trainee = ?" + (" AND condition = ?" if condition else "")
+    params = (trainee_id, condition) if condition else (trainee_id,)
+
+    connection = _connect(db_path)
+    try:
+        stats = connection.execute(f"""
+            SELECT condition, count, score_sum, score_sq_sum, min_score, max_score, last_score, last_at
+            FROM score_stats WHERE {where}""", params).fetchall()
+        if not stats:
+            return None
+        histogram = connection.execute(
+            f"SELECT condition, bucket, count FROM score_histogram WHERE {where}", params).fetchall()
+        weekly = connection.execute(
+            f"SELECT condition, week, count, score_sum FROM weekly_scores WHERE {where} ORDER BY week",
+            params).fetchall()
+        themes = connection.execute(f"""
+            SELECT theme, SUM(count) AS total FROM improvement_themes WHERE {where}
+            GROUP BY theme ORDER BY total DESC, theme LIMIT ?""", params + (int(top_k),)).fetchall()
+    finally:
+        connection.close()
+
+    conditions = {}
+    for name, count, total, squares, low, high, last, last_at in stats:
+        mean = total / count
+        conditions[name] = {
+            "evaluations": count,
+            "mean_score": round(mean, 1),
+            "score_stdev": round(math.sqrt(max(0.0, squares / count - mean * mean)), 1),
+            "min_score": low,
+            "max_score": high,
+            "last_score": last,
+            "last_evaluated_at": last_at,
+            "score_histogram": {_bucket_label(bucket): 0 for bucket in range(10)},
+            "weekly_mean_score": [],
+        }
+    for name, bucket, count in histogram:
+        conditions[name]["score_histogram"][_bucket_label(bucket)] = count
+    for name, week, count, total in weekly:
+        conditions[name]["weekly_mean_score"].append(
+            {"week": week, "evaluations": count, "mean_score": round(total / count, 1)})
+
+    count = sum(row[1] for row in stats)
+    return {
+        "trainee_id": trainee_id,
+        "overall": {
+            "evaluations": count,
+            "mean_score": round(sum(row[2] for row in stats) / count, 1),
+            "last_evaluated_at": max(row[7] for row in stats),
+        },
+        "conditions": conditions,
+        "top_improvement_themes": [{"theme": theme, "count": total} for theme, total in themes],
+    }
+
+
+def _saved_evaluations():
+    """(artifact id, evaluation dict) for evaluation JSON on disk and in the storage archive."""
+    if os.path.isdir(EVALUATIONS_DIR):
+        for name in sorted(os.listdir(EVALUATIONS_DIR)):
+            if re.fullmatch(r"evaluation_.*\.json", name):
+                try:
+                    with open(os.path.join(EVALUATIONS_DIR, name)) as f:
+                        yield f"Evaluations/{name}", json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning("Skipping unreadable evaluation %s: %s", name, e)
+
+    from storage_manager import ARCHIVE_DIR, INDEX_FILENAME, retrieve_artifact
+    if not os.path.exists(os.path.join(ARCHIVE_DIR, INDEX_FILENAME)):
+        return
+    connection = sqlite3.connect(os.path.join(ARCHIVE_DIR, INDEX_FILENAME), timeout=30)
+    try:
+        ids = [row[0] for row in connection.execute(
+            "SELECT id FROM artifacts WHERE id LIKE 'Evaluations/evaluation_%.json' ORDER BY id")]
+    finally:
+        connection.close()
+    for artifact_id in ids:
+        artifact = retrieve_artifact(artifact_id)
+        if artifact is not None:
+            yield artifact_id, json.loads(artifact[0])
+
+
+def _timestamp_from_id(evaluation_id):
+    match = re.search(r"evaluation_(\d{8}_\d{6})", evaluation_id)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").isoformat(timespec="seconds")
+
+
+def backfill(db_path=None):
+    """
+    Fold in saved evaluations that are not counted yet (e.g. saved before
+    analytics existed, including archived ones).
+
+    Returns:
+        int: Number of evaluations added
+    """
+    added = 0
+    for evaluation_id, evaluation in _saved_evaluations():
+        if record_evaluation(evaluation_id, evaluation, saved_at=evaluation.get("saved_at")
+                             or _timestamp_from_id(evaluation_id), db_path=db_path):
+            added += 1
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trainee progress aggregates")
+    parser.add_argument("--backfill", action="store_true", help="Fold in saved evaluations not yet counted")
+    parser.add_argument("--trainee", help="Print this trainee's summary")
+    args = parser.parse_args()
+
+    if args.backfill:
+        print(f"✓ Added {backfill()} evaluations to the aggregates")
+    if args.trainee:
+        print(json.dumps(get_trainee_summary(args.trainee), indent=2))
+    elif not args.backfill:
+        print(json.dumps(list_trainees(), indent=2))
@@ -0,0 +1,125 @@
+"""
+TTS Model Benchmark
+-------------------
+Measures load time and real-time factor (synthesis time / audio duration) of
+each candidate TTS model on a fixed text set, and writes the ranking to
+tts_ranking.json. initialize_tts() reads that file at startup to load the
+fastest working model directly and skip models that failed here.
+
+Usage:
+    python tts_benchmark.py                 # benchmark all TTS_MODEL_CANDIDATES
+    python tts_benchmark.py --runs 3        # average over more runs
+    python tts_benchmark.py --models tts_models/en/ljspeech/glow-tts
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime
+
+from TTS.api import TTS
+
+from therapy_session import TTS_MODEL_CANDIDATES, TTS_RANKING_PATH
+
+
+# Representative patient lines: short, hesitant, and a longer summary sentence
+BENCHMARK_TEXTS = [
+    "I'm not sure how to answer that right now.",
+    "I... I don't know. It's been really hard to get out of bed most days.",
+    "Honestly, I'm a bit nervous being here. My mind just keeps racing and I can't seem to switch it off.",
+    "Thank you for the session. Here's your performance: Score 72/100. You did well in: "
+    "Showed empathy, Asked open-ended questions. Consider improving: Reflect feelings more explicitly.",
+]
+
+
+def benchmark_model(model_name, texts=BENCHMARK_TEXTS, runs=1, loader=None):
+    """
+    Benchmark a single TTS model.
+
+    Args:
+        loader: Optional callable returning the instance to benchmark (default:
+                the Coqui TTS model named model_name), e.g. an OnnxTTS
+
+    Returns:
+        dict: model_name, status ("ok"/"failed"), load_seconds, real_time_factor,
+              synthesis_seconds, audio_seconds (or error on failure)
+    """
+    result = {"model_name": model_name}
+    try:
+        start = time.perf_counter()
+        tts = loader() if loader else TTS(model_name=model_name, progress_bar=False, gpu=False)
+        result["load_seconds"] = round(time.perf_counter() - start, 3)
+
+        sample_rate = tts.synthesizer.output_sample_rate
+
+        # Warm-up so one-off allocations don't count against the model
+        tts.tts(text=texts[0])
+
+        synthesis_seconds = 0.0
+        audio_seconds = 0.0
+        for _ in range(runs):
+            for text in texts:
+                start = time.perf_counter()
+                wav = tts.tts(text=text)
+                synthesis_seconds += time.perf_counter() - start
+                audio_seconds += len(wav) / float(sample_rate)
+
+        result.update({
+            "status": "ok",
+            "synthesis_seconds": round(synthesis_seconds, 3),
+            "audio_seconds": round(audio_seconds, 3),
+            "real_time_factor": round(synthesis_seconds / audio_seconds, 4) if audio_seconds else None,
+        })
+        print(f"✓ {model_name}: load {result['load_seconds']}s, RTF {result['real_time_factor']}")
+
+    except Exception as e:
+        result.update({"status": "failed", "error": str(e)})
+        print(f"❌ {model_name} failed: {e}")
+
+    return result
+
+
+def run_benchmark(models=None, output_path=TTS_RANKING_PATH, runs=1):
+    """
+    Benchmark every model and write the ranking file.
+
+    Returns:
+        dict: The data written to output_path
+    """
+    models = models or TTS_MODEL_CANDIDATES
+    results = [benchmark_model(model_name, runs=runs) for model_name in models]
+
+    working = [r for r in results if r["status"] == "ok" and r.get("real_time_factor") is not None]
+    ranking = [r["model_name"] for r in sorted(working, key=lambda r: r["real_time_factor"])]
+
+    data = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+        "texts": len(BENCHMARK_TEXTS),
+        "ranking": ranking,
+        "results": results,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+    print(f"\n{'='*60}")
+    print("TTS MODEL RANKING (fastest first)")
+    print(f"{'='*60}")
+    for position, model_name in enumerate(ranking, 1):
+        print(f"{position}. {model_name}")
+    print(f"\nRanking saved to: {output_path}")
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TTS models and rank them by real-time factor")
+    parser.add_argument("--models", nargs="+", help="Models to benchmark (default: TTS_MODEL_CANDIDATES)")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the text set per model")
+    parser.add_argument("--output", default=TTS_RANKING_PATH, help="Ranking file to write")
+    args = parser.parse_args()
+
+    run_benchmark(args.models, args.output, args.runs)
@@ -0,0 +1,123 @@
+"""
+TTS ONNX Export
+---------------
+Exports a Coqui VITS model to ONNX for the ONNX Runtime backend (onnx_tts.py),
+optionally adds an int8 dynamically-quantized copy, and compares real-time
+factor against the current Coqui backend on the tts_benchmark.py text set.
+
+Writes, for e.g. tts_models/en/ljspeech/vits:
+    TTSModels/ljspeech_vits.onnx          fp32 graph
+    TTSModels/ljspeech_vits.int8.onnx     int8 weights (--quantize)
+    TTSModels/ljspeech_vits.config.json   Coqui config (tokenizer, sample rate)
+
+Only VITS-family models can be exported: Coqui has no ONNX exporter for the
+Tacotron2/Glow/FastPitch acoustic models or their separate vocoders.
+
+Usage:
+    python tts_onnx_export.py                                  # export, quantize, compare
+    python tts_onnx_export.py --model tts_models/en/vctk/vits --no-compare
+    python tts_onnx_export.py --compare-only --threads 4
+"""
+
+import argparse
+import os
+
+from TTS.api import TTS
+
+from onnx_tts import OnnxTTS, onnx_config_path, default_intra_op_threads
+from therapy_session import get_tts_model_order
+from tts_benchmark import benchmark_model
+
+DEFAULT_EXPORT_MODEL = "tts_models/en/ljspeech/vits"
+TTS_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TTSModels")
+
+
+def export_paths(model_name, output_dir=TTS_MODELS_DIR):
+    """
+    Returns:
+        tuple: (fp32 .onnx path, int8 .onnx path) for model_name
+    """
+    name = "_".join(model_name.split("/")[-2:])
+    base = os.path.join(output_dir, name)
+    return f"{base}.onnx", f"{base}.int8.onnx"
+
+
+def export_model(model_name=DEFAULT_EXPORT_MODEL, output_dir=TTS_MODELS_DIR, quantize=True):
+    """
+    Export model_name to ONNX (and an int8 copy).
+
+    Returns:
+        list: Paths of the exported graphs
+    """
+    fp32_path, int8_path = export_paths(model_name, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tts = TTS(model_name=model_name, progress_bar=False, gpu=False)
+    model = tts.synthesizer.tts_model
+    if not hasattr(model, "export_onnx"):
+        raise RuntimeError(f"{model_name} ({type(model).__name__}) has no ONNX exporter - use a VITS model")
+
+    model.export_onnx(output_path=fp32_path, verbose=False)
+    tts.synthesizer.tts_config.save_json(onnx_config_path(fp32_path))
+    print(f"✓ Exported {model_name} to {fp32_path}")
+    paths = [fp32_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✓ Quantized to {int8_path} ({os.path.getsize(int8_path) / os.path.getsize(fp32_path):.0%} of fp32 size)")
+        paths.append(int8_path)
+    return paths
+
+
+def compare_backends(model_name=DEFAULT_EXPORT_MODEL, output_dir=TTS_MODELS_DIR, threads=0, runs=1):
+    """
+    Real-time factor of the current Coqui model, the same VITS model in Coqui,
+    and its fp32/int8 ONNX graphs.
+
+    Returns:
+        list: tts_benchmark.benchmark_model results, labelled by backend
+    """
+    threads = threads or default_intra_op_threads(1)
+    current_model = (get_tts_model_order() or [model_name])[0]
+    candidates = [(f"coqui:{current_model}", None)]
+    if model_name != current_model:
+        candidates.append((f"coqui:{model_name}", None))
+    for path in export_paths(model_name, output_dir):
+        if os.path.exists(path):
+            candidates.append((f"onnx:{os.path.basename(path)}",
+                               lambda path=path: OnnxTTS(path, intra_op_threads=threads)))
+
+    results = []
+    for label, loader in candidates:
+        result = benchmark_model(label.split(":", 1)[1], runs=runs, loader=loader)
+        result["backend"] = label
+        results.append(result)
+
+    baseline = results[0].get("real_time_factor")
+    print(f"\n{'='*72}")
+    print(f"TTS BACKEND COMPARISON ({threads} ONNX intra-op threads)")
+    print(f"{'='*72}")
+    print(f"{'backend':<50}{'RTF':>10}{'speedup':>12}")
+    for result in results:
+        rtf = result.get("real_time_factor")
+        speedup = f"{baseline / rtf:.1f}x" if rtf and baseline else "-"
+        print(f"{result['backend']:<50}{rtf if rtf is not None else 'failed':>10}{speedup:>12}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a VITS TTS model to ONNX and compare backends")
+    parser.add_argument("--model", default=DEFAULT_EXPORT_MODEL, help="Coqui VITS model to export")
+    parser.add_argument("--output-dir", default=TTS_MODELS_DIR, help="Where to write the ONNX graphs")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    parser.add_argument("--no-compare", action="store_true", help="Skip the real-time factor comparison")
+    parser.add_argument("--compare-only", action="store_true", help="Compare previously exported graphs")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads (default: all cores)")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the text set per backend")
+    args = parser.parse_args()
+
+    if not args.compare_only:
+        export_model(args.model, args.output_dir, quantize=not args.no_quantize)
+    if not args.no_compare:
+        compare_backends(args.model, args.output_dir, args.threads, args.runs)
@@ -0,0 +1,143 @@
+"""
+TTS Instance Pool
+-----------------
+A bounded pool of TTS model instances. Each synthesis checks out one instance
+for its exclusive use, so concurrent sessions synthesize in parallel on
+separate model objects instead of racing on a single shared one.
+
+Instances are created lazily, up to max_size; when all are busy, callers wait
+for one to be returned. Checkout wait times are recorded for /metrics/tts.
+clear() drops every instance while the pool is idle (see model_lifecycle.py);
+the next checkout loads a fresh one.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_resilience import CallStats
+from structured_logging import get_logger
+
+logger = get_logger("tts_pool")
+
+
+class TTSPoolTimeout(Exception):
+    """Raised when no TTS instance became available within the checkout timeout."""
+
+
+class TTSPool:
+    """
+    Args:
+        factory: Callable creating a new TTS instance
+        max_size: Maximum number of instances
+        initial: Optional already-loaded instance to seed the pool with
+    """
+
+    def __init__(self, factory, max_size=2, initial=None):
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.last_used = None
+        self.wait_stats = CallStats(outcomes=("checkout", "timeout"))
+        if initial is not None:
+            self._idle.append(initial)
+            self._size = 1
+
+    def _acquire(self, timeout=None):
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        create = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    instance = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, load the model outside the lock
+                    self._size += 1
+                    create = True
+                    instance = None
+                    break
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    self.wait_stats.record("timeout", time.perf_counter() - start)
+                    raise TTSPoolTimeout(f"No TTS instance available after {timeout}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        if create:
+            try:
+                instance = self.factory()
+                logger.info("TTS pool grew to %d instance(s)", self._size)
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        self.wait_stats.record("checkout", time.perf_counter() - start)
+        return instance
+
+    def _release(self, instance):
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(instance)
+            self.last_used = time.time()
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an instance for one synthesis: `with pool.checkout() as tts: ...`"""
+        instance = self._acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self._release(instance)
+
+    def warm(self, count=1):
+        """Make sure at least `count` instances are loaded (e.g. before the first turn)."""
+        count = min(count, self.max_size)
+        while True:
+            with self._cond:
+                if self._size >= count:
+                    return
+                self._size += 1
+            try:
+                instance = self.factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(instance)
+                self._cond.notify()
+
+    def clear(self):
+        """
+        Drop all instances if none is checked out or loading.
+
+        Returns:
+            bool: True if the pool was emptied
+        """
+        with self._cond:
+            if self._in_use or len(self._idle) != self._size:
+                return False
+            self._idle = []
+            self._size = 0
+        logger.info("TTS pool cleared")
+        return True
+
+    def snapshot(self):
+        with self._cond:
+            size, idle, in_use = self._size, len(self._idle), self._in_use
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "idle": idle,
+            "in_use": in_use,
+            "checkout_wait": self.wait_stats.snapshot(),
+        }
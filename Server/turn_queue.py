@@ -0,0 +1,286 @@
+"""
+Sequenced Turn Submission
+-------------------------
+Per-session queue of submitted turns, replacing the single patient_wav_saved
+flag and the shared base_wav_path.
+
+/process_wav submits a turn with an optional client sequence number (`seq`)
+and idempotency key (`idempotency_key` form field or `Idempotency-Key`
+header). Each turn keeps its own audio path, and turns are processed one at a
+time per session in sequence order:
+
+- a retried submission (same key, or same seq) returns the turn already
+  queued instead of adding another one,
+- a turn arriving ahead of a missing earlier seq waits up to
+  TURN_GAP_TIMEOUT_SECONDS for it before being processed anyway,
+- a turn is processed exactly once; polls for a turn that is being processed
+  report "pending", and its result is kept so a retried poll gets the same
+  answer without running the turn again.
+
+Clients that send neither seq nor key are numbered in arrival order. For them
+a repeat of a still-queued audio path counts as a retry, as with the old flag.
+
+run_turns_async() is the coroutine version for async_app.py.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from structured_logging import get_logger
+
+logger = get_logger("turns")
+
+
+TURN_GAP_TIMEOUT_SECONDS = 5.0   # How long a later turn waits for a missing earlier seq
+TURN_HISTORY = 16                # Finished turns kept per session for retried submissions/polls
+SESSION_IDLE_SECONDS = 3600      # Sessions without activity for this long are forgotten
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+
+
+class Turn:
+    def __init__(self, seq, key, base_path):
+        self.seq = seq
+        self.key = key
+        self.base_path = base_path
+        self.state = QUEUED
+        self.result = None
+        self.reported = False   # Result returned to a poll without seq
+        self.submitted_at = time.monotonic()
+
+
+class SessionTurns:
+    """Ordered, deduplicating turn queue for one session."""
+
+    def __init__(self):
+        self.turns = OrderedDict()   # seq -> Turn, in seq order
+        self.keys = {}               # idempotency key -> seq
+        self.last_seq = 0            # Highest seq seen (numbering for clients without seq)
+        self.finished_seq = 0        # Highest seq processed or skipped
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+    def submit(self, base_path, seq=None, key=None):
+        """
+        Queue a turn, or find the one this submission is a retry of.
+
+        Returns:
+            tuple: (Turn, duplicate) - Turn is None for a seq that was already
+                   processed and has dropped out of the history
+        """
+        with self.lock:
+            self.last_active = time.monotonic()
+            if key is not None and key in self.keys:
+                return self.turns.get(self.keys[key]), True
+            if seq is not None:
+                if seq in self.turns:
+                    return self.turns[seq], True
+                if seq <= self.finished_seq:
+                    return None, True
+            elif key is None:
+                for turn in self.turns.values():
+                    if turn.state == QUEUED and turn.base_path == base_path:
+                        return turn, True
+
+            if seq is None:
+                seq = max(self.last_seq, self.finished_seq) + 1
+            turn = Turn(seq, key, base_path)
+            self.turns[seq] = turn
+            self.turns = OrderedDict(sorted(self.turns.items()))
+            self.last_seq = max(self.last_seq, seq)
+            if key is not None:
+                self.keys[key] = seq
+            return turn, False
+
+    def claim_next(self):
+        """
+        Take the next turn to process, in seq order.
+
+        Returns:
+            Turn or None: None while a turn is processing, nothing is queued,
+                          or the next queued turn is still waiting for a gap
+        """
+        with self.lock:
+            self.last_active = time.monotonic()
+            if any(turn.state == PROCESSING for turn in self.turns.values()):
+                return None
+            queued = [turn for turn in self.turns.values() if turn.state == QUEUED]
+            if not queued:
+                return None
+            turn = queued[0]
+            if turn.seq > self.finished_seq + 1 and \
+                    time.monotonic() - turn.submitted_at < TURN_GAP_TIMEOUT_SECONDS:
+                return None
+            if turn.seq > self.finished_seq + 1:
+                logger.warning("Turn %d never arrived; processing turn %d",
+                               self.finished_seq + 1, turn.seq)
+            turn.state = PROCESSING
+            return turn
+
+    def complete(self, turn, result):
+        with self.lock:
+            turn.result = result
+            turn.state = DONE
+            self.finished_seq = max(self.finished_seq, turn.seq)
+            self._prune()
+
+    def _prune(self):
+        finished = [seq for seq, turn in self.turns.items() if turn.state == DONE]
+        for seq in finished[:max(0, len(finished) - TURN_HISTORY)]:
+            turn = self.turns.pop(seq)
+            if turn.key is not None:
+                self.keys.pop(turn.key, None)
+
+    def get(self, seq):
+        with self.lock:
+            return self.turns.get(seq)
+
+    def expired(self, seq):
+        """True for a seq that was processed but has dropped out of the history."""
+        with self.lock:
+            return seq not in self.turns and seq <= self.finished_seq
+
+    def oldest_unreported(self):
+        """First finished turn whose result has not been returned to a seq-less poll."""
+        with self.lock:
+            for turn in self.turns.values():
+                if turn.state == DONE and not turn.reported:
+                    return turn
+            return None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "finished_seq": self.finished_seq,
+                "queued": sum(turn.state == QUEUED for turn in self.turns.values()),
+                "processing": sum(turn.state == PROCESSING for turn in self.turns.values()),
+            }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session_turns(session_id):
+    """The turn queue for session_id (created on first use; idle sessions are dropped)."""
+    now = time.monotonic()
+    with _sessions_lock:
+        for stale in [sid for sid, turns in _sessions.items()
+                      if now - turns.last_active > SESSION_IDLE_SECONDS]:
+            del _sessions[stale]
+        turns = _sessions.get(session_id)
+        if turns is None:
+            turns = _sessions[session_id] = SessionTurns()
+        return turns
+
+
+def reset_session_turns(session_id):
+    """Start a new conversation: turn numbering restarts at 1."""
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+
+
+def submit_turn(session_id, base_path, seq=None, key=None):
+    """
+    Returns:
+        tuple: (Turn or None, duplicate) - see SessionTurns.submit
+    """
+    turn, duplicate = get_session_turns(session_id).submit(base_path, seq, key)
+    if duplicate:
+        logger.info("Duplicate turn submission ignored",
+                    extra={"fields": {"seq": turn.seq if turn else seq, "idempotency_key": key}})
+    return turn, duplicate
+
+
+def run_turns(session_id, process_fn, seq=None):
+    """
+    Process queued turns of a session in order, each exactly once.
+
+    With seq, turns are processed up to and including that one; without it,
+    at most one turn is processed (the legacy poll).
+
+    Args:
+        process_fn: Callable(Turn) -> result dict
+        seq: The turn the caller is waiting for
+
+    Returns:
+        Turn or None: The finished turn to report (seq's turn, or for a poll
+                      without seq the oldest finished turn not yet reported),
+                      None while it is not finished
+    """
+    turns = get_session_turns(session_id)
+    while True:
+        if seq is not None:
+            target = turns.get(seq)
+            if target is None or target.state == DONE:
+                return target
+        turn = turns.claim_next()
+        if turn is None:
+            break
+        try:
+            result = process_fn(turn)
+        except Exception as e:
+            logger.exception("Turn %d failed: %s", turn.seq, e)
+            result = {"ok": False, "error": str(e)}
+        turns.complete(turn, result)
+        if seq is None:
+            break
+    return _turn_to_report(turns, seq)
+
+
+async def run_turns_async(session_id, process_fn, seq=None):
+    """
+    Coroutine version of run_turns; process_fn is a coroutine function.
+
+    A turn runs as its own task, so a poll cancelled mid-turn (client gone)
+    does not leave the turn half-processed: it finishes and is reported to
+    the next poll.
+    """
+    turns = get_session_turns(session_id)
+
+    async def process(turn):
+        try:
+            result = await process_fn(turn)
+        except Exception as e:
+            logger.exception("Turn %d failed: %s", turn.seq, e)
+            result = {"ok": False, "error": str(e)}
+        turns.complete(turn, result)
+
+    while True:
+        if seq is not None:
+            target = turns.get(seq)
+            if target is None or target.state == DONE:
+                return target
+        turn = turns.claim_next()
+        if turn is None:
+            break
+        await asyncio.shield(asyncio.ensure_future(process(turn)))
+        if seq is None:
+            break
+    return _turn_to_report(turns, seq)
+
+
+def _turn_to_report(turns, seq):
+    if seq is not None:
+        target = turns.get(seq)
+        return target if target is not None and target.state == DONE else None
+    turn = turns.oldest_unreported()
+    if turn is not None:
+        turn.reported = True
+    return turn
+
+
+def has_pending_turns(session_id):
+    """True if the session has queued turns that are ready to be processed."""
+    snapshot = get_session_turns(session_id).snapshot()
+    return snapshot["queued"] > 0
+
+
+def get_turn_metrics():
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {session_id: turns.snapshot() for session_id, turns in sessions.items()}
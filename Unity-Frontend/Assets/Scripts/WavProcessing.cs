@@ -21,6 +21,19 @@ public class WavProcessing : MonoBehaviour
 
     private bool isRecording;
 
+    // Trainee the session's evaluation is filed under (set in the Inspector,
+    // or saved in PlayerPrefs under "TraineeId"); empty files it as "unknown"
+    [SerializeField] private string traineeId = "";
+
+    // Identifies this headset to the server, so concurrent headsets keep
+    // separate conversations even behind one address
+    private string sessionId;
+
+    // Turn number within the current session, sent with each submission so
+    // the server can deduplicate retries and report this turn's result
+    private int turnSeq;
+    private string turnKey;
+
     // The transform that the prefab or animator should look at
     private Transform lookAtTarget;
 
@@ -50,6 +63,10 @@ public class WavProcessing : MonoBehaviour
 
         // Set the lookAtTarget to Patient
         lookAtTarget = GameObject.Find("Patient").transform;
+
+        if (string.IsNullOrEmpty(traineeId))
+            traineeId = PlayerPrefs.GetString("TraineeId", "");
+        sessionId = SystemInfo.deviceUniqueIdentifier;
     }
 
     // Update is called once per frame
@@ -86,6 +103,10 @@ public class WavProcessing : MonoBehaviour
         string uri = $"{baseUri}/reset_conversation";
         WWWForm form = new WWWForm();
         form.AddField("reset_conversation", "yes");
+        form.AddField("session_id", sessionId);
+        if (!string.IsNullOrEmpty(traineeId))
+            form.AddField("trainee_id", traineeId);
+        turnSeq = 0;
 
         using (UnityWebRequest request = UnityWebRequest.Post(uri, form))
         {
@@ -141,6 +162,8 @@ public class WavProcessing : MonoBehaviour
         stopBtn.interactable = false;
 
         // Send a POST request to the Flask server with "patient_speech.wav" string
+        turnSeq++;
+        turnKey = System.Guid.NewGuid().ToString("N");
         if (sendWavFileCoroutine == null)
             sendWavFileCoroutine = StartCoroutine(SendPatientWav());
 
@@ -154,6 +177,9 @@ public class WavProcessing : MonoBehaviour
         WWWForm form = new WWWForm();
         form.AddField("loaded_wav_file", "patient_speech");
         form.AddField("path", Path.Combine(Application.persistentDataPath, BaseWavPath));
+        form.AddField("seq", turnSeq);
+        form.AddField("idempotency_key", turnKey);
+        form.AddField("session_id", sessionId);
 
 
         using (UnityWebRequest request = UnityWebRequest.Post(uri, form))
@@ -178,7 +204,7 @@ public class WavProcessing : MonoBehaviour
 
     IEnumerator CheckStatus()
     {
-        string uri = $"{baseUri}/check_status";
+        string uri = $"{baseUri}/check_status?seq={turnSeq}&session_id={UnityWebRequest.EscapeURL(sessionId)}";
 
         while (true)
         {